@@ -281,7 +281,8 @@ try:
     from views.settings_view import render_settings
     from views.input_view import render_input_page
     from views import dashboard_view, search_view
-    from controllers.data_loader import load_raw_data_v2, filter_data
+    from controllers.data_loader import load_raw_data_v2, filter_data, load_processed_logs, get_processed_version, processed_files, share_session_log_data, release_session_log_data, touch_session_log_data, load_history, session_log_meta, source_summary
+    from controllers import query_engine, dataset_cache, log_index
     from components.ui_components import view_error_details, view_alert_history, render_kpi, render_progress_bar, view_analysis_history
     import history_manager
 except ImportError:
@@ -292,7 +293,8 @@ except ImportError:
     from views.settings_view import render_settings
     from views.input_view import render_input_page
     from views import dashboard_view, search_view
-    from controllers.data_loader import load_raw_data_v2, filter_data
+    from controllers.data_loader import load_raw_data_v2, filter_data, load_processed_logs, get_processed_version, processed_files, share_session_log_data, release_session_log_data, touch_session_log_data, load_history, session_log_meta, source_summary
+    from controllers import query_engine, dataset_cache, log_index
     from components.ui_components import view_error_details, view_alert_history, render_kpi, render_progress_bar, view_analysis_history
     import history_manager
 
@@ -326,14 +328,17 @@ def logout():
 
 # --- Report Generation ---
 
-def generate_csv_report(df: pd.DataFrame) -> str:
-    """Generate CSV report string from current dataframe"""
-    if df.empty: return ""
+def generate_csv_report(df: pd.DataFrame, counts=None) -> str:
+    """Generate CSV report string from current dataframe (counts: (total, errors, warnings) if df holds only the ERROR rows)"""
+    if df.empty and counts is None: return ""
     
     # 1. Summary Section
-    total = len(df)
-    errors = len(df[df['log_level'] == 'ERROR']) if 'log_level' in df.columns else 0
-    warnings = len(df[df['log_level'] == 'WARN']) if 'log_level' in df.columns else 0
+    if counts is not None:
+        total, errors, warnings = counts
+    else:
+        total = len(df)
+        errors = len(df[df['log_level'] == 'ERROR']) if 'log_level' in df.columns else 0
+        warnings = len(df[df['log_level'] == 'WARN']) if 'log_level' in df.columns else 0
     rate = (errors / total * 100) if total > 0 else 0
     
     summary = f"SUMMARY REPORT\nDeprecated Generated_at,{datetime.now()}\nTotal Logs,{total}\nTotal Errors,{errors}\nTotal Warnings,{warnings}\nError Rate,{rate:.2f}%\n"
@@ -388,13 +393,16 @@ def generate_csv_report(df: pd.DataFrame) -> str:
     
     return summary + "DETAILED ERROR LOGS\n" + csv_data
 
-def generate_json_report(df: pd.DataFrame) -> str:
-    """Generate JSON report string from current dataframe"""
-    if df.empty: return "{}"
+def generate_json_report(df: pd.DataFrame, counts=None) -> str:
+    """Generate JSON report string from current dataframe (counts: (total, errors, warnings) if df holds only the ERROR rows)"""
+    if df.empty and counts is None: return "{}"
     
-    total = len(df)
-    errors = len(df[df['log_level'] == 'ERROR']) if 'log_level' in df.columns else 0
-    warnings = len(df[df['log_level'] == 'WARN']) if 'log_level' in df.columns else 0
+    if counts is not None:
+        total, errors, warnings = counts
+    else:
+        total = len(df)
+        errors = len(df[df['log_level'] == 'ERROR']) if 'log_level' in df.columns else 0
+        warnings = len(df[df['log_level'] == 'WARN']) if 'log_level' in df.columns else 0
     rate = (errors / total * 100) if total > 0 else 0
     
     report = {
@@ -438,6 +446,8 @@ def generate_json_report(df: pd.DataFrame) -> str:
 # --- Main App ---
 
 def render_filters(df: pd.DataFrame):
+    # Data kept on disk (query_engine.ParquetSource) is only aggregated or sliced, never loaded whole
+    on_disk = isinstance(df, query_engine.ParquetSource)
     with st.container():
         st.markdown('<div class="filter-panel">', unsafe_allow_html=True)
         # Reset Logic
@@ -483,8 +493,10 @@ def render_filters(df: pd.DataFrame):
         date_range = None
         if filter_mode == "Custom Range":
             # Determine default range based on data
+            max_ts = None
             if not df.empty and 'timestamp' in df.columns:
-                max_ts = df['timestamp'].max()
+                max_ts = query_engine.time_bounds(df)[1] if on_disk else df['timestamp'].max()
+            if max_ts is not None and not pd.isna(max_ts):
                 default_end = max_ts.date()
                 default_start = default_end - timedelta(days=7)
             else:
@@ -505,7 +517,10 @@ def render_filters(df: pd.DataFrame):
         unique_levels = ['INFO', 'WARN', 'ERROR', 'DEBUG']
         if not df.empty and 'log_level' in df.columns:
             # Union of standard levels and actual levels in data
-            data_levels = df['log_level'].astype(str).dropna().unique().tolist()
+            if on_disk:
+                data_levels = query_engine.distinct_values(df, 'log_level')
+            else:
+                data_levels = df['log_level'].astype(str).dropna().unique().tolist()
             unique_levels = sorted(list(set(unique_levels + data_levels)))
         
         for lvl in unique_levels:
@@ -539,8 +554,15 @@ def render_filters(df: pd.DataFrame):
         # UPDATE: User request says "must generate analytics reports... covering summaries".
         # Let's generate based on 'df' (raw) provided to this function.
         
-        csv_data = generate_csv_report(df)
-        json_data = generate_json_report(df)
+        if on_disk:
+            # The reports list ERROR rows only: materialise just those
+            counts = query_engine.level_counts(df)
+            error_rows = query_engine.filter_logs(df, levels=['ERROR'])
+            csv_data = generate_csv_report(error_rows, counts)
+            json_data = generate_json_report(error_rows, counts)
+        else:
+            csv_data = generate_csv_report(df)
+            json_data = generate_json_report(df)
         
         c_csv, c_json = st.columns(2)
         with c_csv:
@@ -568,21 +590,30 @@ def render_filters(df: pd.DataFrame):
             
             # Logic to calculate Top Frequent Errors for the selected range/mode
             # We must duplicate some logic because main() hasn't processed filtered_df yet
-            temp_df = df.copy()
+            temp_df = df
             
             try:
                 if date_range:
                     start, end = date_range
-                    s_ts = pd.Timestamp(start)
-                    e_ts = pd.Timestamp(end) + timedelta(days=1) - timedelta(seconds=1)
-                    if 'timestamp' in temp_df.columns:
-                        temp_df = temp_df[(temp_df['timestamp'] >= s_ts) & (temp_df['timestamp'] <= e_ts)]
+                    if on_disk:
+                        # Only the selected range is materialised
+                        temp_df = filter_data(df, date_range, "All", [], "All Services")
+                    else:
+                        s_ts = pd.Timestamp(start)
+                        e_ts = pd.Timestamp(end) + timedelta(days=1) - timedelta(seconds=1)
+                        if 'timestamp' in temp_df.columns:
+                            temp_df = temp_df[(temp_df['timestamp'] >= s_ts) & (temp_df['timestamp'] <= e_ts)]
                 
                 # Force a focused alert check on this specific view (NO EMAIL)
-                alerts.check_alerts(temp_df, force=True, username=st.session_state.username, send_email=False)
+                if isinstance(temp_df, query_engine.ParquetSource):
+                    summary = source_summary(temp_df, session_log_meta())
+                    alerts.check_alerts(temp_df, force=True, username=st.session_state.username, send_email=False, summary=summary)
+                    top_errors = [message for message, _ in summary["top_errors"][:5]]
+                else:
+                    alerts.check_alerts(temp_df, force=True, username=st.session_state.username, send_email=False)
 
                 # Extract top errors
-                if not temp_df.empty and 'message' in temp_df.columns and 'log_level' in temp_df.columns:
+                if isinstance(temp_df, pd.DataFrame) and not temp_df.empty and 'message' in temp_df.columns and 'log_level' in temp_df.columns:
                      err_df_temp = temp_df[temp_df['log_level'] == 'ERROR']
                      if not err_df_temp.empty:
                          # Get top 5 messages
@@ -678,8 +709,13 @@ def main():
             data_path = history_manager.get_analysis_data_path(hist_id)
             if data_path and os.path.exists(data_path):
                 # Load parquet
-                df = pd.read_parquet(data_path)
-                st.session_state['log_data'] = df
+                # Shared with every session viewing the same record (read once per process; large ones stay on disk)
+                share_session_log_data(
+                    dataset_cache.file_key(data_path, "history"),
+                    lambda: load_history(data_path, alerts.dashboard_rule_evaluator()),
+                    "history", keep=alerts.dashboard_rule_columns()
+                )
+                st.session_state['log_source'] = None
                 st.session_state['data_ready'] = True
                 st.session_state['viewing_history'] = True
                 st.session_state['history_record_id'] = hist_id
@@ -728,13 +764,27 @@ def main():
         
         if st.button("New Analysis 🔄", use_container_width=True):
             st.session_state.data_ready = False
-            st.session_state['log_data'] = None
+            release_session_log_data()
             st.session_state['viewing_history'] = False
+            st.session_state['data_source'] = None
+            st.session_state['log_source'] = None
             st.session_state.page = "dashboard"
             st.rerun()
             
         st.button("Logout", on_click=logout, type="secondary", use_container_width=True)
 
+        # Per-session memory of the loaded logs
+        memory = st.session_state.get('log_data_memory')
+        if st.session_state.get('data_ready') and memory:
+            shared = touch_session_log_data()
+            if memory.get('on_disk'):
+                st.caption(f"Session data: {memory['rows']:,} rows queried on disk"
+                           + (f", shared by {shared} sessions" if shared > 1 else ""))
+            else:
+                st.caption(f"Session data: {memory['mb']:.1f} MB for {memory['rows']:,} rows "
+                           f"({memory['raw_mb']:.1f} MB before compaction)"
+                           + (f", shared by {shared} sessions" if shared > 1 else ""))
+
     # --- Navigation Logic ---
     if "data_ready" not in st.session_state:
         st.session_state.data_ready = False
@@ -790,6 +840,10 @@ def main():
         # Using data from session state (loaded via Input Page)
         df = st.session_state.get('log_data', pd.DataFrame())
         
+        if isinstance(df, query_engine.ParquetSource) and not all(os.path.exists(f) for f in df.files):
+            # Spilled shards removed outside this server (live sessions' shards are never cleaned up)
+            release_session_log_data()
+            df = pd.DataFrame()
         if df.empty:
             # Fallback if something went wrong
             st.error("No data available. Please upload a file.")
@@ -805,28 +859,49 @@ def main():
         user_email = st.session_state.get('user_email')
         
         # Optimize: Only check alerts if data has changed or not checked yet
-        current_count = len(df)
-        last_count = st.session_state.get('last_alert_check_count', -1)
+        on_disk = isinstance(df, query_engine.ParquetSource)
+        current_key = st.session_state.get('log_data_key')
+        last_key = st.session_state.get('last_alert_check_key')
         
-        if current_count != last_count:
+        if current_key is None or current_key != last_key:
             # Skip new alert generation if examining historical data
             if not st.session_state.get('viewing_history'):
-                new_alerts = alerts.check_alerts(df, target_email=user_email, username=st.session_state.username)
+                # Data kept on disk: rules were evaluated chunk by chunk while it was parsed
+                summary = source_summary(df, session_log_meta()) if on_disk else None
+                new_alerts = alerts.check_alerts(df, target_email=user_email, username=st.session_state.username, summary=summary)
                 if new_alerts:
                     for alert in new_alerts:
                         st.toast(f"⚠️ {alert['message']}")
-            st.session_state.last_alert_check_count = current_count
+            st.session_state.last_alert_check_key = current_key
         
         with col_filters:
             time_range, selected_levels = render_filters(df)
             search_query = "All"
         
         # Apply Filters
+        if log_index.index_for(df) is not None:
+            # Indexed in-memory frame: range/level filters are binary searches and slices
+            pass
+        elif on_disk:
+            # Large upload or history kept in its Parquet files: filtered in place, only the result is loaded
+            pass
+        elif st.session_state.get('log_source') is not None and query_engine.is_available():
+            # Uploads spilled to Parquet shards are filtered in place as well
+            df = st.session_state['log_source']
+        elif st.session_state.get('data_source') == "processed":
+            if query_engine.is_available():
+                # DuckDB filters the Parquet files in place (spills to disk past its memory limit)
+                df = query_engine.ParquetSource(processed_files())
+            else:
+                # Date range and levels are pushed down to the Parquet scan
+                df = load_processed_logs(get_processed_version(), date_range=time_range, levels=tuple(selected_levels or ()))
         filtered_df = filter_data(df, time_range, search_query, selected_levels, "All Services")
     
         
         # Render Dashboard View
         dashboard_view.render_dashboard(filtered_df, container=col_main)
+        if st.session_state.get('data_source') == "processed":
+            dashboard_view.render_pipeline_latency(container=col_main)
 
 if __name__ == "__main__":
     main()
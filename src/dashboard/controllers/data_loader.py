@@ -2,8 +2,37 @@ import streamlit as st
 import pandas as pd
 import os
 import glob
+import hashlib
+import json
 from datetime import datetime, timedelta
 
+try:
+    from controllers import query_engine
+    from controllers import dataset_cache
+    from controllers import log_index
+    from controllers import spark_client
+    from controllers.timestamp_parser import parse_timestamps
+except ImportError:
+    import query_engine
+    import dataset_cache
+    import log_index
+    import spark_client
+    from timestamp_parser import parse_timestamps
+
+# Outside paths.parquet_dir: the pipeline's overwrite of data/processed would wipe it
+RAW_CACHE_DIR = os.path.join("data", "cache", "raw_logs")
+RAW_CACHE_MANIFEST = "manifest.json"
+
+def raw_cache_dir() -> str:
+    """dashboard.raw_cache_dir from config.yaml (default RAW_CACHE_DIR)"""
+    try:
+        import yaml
+        with open(query_engine.CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        return (config.get("dashboard") or {}).get("raw_cache_dir") or RAW_CACHE_DIR
+    except Exception:
+        return RAW_CACHE_DIR
+
 def get_latest_mtime(raw_dir: str = "data/raw_logs") -> float:
     """Get the latest modification timestamp from raw logs"""
     try:
@@ -14,104 +43,700 @@ def get_latest_mtime(raw_dir: str = "data/raw_logs") -> float:
     except Exception:
         return 0.0
 
+def _shard_name(source_path: str) -> str:
+    return hashlib.sha1(os.path.abspath(source_path).encode("utf-8")).hexdigest()[:16] + ".parquet"
+
+def _load_manifest(cache_dir: str) -> dict:
+    try:
+        with open(os.path.join(cache_dir, RAW_CACHE_MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(cache_dir: str, manifest: dict) -> None:
+    path = os.path.join(cache_dir, RAW_CACHE_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def sync_raw_cache(csv_dir: str = "data/raw_logs", cache_dir: str = RAW_CACHE_DIR) -> list:
+    """
+    Bring the per-file Parquet cache in line with csv_dir: one shard per CSV,
+    keyed by (path, size, mtime). Only new or changed files are parsed; shards of
+    deleted files are removed.
+
+    Returns:
+        Shard paths for every CSV that parsed into rows
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+    current = {}
+
+    for entry in os.scandir(csv_dir):
+        if not (entry.is_file() and entry.name.lower().endswith(".csv")):
+            continue
+        stat = entry.stat()
+        source = os.path.abspath(entry.path)
+        cached = manifest.get(source)
+        shard = os.path.join(cache_dir, _shard_name(source))
+
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime and (
+            cached["rows"] == 0 or os.path.exists(shard)
+        ):
+            current[source] = cached
+            continue
+
+        # New or changed: parse just this file
+        rows = 0
+        try:
+            df = process_log_dataframe(pd.read_csv(entry.path, header=0, quotechar='"'))
+            rows = len(df)
+            if rows:
+                try:
+                    df.to_parquet(shard + ".tmp", index=False)
+                except (TypeError, ValueError):
+                    # Mixed-type object columns (e.g. ids that are sometimes numeric)
+                    mixed = df.select_dtypes(include="object").columns
+                    df.astype({col: str for col in mixed}).to_parquet(shard + ".tmp", index=False)
+                os.replace(shard + ".tmp", shard)
+        except Exception as e:
+            print(f"Failed to cache {entry.path}: {e}")
+            continue
+        if not rows and os.path.exists(shard):
+            os.remove(shard)
+        current[source] = {"size": stat.st_size, "mtime": stat.st_mtime, "rows": rows}
+
+    # Drop shards whose source disappeared
+    for source in set(manifest) - set(current):
+        try:
+            os.remove(os.path.join(cache_dir, _shard_name(source)))
+        except OSError:
+            pass
+
+    if current != manifest:
+        _save_manifest(cache_dir, current)
+    return [os.path.join(cache_dir, _shard_name(src)) for src, meta in current.items() if meta["rows"]]
+
+def read_shards(shards: list) -> pd.DataFrame:
+    """Assemble cached shards with one pyarrow dataset scan (schemas unified across log formats)"""
+    if not shards:
+        return pd.DataFrame()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    try:
+        schema = pa.unify_schemas([pq.read_schema(path) for path in shards], promote_options="permissive")
+        return ds.dataset(shards, schema=schema, format="parquet").to_table().to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # Column types that Arrow cannot reconcile (e.g. int vs string ids): let pandas upcast
+        return pd.concat([pd.read_parquet(path) for path in shards], ignore_index=True)
+
 @st.cache_data(show_spinner=False, ttl=300) # Optional TTL for safety
-def load_raw_data_v2(last_modified: float, data_dir: str = "data/processed") -> pd.DataFrame:
-    """Load processed log data with Memory + Parquet Caching"""
+def load_raw_data_v2(last_modified: float, cache_dir: str = None) -> pd.DataFrame:
+    """Load raw logs through the per-file Parquet cache (only changed CSVs are re-parsed)"""
     try:
-        parquet_path = os.path.join(data_dir, "analytics_cache.parquet")
-        
-        # Internal Cache Logic
-        # Even if Streamlit cache misses (e.g. restart), check if we can reuse Parquet
-        use_parquet = False
-        if os.path.exists(parquet_path):
-             # Check if Parquet is fresh enough vs the requested last_modified
-             # If Parquet mtime >= last_modified, it contains the latest data
-             try:
-                 parquet_mtime = os.path.getmtime(parquet_path)
-                 if parquet_mtime >= last_modified:
-                     use_parquet = True
-             except: pass
-        
-        if use_parquet:
-            try:
-                 df = pd.read_parquet(parquet_path)
-                 if 'timestamp' in df.columns:
-                      return df.sort_values('timestamp', ascending=False)
-                 return df
-            except Exception:
-                 pass # Fallback to re-process
-
-        # Fallback to CSV
         csv_dir = "data/raw_logs"
         if not os.path.exists(csv_dir):
             return pd.DataFrame()
-            
-        all_files = glob.glob(os.path.join(csv_dir, "*.csv"))
-        if not all_files:
-            return pd.DataFrame()
-            
-        df_list = []
-        for filename in all_files:
+
+        shards = sync_raw_cache(csv_dir, cache_dir or raw_cache_dir())
+        final_df = read_shards(shards)
+        if final_df.empty:
+            return final_df
+
+        return final_df.sort_values('timestamp', ascending=False) if 'timestamp' in final_df.columns else final_df
+    except Exception as e:
+        return pd.DataFrame()
+
+# Pipeline reports are published as versions; reports/published.json names the current one
+# (written by export_reports.commit_report_versions, mirrored here without the Spark imports)
+REPORTS_POINTER = "published.json"
+LEGACY_REPORTS_MANIFEST = "current.json"
+
+def published_report_manifest(reports_dir: str) -> dict:
+    """Current version of reports_dir: {"version", "files", ...} ({} if nothing published)"""
+    level = os.path.abspath(reports_dir)
+    while True:
+        pointer_path = os.path.join(level, REPORTS_POINTER)
+        if os.path.exists(pointer_path):
             try:
-                df = pd.read_csv(filename, header=0, quotechar='"')
-                df = process_log_dataframe(df)
-                if not df.empty:
-                    df_list.append(df)
-            except Exception: 
-                continue
-                
-        if not df_list: return pd.DataFrame()
-        final_df = pd.concat(df_list, ignore_index=True)
-        
-        # Cache to Parquet for future speedups
+                with open(pointer_path, "r") as f:
+                    pointer = json.load(f)
+            except (OSError, ValueError):
+                return {}
+            key = os.path.relpath(os.path.abspath(reports_dir), level).replace("\\", "/")
+            if key in pointer.get("dirs", {}):
+                manifest = {k: v for k, v in pointer.items() if k != "dirs"}
+                manifest["files"] = pointer["dirs"][key]
+                return manifest
+        parent = os.path.dirname(level)
+        if parent == level:
+            break
+        level = parent
+    try:
+        with open(os.path.join(reports_dir, LEGACY_REPORTS_MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def resolve_report_path(reports_dir: str, report_file: str):
+    """Path of report_file in the current published version (None if it is not published)"""
+    manifest = published_report_manifest(reports_dir)
+    if report_file not in manifest.get("files", {}):
+        return None
+    return os.path.join(reports_dir, "versions", manifest["version"], report_file)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _read_arrow_report(path: str) -> pd.DataFrame:
+    # Version directories never change, so the path (which names the version) is the cache key
+    return load_arrow_report_table(path).to_pandas()
+
+def load_arrow_report_table(path: str):
+    """Memory-map an Arrow IPC report (zero-copy)"""
+    import pyarrow as pa
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+def load_arrow_report(name: str, reports_dir: str = "reports/arrow", as_table: bool = False):
+    """
+    Open a pipeline report written as Arrow IPC (e.g. 'errors_by_type', 'summary')
+    from the current published version. The file is memory-mapped; pass
+    as_table=True to keep the pyarrow.Table instead of converting to pandas.
+    """
+    path = resolve_report_path(reports_dir, f"{name}.arrow")
+    if path is None or not os.path.exists(path):
+        return None if as_table else pd.DataFrame()
+    return load_arrow_report_table(path) if as_table else _read_arrow_report(path)
+
+# Columns the dashboard views need from the pipeline output (view name -> candidate source columns)
+PROCESSED_COLUMNS = {
+    "timestamp": ["timestamp"],
+    "log_level": ["log_level"],
+    "service": ["service_name", "service"],
+    "message": ["message"],
+    "error_type": ["error_type"],
+}
+
+def processed_files(data_dir: str = "data/processed") -> list:
+    """
+    Live Parquet files of the pipeline's processed table. Follows the _txn_log
+    commit log when present (so half-written appends and compacted-away files
+    are skipped), otherwise lists files outside "_"/"." prefixed directories.
+    """
+    if not os.path.isdir(data_dir):
+        return []
+
+    log_dir = os.path.join(data_dir, "_txn_log")
+    if os.path.isdir(log_dir):
+        active = {}
+        for name in sorted(n for n in os.listdir(log_dir) if n.endswith(".json") and n[:-5].isdigit()):
+            with open(os.path.join(log_dir, name), "r") as f:
+                entry = json.load(f)
+            for path in entry.get("remove", []):
+                active.pop(path, None)
+            for item in entry.get("add", []):
+                active[item["path"]] = item
+        return [os.path.join(data_dir, path) for path in sorted(active)]
+
+    files = []
+    for current, dirs, names in os.walk(data_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(("_", "."))]
+        files.extend(os.path.join(current, n) for n in names if n.endswith(".parquet"))
+    return sorted(files)
+
+def get_processed_version(data_dir: str = "data/processed") -> str:
+    """Cache key for the processed table: live file count and their latest mtime"""
+    try:
+        files = processed_files(data_dir)
+        return f"{len(files)}:{max((os.path.getmtime(f) for f in files), default=0.0)}"
+    except (OSError, ValueError):
+        return "0:0.0"
+
+def _scalar_for(field, value):
+    """Literal typed like the column so comparisons reach the Parquet statistics"""
+    import pyarrow as pa
+    if pa.types.is_timestamp(field.type):
+        return pa.scalar(pd.Timestamp(value).to_pydatetime(), type=field.type)
+    if pa.types.is_date(field.type):
+        return pa.scalar(pd.Timestamp(value).date(), type=field.type)
+    return pa.scalar(str(pd.Timestamp(value).date()))
+
+@st.cache_data(show_spinner=False, ttl=300)
+def load_processed_logs(version: str, data_dir: str = "data/processed", date_range=None, levels=None) -> pd.DataFrame:
+    """
+    Load the pipeline's processed Parquet with pyarrow.dataset.
+
+    Only PROCESSED_COLUMNS are read. The date range prunes `date` partitions and
+    row groups (via timestamp min/max statistics); levels are pushed down as an
+    isin filter on log_level.
+
+    Args:
+        version: Cache key, see get_processed_version
+        data_dir: Processed table directory (paths.parquet_dir)
+        date_range: Optional (start_date, end_date), both inclusive
+        levels: Optional log levels to keep
+
+    Returns:
+        DataFrame with timestamp, log_level, service, message, error_type (newest first)
+    """
+    files = processed_files(data_dir)
+    if not files:
+        return pd.DataFrame()
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    try:
+        dataset = ds.dataset(files, format="parquet", partitioning="hive", partition_base_dir=data_dir)
+    except Exception as e:
+        print(f"Failed to open processed logs: {e}")
+        return pd.DataFrame()
+
+    schema = dataset.schema
+    projection = {}
+    for name, candidates in PROCESSED_COLUMNS.items():
+        source = next((c for c in candidates if c in schema.names), None)
+        if source:
+            projection[name] = ds.field(source)
+
+    ts_typed = "timestamp" in schema.names and pa.types.is_timestamp(schema.field("timestamp").type)
+    predicate = None
+    def _and(expr):
+        return expr if predicate is None else predicate & expr
+
+    if date_range and len(date_range) == 2:
+        start_date, end_date = date_range
+        end_ts = pd.Timestamp(end_date) + timedelta(days=1) - timedelta(microseconds=1)
+        if "date" in schema.names:
+            field = schema.field("date")
+            predicate = _and((ds.field("date") >= _scalar_for(field, start_date)) & (ds.field("date") <= _scalar_for(field, end_date)))
+        if ts_typed:
+            field = schema.field("timestamp")
+            predicate = _and((ds.field("timestamp") >= _scalar_for(field, start_date)) & (ds.field("timestamp") <= _scalar_for(field, end_ts)))
+
+    if levels and "log_level" in schema.names:
+        predicate = _and(ds.field("log_level").isin(list(levels)))
+
+    df = _normalise_processed(dataset.to_table(columns=projection, filter=predicate).to_pandas())
+
+    if "timestamp" in df.columns:
+        if date_range and len(date_range) == 2 and not ts_typed:
+            df = filter_data(df, date_range, "All", [], "All Services")
+        df = df.sort_values("timestamp", ascending=False)
+    return df.reset_index(drop=True)
+
+def _normalise_processed(df: pd.DataFrame) -> pd.DataFrame:
+    """Naive datetime timestamps (rows without one dropped) and upper-case levels"""
+    if "timestamp" in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+            # Pandas-fallback output stores timestamps as strings
+            df["timestamp"] = pd.to_datetime(df["timestamp"], format="mixed", errors="coerce")
+        elif df["timestamp"].dt.tz is not None:
+            df["timestamp"] = df["timestamp"].dt.tz_convert(None)
+        df = df.dropna(subset=["timestamp"])
+    if "log_level" in df.columns:
+        df["log_level"] = df["log_level"].fillna("UNKNOWN").astype(str).str.upper()
+    return df
+
+def open_processed_logs(version: str, data_dir: str = "data/processed", rule_evaluator=None):
+    """
+    Session data for the pipeline's processed table without loading it.
+
+    With DuckDB the session gets a ParquetSource over the live files; totals come
+    from one engine aggregate (level_counts) and the dashboard rules are evaluated
+    over a batched scan of just the columns they read. Without DuckDB the table
+    is loaded as before (load_processed_logs).
+
+    With the persistent Spark service configured, totals and rules run in the
+    warm session instead (spark_client.processed_summary).
+
+    Returns:
+        (ParquetSource or DataFrame, summary or None)
+    """
+    files = processed_files(data_dir)
+    rules = rule_evaluator.rules if rule_evaluator is not None else None
+    summary = spark_client.processed_summary(files, data_dir, rules) if files else None
+    if summary is not None:
+        source = query_engine.ParquetSource(files) if query_engine.is_available() else load_processed_logs(version, data_dir)
+        return source, summary
+    if not files or not query_engine.is_available():
+        return load_processed_logs(version, data_dir), None
+
+    source = query_engine.ParquetSource(files)
+    total, errors, warnings = query_engine.level_counts(source)
+    summary = {"rows": total, "levels": {"ERROR": errors, "WARN": warnings}, "breaches": None}
+    if rule_evaluator is not None:
+        import pyarrow.dataset as ds
+
+        needed = set().union(*(rule.columns() for rule in rule_evaluator.rules))
+        dataset = ds.dataset(files, format="parquet", partitioning="hive", partition_base_dir=data_dir)
+        projection = {}
+        for name, candidates in PROCESSED_COLUMNS.items():
+            source_column = next((c for c in candidates if c in dataset.schema.names), None)
+            if name in needed and source_column:
+                projection[name] = ds.field(source_column)
+        if projection:
+            batch_rows = int(load_upload_settings()["chunk_rows"])
+            for batch in dataset.to_batches(columns=projection, batch_size=batch_rows):
+                rule_evaluator.add(_normalise_processed(batch.to_pandas()))
+        summary["breaches"] = rule_evaluator.breaches()
+    return source, summary
+
+UPLOAD_DEFAULTS = {
+    "max_file_mb": 2048,      # Keep in sync with server.maxUploadSize in .streamlit/config.toml
+    "chunk_rows": 200000,
+    "spill_dir": "data/uploads",
+    "keep_hours": 24,
+    "memory_max_mb": 512,     # Larger datasets stay in their Parquet files (needs DuckDB)
+}
+
+def load_upload_settings() -> dict:
+    """dashboard.upload from config.yaml merged over UPLOAD_DEFAULTS"""
+    settings = dict(UPLOAD_DEFAULTS)
+    try:
+        import yaml
+        with open(query_engine.CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        settings.update((config.get("dashboard") or {}).get("upload") or {})
+    except Exception:
+        pass
+    return settings
+
+def _cleanup_spills(spill_root: str, keep_hours: float) -> None:
+    """Remove spill directories of uploads older than keep_hours, except those live sessions still query"""
+    import shutil
+    cache = dataset_cache.get_dataset_cache()
+    in_use = {os.path.abspath(d) for d in cache.pinned("dir")}
+    cutoff = datetime.now().timestamp() - keep_hours * 3600
+    removed = []
+    for entry in os.scandir(spill_root):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff and os.path.abspath(entry.path) not in in_use:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed.append(entry.path)
+    # Cached datasets over the removed shards must not be handed to the next session
+    cache.forget("dir", removed)
+
+def _new_summary() -> dict:
+    return {"rows": 0, "levels": {}, "min_ts": None, "max_ts": None}
+
+def _add_to_summary(summary: dict, df: pd.DataFrame, rule_evaluator=None) -> None:
+    """Fold one parsed chunk into the running aggregates"""
+    summary["rows"] += len(df)
+    if 'log_level' in df.columns:
+        for level, count in df['log_level'].value_counts().items():
+            summary["levels"][level] = summary["levels"].get(level, 0) + int(count)
+    if 'timestamp' in df.columns and df['timestamp'].notna().any():
+        lo, hi = df['timestamp'].min(), df['timestamp'].max()
+        summary["min_ts"] = lo if summary["min_ts"] is None else min(summary["min_ts"], lo)
+        summary["max_ts"] = hi if summary["max_ts"] is None else max(summary["max_ts"], hi)
+    if rule_evaluator is not None:
+        rule_evaluator.add(df)
+
+def spill_uploads(file_or_files, spill_root: str = None, chunk_rows: int = None, rule_evaluator=None) -> dict:
+    """
+    Parse uploaded CSVs in chunks of chunk_rows, writing each processed chunk to
+    its own Parquet shard and updating the aggregates as it goes. Parsing holds
+    one chunk at a time; whether the shards are then read back into memory is
+    up to the caller (see load_uploads).
+
+    Args:
+        rule_evaluator: Optional alert_rules.PandasRuleEvaluator fed every chunk
+
+    Returns:
+        {"dir", "shards", "rows", "levels": {level: count}, "min_ts", "max_ts", "files": {name: rows},
+         "breaches": rule breaches (None without rule_evaluator)}
+    """
+    import uuid
+    settings = load_upload_settings()
+    spill_root = spill_root or settings["spill_dir"]
+    chunk_rows = int(chunk_rows or settings["chunk_rows"])
+
+    os.makedirs(spill_root, exist_ok=True)
+    _cleanup_spills(spill_root, float(settings["keep_hours"]))
+    spill_dir = os.path.join(spill_root, f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}")
+    os.makedirs(spill_dir)
+
+    uploaded_files = file_or_files if isinstance(file_or_files, list) else [file_or_files]
+    result = dict(_new_summary(), dir=spill_dir, shards=[], files={}, breaches=None)
+
+    for file_index, uploaded_file in enumerate(uploaded_files):
+        name = getattr(uploaded_file, "name", str(file_index))
+        result["files"][name] = 0
         try:
-             save_path = os.path.join("data", "processed")
-             if not os.path.exists(save_path):
-                 os.makedirs(save_path)
-             
-             # Save as a single optimized file
-             parquet_file = os.path.join(save_path, "analytics_cache.parquet")
-             final_df.to_parquet(parquet_file)
+            # Seek to start if reused (though streamlit file buffer usually handled fresh)
+            uploaded_file.seek(0)
+            reader = pd.read_csv(uploaded_file, header=0, quotechar='"', chunksize=chunk_rows)
+            for chunk_index, chunk in enumerate(reader):
+                df = process_log_dataframe(chunk)
+                if df.empty:
+                    continue
+
+                shard = os.path.join(spill_dir, f"part-{file_index:04d}-{chunk_index:05d}.parquet")
+                try:
+                    df.to_parquet(shard, index=False)
+                except (TypeError, ValueError):
+                    mixed = df.select_dtypes(include="object").columns
+                    df.astype({col: str for col in mixed}).to_parquet(shard, index=False)
+                result["shards"].append(shard)
+
+                # Incremental aggregates
+                result["files"][name] += len(df)
+                _add_to_summary(result, df, rule_evaluator)
         except Exception as e:
-             print(f"Failed to cache parquet: {e}")
+            print(f"Failed to process upload {name}: {e}")
+            continue
 
-        return final_df.sort_values('timestamp', ascending=False) if 'timestamp' in final_df.columns else final_df
-    except Exception as e:
+    if rule_evaluator is not None:
+        result["breaches"] = rule_evaluator.breaches()
+    return result
+
+def read_spilled(shards: list) -> pd.DataFrame:
+    """Dashboard columns of spilled shards as one frame, newest first"""
+    if not shards:
         return pd.DataFrame()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    try:
+        schema = pa.unify_schemas([pq.read_schema(path) for path in shards], promote_options="permissive")
+        dataset = ds.dataset(shards, schema=schema, format="parquet")
+        projection = {}
+        for name, candidates in PROCESSED_COLUMNS.items():
+            source = next((c for c in candidates if c in schema.names), None)
+            if source:
+                projection[name] = ds.field(source)
+        table = dataset.to_table(columns=projection)
+        if "timestamp" in projection:
+            # Sort in Arrow, so pandas never holds two copies
+            table = table.sort_by([("timestamp", "descending")])
+        return table.to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        df = read_shards(shards)
+        for name, candidates in PROCESSED_COLUMNS.items():
+            source = next((c for c in candidates if c in df.columns), None)
+            if source and source != name and name not in df.columns:
+                df = df.rename(columns={source: name})
+        df = df[[c for c in PROCESSED_COLUMNS if c in df.columns]]
+        return df.sort_values('timestamp', ascending=False) if 'timestamp' in df.columns else df
+
+def write_spilled(shards: list, path: str) -> None:
+    """Concatenate spilled shards into one Parquet file, batch by batch"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    schema = pa.unify_schemas([pq.read_schema(shard) for shard in shards], promote_options="permissive")
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in ds.dataset(shards, schema=schema, format="parquet").to_batches():
+            writer.write_batch(batch)
+
+def _stays_on_disk(size_mb: float) -> bool:
+    """Datasets past memory_max_mb are queried in their Parquet files when DuckDB can do it"""
+    return query_engine.is_available() and size_mb > float(load_upload_settings()["memory_max_mb"])
+
+def load_uploads(files: list, rule_evaluator=None):
+    """
+    Parse uploads (chunked, via Parquet spill) into session data.
+
+    Uploads up to dashboard.upload.memory_max_mb are read back into one frame.
+    Larger ones stay in their shards as a query_engine.ParquetSource, so only
+    aggregates and filtered slices are ever materialised; their alert rules are
+    evaluated chunk by chunk while parsing (rule_evaluator).
+
+    Returns:
+        (DataFrame or ParquetSource, spill_uploads result)
+    """
+    if _stays_on_disk(sum(getattr(f, "size", 0) for f in files) / (1024 * 1024)):
+        spilled = spill_uploads(files, rule_evaluator=rule_evaluator)
+        return query_engine.ParquetSource(spilled["shards"]), spilled
+    spilled = spill_uploads(files)
+    return read_spilled(spilled["shards"]), spilled
+
+def load_history(path: str, rule_evaluator=None):
+    """
+    Session data for a saved analysis: in memory, or - for data past
+    memory_max_mb (uncompressed size from the Parquet footer) - a ParquetSource
+    summarised in one batched scan.
+
+    Returns:
+        (DataFrame or ParquetSource, summary or None)
+    """
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    metadata = parquet.metadata
+    size_mb = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups)) / (1024 * 1024)
+    if not _stays_on_disk(size_mb):
+        return pd.read_parquet(path), None
+
+    summary = dict(_new_summary(), breaches=None)
+    for batch in parquet.iter_batches(batch_size=int(load_upload_settings()["chunk_rows"])):
+        _add_to_summary(summary, batch.to_pandas(), rule_evaluator)
+    if rule_evaluator is not None:
+        summary["breaches"] = rule_evaluator.breaches()
+    return query_engine.ParquetSource([path]), summary
+
+def source_summary(source, meta: dict) -> dict:
+    """
+    What alerts.check_alerts needs for a ParquetSource: totals and top error
+    messages from the engine, rule breaches evaluated while the data was parsed.
+    """
+    errors = int(meta.get("levels", {}).get("ERROR", 0))
+    top_errors = []
+    if errors and "message" in source.columns:
+        top_errors = list(query_engine.top_values(source, "message", 20, level="ERROR").items())
+    return {"total": int(meta.get("rows", 0)), "errors": errors,
+            "top_errors": top_errors, "breaches": meta.get("breaches") or []}
 
 def load_data_from_stream(file_or_files) -> pd.DataFrame:
-    """Load and process data directly from one or more uploaded file streams"""
+    """Load and process data from one or more uploaded file streams (chunked, via Parquet spill)"""
     try:
         if not file_or_files:
             return pd.DataFrame()
-        
-        # Ensure it's a list for uniform processing
-        uploaded_files = file_or_files if isinstance(file_or_files, list) else [file_or_files]
-        df_list = []
-        
-        for uploaded_file in uploaded_files:
-             try:
-                # Seek to start if reused (though streamlit file buffer usually handled fresh)
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, header=0, quotechar='"')
-                df = process_log_dataframe(df)
-                if not df.empty:
-                    df_list.append(df)
-             except Exception:
-                 continue
-        
-        if not df_list:
-             return pd.DataFrame()
-             
-        final_df = pd.concat(df_list, ignore_index=True)
-
-        if not final_df.empty and 'timestamp' in final_df.columns:
-             return final_df.sort_values('timestamp', ascending=False)
-        return final_df
+        spilled = spill_uploads(file_or_files)
+        return read_spilled(spilled["shards"])
     except Exception as e:
         st.error(f"Error parsing file(s): {e}")
         return pd.DataFrame()
 
+# Parsed columns no view reads (LineId, EventId, Node, Date, Time, ...) are dropped from session frames
+SESSION_COLUMNS = list(PROCESSED_COLUMNS)
+CATEGORY_MAX_UNIQUE = 256  # Low-cardinality columns that are never value_counts()-ed become categoricals
+CATEGORY_COLUMNS = ["log_level", "service"]
+
+try:
+    # Arrow-backed strings that keep NaN for missing values (pandas >= 2.3)
+    _ARROW_STRING = pd.StringDtype("pyarrow", na_value=float("nan"))
+except TypeError:
+    _ARROW_STRING = "string[pyarrow]"
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory use of a DataFrame in MB"""
+    if df is None or not isinstance(df, pd.DataFrame):
+        return 0.0
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+def compact_log_frame(df: pd.DataFrame, keep=()) -> pd.DataFrame:
+    """
+    Shrink a parsed log frame before it is kept in session state.
+
+    - Drops columns outside SESSION_COLUMNS and keep
+    - Downcasts integer columns
+    - log_level/service with few distinct values become categoricals; other
+      strings become Arrow-backed strings instead of Python objects
+
+    Args:
+        df: Parsed log frame
+        keep: Extra columns to retain (e.g. columns the alert rules read)
+    """
+    if df is None or df.empty:
+        return df
+    wanted = set(SESSION_COLUMNS) | set(keep)
+    df = df[[c for c in df.columns if c in wanted]]
+
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            converted[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                continue
+            if col in CATEGORY_COLUMNS and series.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE:
+                converted[col] = series.astype("category")
+            elif series.dtype != _ARROW_STRING:
+                # Without NaN-semantics Arrow strings (pandas < 2.3), columns with gaps stay object:
+                # pd.NA comparisons would break boolean masks in the views
+                if _ARROW_STRING == "string[pyarrow]" and series.isna().any():
+                    continue
+                try:
+                    converted[col] = series.astype(_ARROW_STRING)
+                except (TypeError, ValueError, ImportError):
+                    pass
+    return df.assign(**converted) if converted else df
+
+def _session_id() -> str:
+    """Identifier of the current Streamlit session (stable across reruns)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            return ctx.session_id
+    except ImportError:
+        pass
+    if '_session_id' not in st.session_state:
+        st.session_state['_session_id'] = os.urandom(8).hex()
+    return st.session_state['_session_id']
+
+def share_session_log_data(key: str, loader, source: str, keep=()) -> dataset_cache.CachedDataset:
+    """
+    Store the shared dataset for key as this session's log data.
+
+    Sessions opening the same content (same key) get the same compacted,
+    read-only frame from the process-wide dataset cache; loader runs only on
+    a cache miss. The session's previous dataset is released.
+
+    Args:
+        key: Content key (dataset_cache.content_key / file_key, or a version string)
+        loader: Returns (parsed frame, metadata dict) on a miss
+        source: data_source label ("upload", "history", "processed")
+        keep: Extra columns to retain when compacting
+
+    Returns:
+        The CachedDataset (frame and the metadata the loader returned)
+    """
+    cache = dataset_cache.get_dataset_cache()
+    session_id = _session_id()
+    previous = st.session_state.get('log_data_key')
+    if previous is not None and previous != key:
+        cache.release(previous, session_id)
+
+    def load():
+        df, meta = loader()
+        meta = dict(meta or {}, raw_mb=frame_memory_mb(df))
+        if isinstance(df, pd.DataFrame):
+            df = log_index.sort_newest_first(compact_log_frame(df, keep))
+            # Built once per dataset; every session's filters slice with it
+            index = log_index.register(df)
+            meta["index_bytes"] = index.nbytes if index is not None else 0
+        return df, meta
+
+    entry = cache.acquire(key, load, session_id)
+    df = entry.frame
+    on_disk = not isinstance(df, pd.DataFrame)
+    st.session_state['log_data'] = df
+    st.session_state['log_data_key'] = key
+    st.session_state['data_source'] = source
+    st.session_state['log_data_memory'] = {
+        "rows": entry.meta.get("rows", 0) if on_disk else len(df), "on_disk": on_disk,
+        "raw_mb": entry.meta.get("raw_mb", 0.0), "mb": entry.bytes / (1024 * 1024),
+    }
+    return entry
+
+def session_log_meta() -> dict:
+    """Loader metadata of this session's shared dataset (spill aggregates, breaches, ...)"""
+    key = st.session_state.get('log_data_key')
+    entry = dataset_cache.get_dataset_cache().touch(key, _session_id()) if key is not None else None
+    return entry.meta if entry is not None else {}
+
+def release_session_log_data() -> None:
+    """Drop this session's reference to its shared dataset"""
+    key = st.session_state.pop('log_data_key', None)
+    if key is not None:
+        dataset_cache.get_dataset_cache().release(key, _session_id())
+    st.session_state['log_data'] = None
+    st.session_state['log_data_memory'] = None
+
+def touch_session_log_data() -> int:
+    """Keep this session's reference alive; returns how many sessions share the dataset"""
+    key = st.session_state.get('log_data_key')
+    if key is None:
+        return 1
+    cache = dataset_cache.get_dataset_cache()
+    entry = cache.touch(key, _session_id())
+    return entry.live_sessions(cache.ttl_seconds) if entry is not None else 1
+
 def process_log_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Apply standard log parsing and cleaning logic to a raw dataframe"""
     try:
@@ -127,8 +752,7 @@ def process_log_dataframe(df: pd.DataFrame) -> pd.DataFrame:
                     # Default to current year
                     current_year = str(datetime.now().year)
                     combined_linux = current_year + " " + df['month'].astype(str) + " " + df['date'].astype(str) + " " + df['time'].astype(str)
-                    # Parse
-                    df['timestamp'] = pd.to_datetime(combined_linux, format='%Y %b %d %H:%M:%S', errors='coerce')
+                    df['timestamp'] = parse_timestamps(combined_linux)
                 except Exception: pass
 
             # Spark/Windows Logs: Date, Time
@@ -137,29 +761,8 @@ def process_log_dataframe(df: pd.DataFrame) -> pd.DataFrame:
                     # Normalize columns to string and strip whitespace/brackets
                     d_str = df['date'].astype(str).str.strip().str.replace(r'[\[\]]', '', regex=True)
                     t_str = df['time'].astype(str).str.strip().str.replace(r'[\[\]]', '', regex=True).str.replace(',', '.') 
-                    combined = d_str + ' ' + t_str
-                    
-                    # Try parsing with multiple formats
-                    # 1. Standard with milliseconds: 2016-09-28 04:30:30.123
-                    df['timestamp'] = pd.to_datetime(combined, format='%Y-%m-%d %H:%M:%S.%f', errors='coerce')
-                    
-                    # 2. Standard without milliseconds: 2016-09-28 04:30:30
-                    mask = df['timestamp'].isna()
-                    if mask.any():
-                        df.loc[mask, 'timestamp'] = pd.to_datetime(combined[mask], format='%Y-%m-%d %H:%M:%S', errors='coerce')
-                            
-                    # 3. Short Year with slashes: 17/06/09 20:10:40 (Spark)
-                    mask = df['timestamp'].isna()
-                    if mask.any():
-                        df.loc[mask, 'timestamp'] = pd.to_datetime(combined[mask], format='%y/%m/%d %H:%M:%S', errors='coerce')
-
-                    # 4. Fallback to generic parser for any remaining (suppress warning if possible)
-                    mask = df['timestamp'].isna()
-                    if mask.any():
-                        try:
-                            df.loc[mask, 'timestamp'] = pd.to_datetime(combined[mask], errors='coerce')
-                        except: pass
-
+                    # Format sniffed once per file (2016-09-28 04:30:30.123, 17/06/09 20:10:40, ...)
+                    df['timestamp'] = parse_timestamps(d_str + ' ' + t_str)
                 except Exception as e: 
                     pass
         
@@ -177,8 +780,8 @@ def process_log_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         if 'eventtemplate' in df.columns: df.rename(columns={'eventtemplate': 'error_type'}, inplace=True)
         
         if 'timestamp' in df.columns:
-            # Use robust parsing for mixed formats (handles newlogs.csv)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], format='mixed', dayfirst=False, errors='coerce')
+            # Already datetime if built above; otherwise sniffed, with per-row fallback for mixed files (newlogs.csv)
+            df['timestamp'] = parse_timestamps(df['timestamp'])
             df = df.dropna(subset=['timestamp'])
             
         return df
@@ -187,27 +790,59 @@ def process_log_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         print(f"Error processing dataframe: {e}")
         return pd.DataFrame()
 
-def filter_data(df: pd.DataFrame, date_range, search_query: str, selected_levels: list, service_source: str) -> pd.DataFrame:
-    """Apply filters"""
+def filter_data(df, date_range, search_query: str, selected_levels: list, service_source: str) -> pd.DataFrame:
+    """Apply filters (df may also be a query_engine.ParquetSource)"""
+    # Indexed frames slice in memory; DuckDB is for Parquet sources and unindexed frames
+    index = log_index.index_for(df)
+    if isinstance(df, query_engine.ParquetSource):
+        levels = {str(v).upper() for v in query_engine.distinct_values(df, 'log_level')}
+        if not (date_range and len(date_range) == 2) and levels <= set(selected_levels or levels) \
+                and search_query in (None, "", "All"):
+            # Nothing filtered out: views aggregate the source in place instead of loading it
+            return df
+    if index is None and query_engine.should_use(df):
+        start_ts = end_ts = None
+        if date_range and len(date_range) == 2:
+            start_ts = pd.Timestamp(date_range[0])
+            end_ts = pd.Timestamp(date_range[1]) + timedelta(days=1) - timedelta(seconds=1)
+        equals = None
+        if search_query and search_query != "All":
+            columns = query_engine.columns_of(df)
+            equals = ('error_type' if 'error_type' in columns else 'message', search_query)
+        return query_engine.filter_logs(
+            df, start=start_ts, end=end_ts, levels=selected_levels, upper_levels=True, equals=equals
+        )
+
     if df.empty: return df
-    filtered_df = df.copy()
+    filtered_df = df
     
     # Time Range
+    rows = None
     if date_range and len(date_range) == 2:
         start_date, end_date = date_range
         # Convert to datetime64[ns] to match df
         start_ts = pd.Timestamp(start_date)
         end_ts = pd.Timestamp(end_date) + timedelta(days=1) - timedelta(seconds=1)
-        if 'timestamp' in filtered_df.columns:
+        if index is not None and index.keys is not None:
+            rows = index.time_slice(start_ts, end_ts)
+        elif 'timestamp' in filtered_df.columns:
             filtered_df = filtered_df[(filtered_df['timestamp'] >= start_ts) & (filtered_df['timestamp'] <= end_ts)]
         
     # Log Levels
     if 'log_level' in filtered_df.columns and selected_levels:
         # Filter if selected, if none selected imply ALL? Or None? Usually ALL if empty or check "All". 
         # But here we have explicit checkboxes.
-        if selected_levels:
+        if index is not None:
+            # Case insensitive; None when every level is selected
+            positions = index.level_positions(selected_levels, upper=True, within=rows)
+            if positions is not None:
+                filtered_df, rows = df.take(positions), None
+        else:
             # Case insensitive
             filtered_df = filtered_df[filtered_df['log_level'].astype(str).str.upper().isin(selected_levels)]
+    if rows is not None:
+        # Sorted range: a positional slice, no copy
+        filtered_df = df.iloc[rows]
             
     # Search (now exact match via dropdown)
     if search_query and search_query != "All":
@@ -0,0 +1,200 @@
+"""
+Dataset Cache
+Process-wide cache of parsed log datasets shared by all Streamlit sessions.
+
+Datasets are keyed by a hash of their content (uploaded bytes, history
+Parquet file, processed table version), so analysts opening the same data
+share one compacted, read-only DataFrame instead of holding private copies.
+
+- Each entry records the sessions referencing it; a session holds at most one
+  dataset and releases it when it loads another one or starts a new analysis
+- Sessions that stop touching an entry for session_ttl_minutes (closed tabs)
+  no longer count as references
+- Unreferenced entries are evicted least-recently-used first once the cache
+  exceeds budget_mb; referenced ones are never evicted
+- Entries may also be a query_engine.ParquetSource over files on disk (large
+  uploads); the files stay pinned while a session references the entry
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+CONFIG_PATH = str(Path(__file__).resolve().parents[3].joinpath("config", "config.yaml"))
+
+DEFAULT_SETTINGS = {
+    "budget_mb": 4096,
+    "session_ttl_minutes": 60,
+}
+
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+_cache: Optional["DatasetCache"] = None
+_cache_lock = threading.Lock()
+
+
+class CachedDataset:
+    """One shared dataset: the frame, loader metadata and the sessions using it"""
+
+    def __init__(self, key: str, frame: pd.DataFrame, meta: Optional[dict] = None):
+        self.key = key
+        self.frame = frame
+        self.meta = meta or {}
+        self.bytes = int(frame.memory_usage(deep=True).sum()) if isinstance(frame, pd.DataFrame) else 0
+        self.bytes += int(self.meta.get("index_bytes", 0))
+        self.sessions: Dict[str, float] = {}  # session id -> last access (monotonic)
+
+    def live_sessions(self, ttl_seconds: float) -> int:
+        cutoff = time.monotonic() - ttl_seconds
+        return sum(1 for seen in self.sessions.values() if seen >= cutoff)
+
+
+class DatasetCache:
+    """Reference-counted, memory-budgeted LRU cache of shared log frames"""
+
+    def __init__(self, budget_mb: float = DEFAULT_SETTINGS["budget_mb"],
+                 session_ttl_minutes: float = DEFAULT_SETTINGS["session_ttl_minutes"]):
+        """
+        Args:
+            budget_mb: Memory budget for all cached frames
+            session_ttl_minutes: Idle time after which a session's reference lapses
+        """
+        self.budget_bytes = int(float(budget_mb) * 1024 * 1024)
+        self.ttl_seconds = float(session_ttl_minutes) * 60
+        self._entries: "OrderedDict[str, CachedDataset]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def acquire(self, key: str, loader: Callable[[], Tuple[pd.DataFrame, Optional[dict]]],
+                session_id: str) -> CachedDataset:
+        """
+        Shared dataset for key, loading it once if no session has it yet.
+
+        Args:
+            key: Content key (see content_key / file_key)
+            loader: Returns (frame, metadata); called at most once per key at a time
+            session_id: Session taking a reference
+        """
+        with self._lock:
+            entry = self._hit(key, session_id)
+            if entry is not None:
+                return entry
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Load outside the cache lock; concurrent sessions asking for the same key wait here
+        with key_lock:
+            with self._lock:
+                entry = self._hit(key, session_id)
+                if entry is not None:
+                    return entry
+            frame, meta = loader()
+            entry = CachedDataset(key, frame, meta)
+            with self._lock:
+                entry.sessions[session_id] = time.monotonic()
+                self._entries[key] = entry
+                self._loading.pop(key, None)
+                self._evict()
+            return entry
+
+    def touch(self, key: str, session_id: str) -> Optional[CachedDataset]:
+        """Refresh a session's reference (call on every rerun that uses the dataset)"""
+        with self._lock:
+            return self._hit(key, session_id)
+
+    def release(self, key: Optional[str], session_id: str) -> None:
+        """Drop a session's reference; the entry stays cached until evicted"""
+        if key is None:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.sessions.pop(session_id, None)
+            self._evict()
+
+    def pinned(self, field: str) -> set:
+        """meta[field] of the entries that live sessions reference (e.g. spill dirs in use)"""
+        with self._lock:
+            return {e.meta[field] for e in self._entries.values()
+                    if e.meta.get(field) and e.live_sessions(self.ttl_seconds)}
+
+    def forget(self, field: str, values: Iterable) -> None:
+        """Drop unreferenced entries whose meta[field] is in values (their files are being deleted)"""
+        values = set(values)
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.meta.get(field) in values and not entry.live_sessions(self.ttl_seconds):
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "datasets": len(self._entries),
+                "mb": sum(e.bytes for e in self._entries.values()) / (1024 * 1024),
+                "budget_mb": self.budget_bytes / (1024 * 1024),
+                "sessions": {k: e.live_sessions(self.ttl_seconds) for k, e in self._entries.items()},
+            }
+
+    def _hit(self, key: str, session_id: str) -> Optional[CachedDataset]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.sessions[session_id] = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self) -> None:
+        total = sum(e.bytes for e in self._entries.values())
+        for key in list(self._entries):  # least recently used first
+            if total <= self.budget_bytes:
+                break
+            entry = self._entries[key]
+            if entry.live_sessions(self.ttl_seconds):
+                continue
+            total -= entry.bytes
+            del self._entries[key]
+
+
+def content_key(streams: Iterable, prefix: str = "upload") -> str:
+    """SHA-256 over the bytes of file-like objects (rewound before and after)"""
+    digest = hashlib.sha256()
+    for stream in streams:
+        stream.seek(0)
+        for block in iter(lambda: stream.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+        stream.seek(0)
+        digest.update(b"\0")  # file boundary
+    return f"{prefix}:{digest.hexdigest()}"
+
+
+def file_key(path: str, prefix: str = "file") -> str:
+    """SHA-256 of a file's content"""
+    with open(path, "rb") as f:
+        return content_key([f], prefix)
+
+
+def load_settings() -> dict:
+    """dashboard.dataset_cache from config.yaml merged over DEFAULT_SETTINGS"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        import yaml
+        with open(CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        settings.update((config.get("dashboard") or {}).get("dataset_cache") or {})
+    except Exception:
+        pass
+    return settings
+
+
+def get_dataset_cache() -> DatasetCache:
+    """The process-wide DatasetCache (shared by every Streamlit session in this server)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = load_settings()
+            _cache = DatasetCache(settings["budget_mb"], settings["session_ttl_minutes"])
+        return _cache
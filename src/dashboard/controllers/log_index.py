@@ -0,0 +1,162 @@
+"""
+Log Index
+Row-position index over a session's log frame, so the filters that run on
+every Streamlit rerun slice instead of scanning.
+
+- The frame is kept sorted newest first (rows without a timestamp last); an
+  ascending int64 copy of the timestamps turns a date range into two
+  searchsorted calls and a positional slice, without copying the frame
+- Each log level maps to the sorted row positions holding it; a level filter
+  is a take of those positions (restricted to the date range by searchsorted)
+
+Indexes are built once when a dataset is loaded (register) and looked up by
+frame identity (index_for); filters fall back to boolean masks for frames
+without one.
+"""
+
+import threading
+import weakref
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_indexes: Dict[int, Tuple[weakref.ref, "LogIndex"]] = {}
+_indexes_lock = threading.Lock()
+
+
+class LogIndex:
+    """Sorted timestamp keys and per-level row positions of one frame"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.rows = len(df)
+        position_type = np.int32 if self.rows < 2 ** 31 else np.int64
+
+        self.keys = None  # ascending int64 timestamps of the rows that have one
+        self.unit = None
+        self.dated_rows = 0
+        if "timestamp" in df.columns and _is_naive_datetime(df["timestamp"]):
+            values = df["timestamp"].to_numpy()
+            self.unit = np.datetime_data(values.dtype)[0]
+            self.dated_rows = int(self.rows - np.isnat(values).sum())
+            self.keys = np.ascontiguousarray(values[:self.dated_rows].view("i8")[::-1])
+
+        self.levels: Dict[str, np.ndarray] = {}
+        if "log_level" in df.columns:
+            codes, uniques = _codes(df["log_level"])
+            order = np.argsort(codes, kind="stable").astype(position_type)
+            bounds = np.cumsum(np.bincount(codes + 1, minlength=len(uniques) + 1))
+            for i, value in enumerate(uniques):
+                # codes + 1 puts missing levels (-1) in bin 0
+                positions = order[bounds[i]:bounds[i + 1]]
+                if len(positions):
+                    self.levels[value] = positions
+
+    @property
+    def nbytes(self) -> int:
+        keys = self.keys.nbytes if self.keys is not None else 0
+        return keys + sum(p.nbytes for p in self.levels.values())
+
+    def time_slice(self, start=None, end=None) -> Optional[slice]:
+        """Row positions with start <= timestamp <= end, or None without timestamps"""
+        if self.keys is None:
+            return None
+        lo, hi = 0, len(self.keys)
+        if start is not None:
+            lo = int(np.searchsorted(self.keys, -(-self._nanos(start) // self._unit_nanos), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(self.keys, self._nanos(end) // self._unit_nanos, side="right"))
+        # Keys ascend while rows descend: ascending [lo, hi) is rows [dated - hi, dated - lo)
+        return slice(self.dated_rows - hi, self.dated_rows - lo) if hi > lo else slice(0, 0)
+
+    def level_positions(self, levels: Iterable[str], upper: bool = False,
+                        within: Optional[slice] = None) -> Optional[np.ndarray]:
+        """
+        Sorted row positions whose level is in levels, or None when that is every row.
+
+        Args:
+            levels: Levels to keep
+            upper: Compare str(level).upper(), as the dashboard filter does
+            within: Only positions inside this slice
+        """
+        wanted = set(levels)
+        matched = [p for value, p in self.levels.items()
+                   if (str(value).upper() if upper else value) in wanted]
+        if len(matched) == len(self.levels) and sum(len(p) for p in matched) == self.rows:
+            return None
+        if within is not None:
+            matched = [p[np.searchsorted(p, within.start):np.searchsorted(p, within.stop)] for p in matched]
+        if not matched:
+            return np.empty(0, dtype=np.intp)
+        return matched[0] if len(matched) == 1 else np.sort(np.concatenate(matched))
+
+    @property
+    def _unit_nanos(self) -> int:
+        # Keys are in the column's unit (pandas reads Parquet timestamps as us, s, ...)
+        return int(np.timedelta64(1, self.unit) // np.timedelta64(1, "ns"))
+
+    @staticmethod
+    def _nanos(value) -> int:
+        return pd.Timestamp(value).as_unit("ns").value
+
+
+def _is_naive_datetime(series: pd.Series) -> bool:
+    return isinstance(series.dtype, np.dtype) and series.dtype.kind == "M"
+
+
+def _codes(series: pd.Series):
+    """Integer codes (-1 for missing) and the distinct values"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64), list(series.cat.categories)
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64), list(uniques)
+
+
+def is_sorted_newest_first(df: pd.DataFrame) -> bool:
+    """Timestamps non-increasing with missing ones at the end"""
+    if "timestamp" not in df.columns or not _is_naive_datetime(df["timestamp"]):
+        return False
+    values = df["timestamp"].to_numpy()
+    missing = np.isnat(values)
+    dated = len(values) - int(missing.sum())
+    if missing[:dated].any():
+        return False
+    keys = values[:dated].view("i8")
+    return bool((keys[1:] <= keys[:-1]).all())
+
+
+def sort_newest_first(df: pd.DataFrame) -> pd.DataFrame:
+    """df ordered newest first (no copy if it already is)"""
+    if df is None or df.empty or "timestamp" not in df.columns or is_sorted_newest_first(df):
+        return df
+    return df.sort_values("timestamp", ascending=False, kind="stable", na_position="last").reset_index(drop=True)
+
+
+def register(df: pd.DataFrame) -> Optional[LogIndex]:
+    """Build the index of a frame that will be filtered repeatedly (sorted newest first)"""
+    if df is None or df.empty or not is_sorted_newest_first(df):
+        return None
+    index = LogIndex(df)
+    key = id(df)
+    with _indexes_lock:
+        _indexes[key] = (weakref.ref(df), index)
+    # Dropped together with the frame (e.g. on dataset cache eviction)
+    weakref.finalize(df, _forget, key, index)
+    return index
+
+
+def index_for(df) -> Optional[LogIndex]:
+    """Index registered for exactly this frame object"""
+    if not isinstance(df, pd.DataFrame):
+        return None
+    with _indexes_lock:
+        found = _indexes.get(id(df))
+    if found is None or found[0]() is not df or found[1].rows != len(df):
+        return None
+    return found[1]
+
+
+def _forget(key: int, index: LogIndex) -> None:
+    with _indexes_lock:
+        if key in _indexes and _indexes[key][1] is index:
+            del _indexes[key]
@@ -0,0 +1,294 @@
+"""
+Query Engine Module
+Runs the dashboard's filters and aggregations (filter_data, search_logs,
+calculate_metrics, trend buckets, top messages) inside DuckDB when it is
+installed, instead of on a pandas copy of the data.
+
+Inputs are either a pandas DataFrame (scanned in place through Arrow) or a
+ParquetSource pointing at Parquet files, which DuckDB reads directly with
+projection and filter pushdown. Queries over Parquet run out of core: past
+dashboard.engine.memory_limit, DuckDB spills to temp_directory.
+
+Without duckdb (or with dashboard.engine.enabled: false) callers fall back to
+their pandas implementations.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+CONFIG_PATH = str(PROJECT_ROOT.joinpath("config", "config.yaml"))
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "memory_limit": "2GB",
+    "temp_directory": "data/duckdb_tmp",
+    "threads": None,
+    "min_rows": 50000,
+}
+
+# Dashboard column -> candidate columns in the pipeline's processed Parquet
+SOURCE_COLUMNS = {
+    "timestamp": ["timestamp"],
+    "log_level": ["log_level"],
+    "service": ["service_name", "service"],
+    "message": ["message"],
+    "error_type": ["error_type"],
+}
+
+# pandas resample rules the dashboard uses -> DuckDB date_trunc parts
+_TRUNC_UNITS = {"T": "minute", "min": "minute", "h": "hour", "H": "hour", "D": "day"}
+
+_local = threading.local()
+_database = None
+_database_lock = threading.Lock()
+
+
+class ParquetSource:
+    """Parquet files queried in place by DuckDB (never loaded whole into pandas)"""
+
+    def __init__(self, files: List[str]):
+        self.files = list(files)
+        self._columns = None
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    @property
+    def empty(self) -> bool:
+        return not self.files
+
+    @property
+    def columns(self) -> List[str]:
+        """Dashboard columns available in the files (same names as in-memory frames)"""
+        if self._columns is None:
+            self._columns = columns_of(self)
+        return self._columns
+
+    def relation_sql(self, cursor) -> str:
+        paths = ", ".join("'" + f.replace("'", "''") + "'" for f in self.files)
+        scan = f"read_parquet([{paths}], hive_partitioning = true, union_by_name = true)"
+        available = {row[0]: row[1] for row in cursor.execute(f"DESCRIBE SELECT * FROM {scan}").fetchall()}
+
+        select = []
+        for name, candidates in SOURCE_COLUMNS.items():
+            source = next((c for c in candidates if c in available), None)
+            if source is None:
+                continue
+            if name == "timestamp" and not available[source].startswith("TIMESTAMP"):
+                # Pandas-fallback output stores timestamps as strings
+                select.append(f'TRY_CAST("{source}" AS TIMESTAMP) AS timestamp')
+            elif name == "timestamp" and "TIME ZONE" in available[source]:
+                select.append(f'CAST("{source}" AS TIMESTAMP) AS timestamp')
+            else:
+                select.append(f'"{source}" AS "{name}"')
+        return f"(SELECT {', '.join(select)} FROM {scan})"
+
+
+@lru_cache(maxsize=1)
+def load_settings() -> dict:
+    """dashboard.engine from config.yaml merged over DEFAULT_SETTINGS"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        import yaml
+        with open(CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        settings.update((config.get("dashboard") or {}).get("engine") or {})
+    except Exception:
+        pass
+    return settings
+
+
+def is_available() -> bool:
+    return duckdb is not None and bool(load_settings().get("enabled", True))
+
+
+def should_use(data) -> bool:
+    """Engine for Parquet sources and large frames; small frames stay in pandas (lower overhead)"""
+    if not is_available():
+        return False
+    if isinstance(data, ParquetSource):
+        return True
+    return isinstance(data, pd.DataFrame) and len(data) >= int(load_settings().get("min_rows", 0))
+
+
+def _cursor():
+    """Per-thread cursor on one shared in-memory database (Streamlit reruns on several threads)"""
+    global _database
+    cursor = getattr(_local, "cursor", None)
+    if cursor is not None:
+        return cursor
+
+    with _database_lock:
+        if _database is None:
+            settings = load_settings()
+            temp_dir = settings.get("temp_directory") or DEFAULT_SETTINGS["temp_directory"]
+            if not os.path.isabs(temp_dir):
+                temp_dir = str(PROJECT_ROOT.joinpath(temp_dir))
+            os.makedirs(temp_dir, exist_ok=True)
+
+            config = {"memory_limit": str(settings.get("memory_limit") or DEFAULT_SETTINGS["memory_limit"]),
+                      "temp_directory": temp_dir}
+            if settings.get("threads"):
+                config["threads"] = int(settings["threads"])
+            _database = duckdb.connect(":memory:", config=config)
+    _local.cursor = _database.cursor()
+    return _local.cursor
+
+
+def _run(data, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+    """Run sql with {logs} bound to data (DataFrame or ParquetSource)"""
+    cursor = _cursor()
+    if isinstance(data, ParquetSource):
+        return cursor.execute(sql.format(logs=data.relation_sql(cursor)), params or []).df()
+
+    # DuckDB scans the pandas frame in place; no per-call conversion of the whole frame
+    cursor.register("logs_view", data)
+    try:
+        return cursor.execute(sql.format(logs="logs_view"), params or []).df()
+    finally:
+        cursor.unregister("logs_view")
+
+
+def columns_of(data) -> List[str]:
+    """Column names of a DataFrame or ParquetSource"""
+    if isinstance(data, ParquetSource):
+        return list(_run(data, "SELECT * FROM {logs} LIMIT 0").columns)
+    return list(data.columns)
+
+
+def build_where(
+    columns: List[str],
+    start=None,
+    end=None,
+    levels: Optional[List[str]] = None,
+    upper_levels: bool = False,
+    services: Optional[List[str]] = None,
+    equals: Optional[Tuple[str, object]] = None,
+    text: Optional[str] = None,
+    text_columns: Tuple[str, ...] = ()
+) -> Tuple[str, list]:
+    """
+    WHERE clause (with positional parameters) for the dashboard filters.
+    Filters on columns the data lacks are skipped, as the pandas versions do.
+
+    Args:
+        columns: Columns present in the data
+        start, end: Inclusive timestamp bounds
+        levels: Keep these log levels; upper_levels compares upper-cased values
+        services: Keep these services
+        equals: (column, value) exact match
+        text: Case-insensitive pattern searched in text_columns
+    """
+    conditions, params = [], []
+    if "timestamp" in columns:
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(pd.Timestamp(end).to_pydatetime())
+    if levels and "log_level" in columns:
+        column = "upper(CAST(log_level AS VARCHAR))" if upper_levels else "log_level"
+        conditions.append(f"{column} IN ({', '.join('?' * len(levels))})")
+        params.extend(levels)
+    if services and "service" in columns:
+        conditions.append(f"service IN ({', '.join('?' * len(services))})")
+        params.extend(services)
+    if equals and equals[0] in columns:
+        conditions.append(f'"{equals[0]}" = ?')
+        params.append(equals[1])
+    if text:
+        searched = [c for c in text_columns if c in columns]
+        if searched:
+            conditions.append("(" + " OR ".join(
+                f'coalesce(regexp_matches(lower(CAST("{c}" AS VARCHAR)), ?), false)' for c in searched
+            ) + ")")
+            params.extend([text] * len(searched))
+        else:
+            conditions.append("false")
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def filter_logs(data, order_by_time: bool = False, limit: Optional[int] = None, **filters) -> pd.DataFrame:
+    """Rows matching build_where(**filters); Parquet sources come back newest first"""
+    columns = columns_of(data)
+    where, params = build_where(columns, **filters)
+    order = " ORDER BY timestamp DESC" if (order_by_time or isinstance(data, ParquetSource)) and "timestamp" in columns else ""
+    return _run(data, "SELECT * FROM {logs}" + where + order + (f" LIMIT {int(limit)}" if limit else ""), params)
+
+
+def count_logs(data, **filters) -> int:
+    """Number of rows matching build_where(**filters)"""
+    where, params = build_where(columns_of(data), **filters)
+    return int(_run(data, "SELECT count(*) AS n FROM {logs}" + where, params).iloc[0]["n"])
+
+
+def time_bounds(data) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """(oldest, newest) timestamp, or (None, None) without timestamps"""
+    if "timestamp" not in columns_of(data):
+        return None, None
+    row = _run(data, "SELECT min(timestamp) AS lo, max(timestamp) AS hi FROM {logs}").iloc[0]
+    return (None if pd.isna(row["lo"]) else pd.Timestamp(row["lo"]),
+            None if pd.isna(row["hi"]) else pd.Timestamp(row["hi"]))
+
+
+def distinct_values(data, column: str) -> List:
+    """Sorted non-null values of column (empty if the data lacks it)"""
+    if column not in columns_of(data):
+        return []
+    values = _run(data, f'SELECT DISTINCT CAST("{column}" AS VARCHAR) AS value FROM {{logs}} WHERE "{column}" IS NOT NULL ORDER BY 1')
+    return values["value"].tolist()
+
+
+def level_counts(data) -> Tuple[int, int, int]:
+    """(total, errors, warnings) in one scan"""
+    if "log_level" not in columns_of(data):
+        row = _run(data, "SELECT count(*) AS total FROM {logs}").iloc[0]
+        return int(row["total"]), 0, 0
+    row = _run(data, """
+        SELECT count(*) AS total,
+               count(*) FILTER (WHERE log_level = 'ERROR') AS errors,
+               count(*) FILTER (WHERE log_level = 'WARN') AS warnings
+        FROM {logs}
+    """).iloc[0]
+    return int(row["total"]), int(row["errors"]), int(row["warnings"])
+
+
+def bucket_counts(data, level: str, rule: str) -> pd.DataFrame:
+    """
+    Equivalent of data[data.log_level == level].set_index('timestamp').resample(rule).size()
+    with empty buckets dropped. Minute/hour/day buckets come straight from DuckDB;
+    other rules (week, month end) resample the engine's daily counts in pandas.
+    """
+    unit = _TRUNC_UNITS.get(rule, "day")
+    counts = _run(data, f"""
+        SELECT date_trunc('{unit}', timestamp) AS timestamp, count(*) AS count
+        FROM {{logs}}
+        WHERE log_level = ? AND timestamp IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """, [level])
+    if rule not in _TRUNC_UNITS and not counts.empty:
+        counts = counts.set_index("timestamp")["count"].resample(rule).sum().reset_index(name="count")
+    return counts[counts["count"] > 0].reset_index(drop=True)
+
+
+def top_values(data, column: str, n: int = 5, level: Optional[str] = "ERROR") -> pd.Series:
+    """Equivalent of data[data.log_level == level][column].value_counts().head(n)"""
+    where, params = (" WHERE log_level = ?", [level]) if level else ("", [])
+    counts = _run(data, f"""
+        SELECT "{column}" AS value, count(*) AS count
+        FROM {{logs}}{where}{' AND' if where else ' WHERE'} "{column}" IS NOT NULL
+        GROUP BY 1 ORDER BY 2 DESC LIMIT {int(n)}
+    """, params)
+    return pd.Series(counts["count"].to_numpy(), index=pd.Index(counts["value"], name=column), name="count")
@@ -1,7 +1,31 @@
 import pandas as pd
 from datetime import datetime
 
-def search_logs(df: pd.DataFrame, query: str = "", filters: dict = None) -> pd.DataFrame:
+try:
+    from controllers import query_engine
+    from controllers import log_index
+except ImportError:
+    import query_engine
+    import log_index
+
+def _engine_filters(query: str, filters: dict) -> dict:
+    """query_engine.build_where arguments for a search"""
+    filters = filters or {}
+    start, end = filters.get('date_range') or (None, None)
+    return dict(
+        start=start,
+        end=end,
+        levels=filters.get('levels'),
+        services=filters.get('services'),
+        text=query.lower().strip() if query else None,
+        text_columns=('message', 'service', 'log_level')
+    )
+
+def count_matches(df, query: str = "", filters: dict = None) -> int:
+    """Number of rows search_logs would return, counted by the engine (for data kept on disk)"""
+    return query_engine.count_logs(df, **_engine_filters(query, filters))
+
+def search_logs(df: pd.DataFrame, query: str = "", filters: dict = None, limit: int = None) -> pd.DataFrame:
     """
     Search and filter logs based on isolated search parameters.
     
@@ -12,28 +36,34 @@ def search_logs(df: pd.DataFrame, query: str = "", filters: dict = None) -> pd.D
                  - date_range: (start_date, end_date) tuple or None
                  - levels: list of log levels (e.g., ['ERROR', 'INFO']) or None
                  - services: list of services/sources or None
+        limit: Newest rows to return from a query_engine.ParquetSource (None = all)
     
     Returns:
         Filtered DataFrame.
     """
+    # Indexed frames slice in memory; DuckDB is for Parquet sources and unindexed frames
+    index = log_index.index_for(df)
+    if index is None and query_engine.should_use(df):
+        return query_engine.filter_logs(df, limit=limit, **_engine_filters(query, filters))
+
     if df.empty:
         return df
         
-    result_df = df.copy()
+    result_df = df
     
     # 1. Apply Filters First (Performance)
     if filters:
         # Date Level Isolation
         date_range = filters.get('date_range')
+        rows = None
         if date_range:
             start, end = date_range
-            # Ensure timestamp column exists and is datetime
-            if 'timestamp' in result_df.columns:
-                 # Standardize to datetime if not already (should be handled by loader, but safe check)
-                # Standardize to datetime if not already
-                s_ts = pd.Timestamp(start)
-                e_ts = pd.Timestamp(end)
-                
+            s_ts = pd.Timestamp(start)
+            e_ts = pd.Timestamp(end)
+            if index is not None and index.keys is not None:
+                # Sorted timestamps: two binary searches instead of two full comparisons
+                rows = index.time_slice(s_ts, e_ts)
+            elif 'timestamp' in result_df.columns:
                 result_df = result_df[
                     (result_df['timestamp'] >= s_ts) & 
                     (result_df['timestamp'] <= e_ts)
@@ -42,7 +72,14 @@ def search_logs(df: pd.DataFrame, query: str = "", filters: dict = None) -> pd.D
         # Log Level Isolation
         levels = filters.get('levels')
         if levels and 'log_level' in result_df.columns:
-            result_df = result_df[result_df['log_level'].isin(levels)]
+            if index is not None:
+                positions = index.level_positions(levels, within=rows)
+                if positions is not None:
+                    result_df, rows = df.take(positions), None
+            else:
+                result_df = result_df[result_df['log_level'].isin(levels)]
+        if rows is not None:
+            result_df = df.iloc[rows]
 
         # Service Isolation
         services = filters.get('services')
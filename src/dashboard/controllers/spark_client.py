@@ -0,0 +1,140 @@
+"""
+Spark Client Module
+Thin client of the persistent Spark service (src/spark/spark_service.py).
+
+When spark.connect.url is set in config.yaml (or SPARK_REMOTE is exported) and
+pyspark's Spark Connect client is installed, whole-table work on the pipeline's
+processed logs (totals and the dashboard alert rules) runs in the warm session,
+on its cached global_temp.processed_logs view when that view covers the same
+live files, instead of as a local scan of the Parquet files.
+
+Interactive filters and charts keep running in DuckDB over the same files.
+Without the service (or if it cannot be reached) callers fall back to their
+local implementations.
+"""
+
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from controllers import query_engine
+except ImportError:
+    import query_engine
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+CONFIG_PATH = str(PROJECT_ROOT.joinpath("config", "config.yaml"))
+
+# Published by spark_service.warm_datasets
+PROCESSED_VIEW = "global_temp.processed_logs"
+PROCESSED_FILES_VIEW = "global_temp.processed_logs_files"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def load_settings() -> dict:
+    """spark.connect from config.yaml"""
+    try:
+        import yaml
+        with open(CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        return (config.get("spark") or {}).get("connect") or {}
+    except Exception:
+        return {}
+
+
+def get_connect_url() -> str:
+    """Spark Connect URL of the persistent service ('' when not configured)"""
+    return os.environ.get("SPARK_REMOTE") or load_settings().get("url") or ""
+
+
+def get_session():
+    """Shared Spark Connect client session, or None without a configured, reachable service"""
+    global _session
+    url = get_connect_url()
+    if not url:
+        return None
+
+    with _session_lock:
+        if _session is None:
+            try:
+                from pyspark.sql import SparkSession
+                _session = SparkSession.builder.remote(url).getOrCreate()
+            except Exception as e:
+                logger.warning(f"Spark service at {url} unavailable: {e}")
+                return None
+        return _session
+
+
+def _processed_frame(spark, files: List[str], data_dir: str):
+    """Processed logs with the dashboard's column names, from the cached view if it covers files"""
+    from pyspark.sql import functions as F
+
+    wanted = sorted(os.path.abspath(f) for f in files)
+    try:
+        cached = sorted(row["path"] for row in spark.table(PROCESSED_FILES_VIEW).collect())
+    except Exception:
+        cached = None
+    if cached == wanted:
+        df = spark.table(PROCESSED_VIEW)
+    else:
+        df = spark.read.option("basePath", os.path.abspath(data_dir)).parquet(*wanted)
+
+    select = []
+    for name, candidates in query_engine.SOURCE_COLUMNS.items():
+        source = next((c for c in candidates if c in df.columns), None)
+        if source is not None:
+            select.append(F.col(source).alias(name))
+    return df.select(*select)
+
+
+def processed_summary(files: List[str], data_dir: str, rules: Optional[list] = None,
+                      time_column: str = "timestamp") -> Optional[Dict]:
+    """
+    Totals and dashboard rule breaches of the processed logs, computed by the service
+
+    Returns:
+        {"rows", "levels", "breaches"} as open_processed_logs builds it, or None
+        if the service is not configured or the query failed
+    """
+    spark = get_session()
+    if spark is None or not files:
+        return None
+
+    try:
+        from pyspark.sql import functions as F
+        try:
+            from src.spark import alert_rules
+        except ImportError:
+            sys.path.append(str(PROJECT_ROOT))
+            from src.spark import alert_rules
+
+        df = _processed_frame(spark, files, data_dir)
+        if "log_level" in df.columns:
+            row = df.agg(
+                F.count(F.lit(1)).alias("total"),
+                F.count(F.when(F.col("log_level") == "ERROR", 1)).alias("errors"),
+                F.count(F.when(F.col("log_level") == "WARN", 1)).alias("warnings"),
+            ).first()
+            total, errors, warnings = row["total"], row["errors"], row["warnings"]
+        else:
+            total, errors, warnings = df.count(), 0, 0
+        summary = {"rows": int(total), "levels": {"ERROR": int(errors), "WARN": int(warnings)}, "breaches": None}
+
+        if rules is not None:
+            # Same normalisation as the local scan (_normalise_processed)
+            if "timestamp" in df.columns:
+                df = df.withColumn("timestamp", F.col("timestamp").cast("timestamp")).where(F.col("timestamp").isNotNull())
+            if "log_level" in df.columns:
+                df = df.withColumn("log_level", F.upper(F.coalesce(F.col("log_level").cast("string"), F.lit("UNKNOWN"))))
+            summary["breaches"] = alert_rules.evaluate_rules_spark(df, rules, time_column=time_column)
+        return summary
+    except Exception as e:
+        logger.warning(f"Spark service query failed, using the local scan: {e}")
+        return None
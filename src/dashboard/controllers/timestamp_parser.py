@@ -0,0 +1,240 @@
+"""
+Timestamp Parser
+Parses a column of log timestamps by sniffing the format from a sample once,
+then converting the whole column with a fast path:
+
+- Fixed-width layouts (2024-01-31 12:00:00[.123], 17/06/09 20:10:40, ...) are
+  sliced byte-wise from the Arrow string buffer with numpy and converted
+  straight to int64 epoch nanoseconds, without per-row parsing.
+- Other known formats (e.g. "2025 Jun 14 15:16:01") go through
+  pd.to_datetime with that one fixed format.
+
+Rows the fast path rejects are tried against the other known layouts and
+formats (so a stray Spark "17/06/09 20:10:40" in an ISO file is still read
+as %y/%m/%d); only what none of them match goes to the slow pd.to_datetime
+(format='mixed') parser.
+"""
+
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_SIZE = 200
+MIN_MATCH_RATIO = 0.9
+
+# name -> (sniffing regex, field offsets, separator positions -> allowed chars)
+_FIXED_LAYOUTS = {
+    "%Y-%m-%d %H:%M:%S": (
+        re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,](\d{1,9}))?$"),
+        {"Y": (0, 4), "m": (5, 7), "d": (8, 10), "H": (11, 13), "M": (14, 16), "S": (17, 19)},
+        {4: "-", 7: "-", 10: " T", 13: ":", 16: ":"},
+    ),
+    "%Y/%m/%d %H:%M:%S": (
+        re.compile(r"^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}(?:[.,](\d{1,9}))?$"),
+        {"Y": (0, 4), "m": (5, 7), "d": (8, 10), "H": (11, 13), "M": (14, 16), "S": (17, 19)},
+        {4: "/", 7: "/", 10: " ", 13: ":", 16: ":"},
+    ),
+    # Spark: 17/06/09 20:10:40
+    "%y/%m/%d %H:%M:%S": (
+        re.compile(r"^\d{2}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}(?:[.,](\d{1,9}))?$"),
+        {"y": (0, 2), "m": (3, 5), "d": (6, 8), "H": (9, 11), "M": (12, 14), "S": (15, 17)},
+        {2: "/", 5: "/", 8: " ", 11: ":", 14: ":"},
+    ),
+}
+
+# Formats without a fixed width, tried in order after the fixed layouts
+_STRPTIME_FORMATS = [
+    "%Y %b %d %H:%M:%S",   # Linux syslog with the year prepended
+    "%b %d %Y %H:%M:%S",
+    "%d/%b/%Y:%H:%M:%S",   # Apache access logs
+    "%m/%d/%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M:%S",
+    "%Y%m%d %H%M%S",
+]
+
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def sniff_format(sample: pd.Series) -> Optional[tuple]:
+    """
+    Pick the format most of the sample matches.
+
+    Returns:
+        ("fixed", layout name, fraction digits), ("strptime", format, None) or None
+    """
+    sample = sample.dropna().astype(str).str.strip()
+    sample = sample[sample != ""]
+    if sample.empty:
+        return None
+
+    for name, (pattern, _, _) in _FIXED_LAYOUTS.items():
+        matches = sample.str.match(pattern)
+        if matches.mean() >= MIN_MATCH_RATIO:
+            # Width of the fraction of the first matching row; other widths fall to the slow path
+            fraction = pattern.match(sample[matches].iloc[0]).group(1)
+            return ("fixed", name, len(fraction) if fraction else 0)
+
+    for fmt in _STRPTIME_FORMATS:
+        parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+        if parsed.notna().mean() >= MIN_MATCH_RATIO:
+            return ("strptime", fmt, None)
+    return None
+
+
+def _fixed_width_rows(strings: pd.Series, width: int):
+    """
+    Rows whose UTF-8 encoding is exactly width bytes, as a (width, rows) uint8
+    matrix taken straight from the Arrow data buffer, plus their positions.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Zero-copy for Arrow-backed string columns; large_string keeps offsets int64 either way
+    array = pa.array(strings, from_pandas=True)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    array = array.cast(pa.large_string())
+    mask = pc.fill_null(pc.equal(pc.binary_length(array), width), False)
+    positions = np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+    fixed = pc.filter(array, mask)
+    if len(fixed) == 0:
+        return positions, np.empty((width, 0), dtype=np.uint8)
+
+    offsets = np.frombuffer(fixed.buffers()[1], dtype=np.int64)[fixed.offset:fixed.offset + len(fixed) + 1]
+    data = np.frombuffer(fixed.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+    # Transposed so each character position is one contiguous row
+    return positions, np.ascontiguousarray(data.reshape(-1, width).T)
+
+
+def _parse_fixed(strings: pd.Series, name: str, fraction_digits: int) -> pd.Series:
+    """Vectorised parse of one fixed-width layout; non-conforming rows become NaT"""
+    _, fields, separators = _FIXED_LAYOUTS[name]
+    width = max(end for _, end in fields.values())
+    if fraction_digits:
+        separators = dict(separators)
+        separators[width] = ".,"
+        fields = dict(fields, f=(width + 1, width + 1 + fraction_digits))
+        width += 1 + fraction_digits
+
+    positions, chars = _fixed_width_rows(strings, width)
+    valid = np.ones(len(positions), dtype=bool)
+
+    for position, allowed in separators.items():
+        column = chars[position]
+        matched = np.zeros(len(positions), dtype=bool)
+        for c in allowed:
+            matched |= column == ord(c)
+        valid &= matched
+
+    # Column-at-a-time digit accumulation; uint8 wrap-around makes "< '0'" fail the <= 9 check too
+    values = {}
+    for field, (start, end) in fields.items():
+        value = np.zeros(len(positions), dtype=np.int64)
+        for position in range(start, end):
+            digit = chars[position] - np.uint8(ord("0"))
+            valid &= digit <= 9
+            value *= 10
+            value += digit
+        values[field] = value
+
+    if "y" in values:
+        # strptime's %y pivot: 69-99 -> 1900s, 00-68 -> 2000s
+        year = np.where(values["y"] >= 69, 1900 + values["y"], 2000 + values["y"])
+    else:
+        year = values["Y"]
+    month, day = values["m"], values["d"]
+    hour, minute, second = values["H"], values["M"], values["S"]
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = _DAYS_IN_MONTH[np.clip(month, 0, 12)] + ((month == 2) & leap)
+    valid &= (year >= 1678) & (year <= 2261)  # datetime64[ns] range
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+
+    # Days since epoch (proleptic Gregorian, H. Hinnant's days_from_civil)
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+
+    nanos = (days * 86400 + hour * 3600 + minute * 60 + second) * 1_000_000_000
+    if fraction_digits:
+        nanos += values["f"] * 10 ** (9 - fraction_digits)
+
+    result = np.full(len(strings), np.iinfo(np.int64).min, dtype=np.int64)
+    result[positions[valid]] = nanos[valid]
+    return pd.Series(result.view("datetime64[ns]"), index=strings.index)
+
+
+def parse_timestamps(values: pd.Series, sample_size: int = SAMPLE_SIZE) -> pd.Series:
+    """
+    Parse a column of timestamps (strings or already datetime).
+
+    The format is sniffed from the first sample_size non-empty values; rows
+    that do not fit it are parsed individually with format='mixed'.
+
+    Returns:
+        datetime64 Series (unparseable rows are NaT)
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    strings = values.astype("string").str.strip()
+    detected = sniff_format(strings.head(sample_size * 5).dropna().head(sample_size))
+
+    if detected is None:
+        return _parse_known(strings)
+    if detected[0] == "fixed":
+        parsed = _parse_fixed(strings, detected[1], detected[2])
+    else:
+        parsed = pd.to_datetime(strings, format=detected[1], errors="coerce")
+
+    # Rows the fast path rejected: other known formats, then the slow path
+    failed = parsed.isna() & strings.notna() & (strings != "")
+    if failed.any():
+        parsed.loc[failed] = _parse_known(strings[failed]).astype(parsed.dtype)
+    return parsed
+
+
+def _parse_known(strings: pd.Series) -> pd.Series:
+    """Try every known layout/format in order on rows not parsed yet; format='mixed' for the rest"""
+    parsed = pd.Series(pd.NaT, index=strings.index, dtype="datetime64[ns]")
+    pending = strings.notna() & (strings != "")
+
+    for name, (pattern, _, _) in _FIXED_LAYOUTS.items():
+        if not pending.any():
+            return parsed
+        candidates = strings[pending]
+        candidates = candidates[candidates.str.match(pattern).fillna(False).astype(bool)]
+        if candidates.empty:
+            continue
+        # Normalise the date/time and fraction separators to the layout's strptime form
+        normalised = candidates.str.replace(r"^(\S+)T", r"\1 ", regex=True).str.replace(",", ".", regex=False)
+        values = pd.to_datetime(normalised, format=name, errors="coerce").astype(parsed.dtype)
+        missing = values.isna()
+        if missing.any():
+            values[missing] = pd.to_datetime(normalised[missing], format=name + ".%f", errors="coerce").astype(parsed.dtype)
+        values = values.dropna()
+        parsed.loc[values.index] = values
+        pending.loc[values.index] = False
+
+    for fmt in _STRPTIME_FORMATS:
+        if not pending.any():
+            return parsed
+        values = pd.to_datetime(strings[pending], format=fmt, errors="coerce").dropna().astype(parsed.dtype)
+        parsed.loc[values.index] = values
+        pending.loc[values.index] = False
+
+    if pending.any():
+        parsed.loc[pending] = _parse_mixed(strings[pending]).astype(parsed.dtype)
+    return parsed
+
+
+def _parse_mixed(strings: pd.Series) -> pd.Series:
+    """Per-row fallback parser; values with a zone are converted to naive UTC, naive ones kept as-is"""
+    parsed = pd.to_datetime(strings.astype(object), format="mixed", dayfirst=False, errors="coerce", utc=True)
+    return parsed.dt.tz_convert(None)
@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from components.ui_components import render_kpi, view_error_details
+from controllers import query_engine
 import logging
 
 # --- Theme Helpers ---
@@ -15,6 +16,9 @@ def get_plotly_template():
 
 # --- Metrics Helpers ---
 def calculate_metrics(data_df):
+    if query_engine.should_use(data_df):
+        total, errs, warns = query_engine.level_counts(data_df)
+        return total, errs, warns, (errs / total * 100) if total > 0 else 0
     if data_df.empty: return 0, 0, 0, 0
     total = len(data_df)
     errs = len(data_df[data_df['log_level'] == 'ERROR']) if 'log_level' in data_df.columns else 0
@@ -22,6 +26,27 @@ def calculate_metrics(data_df):
     rate = (errs / total * 100) if total > 0 else 0
     return total, errs, warns, rate
 
+def _resample_levels(data_df, resample_rule):
+    """Per-bucket ERROR and WARN counts (empty buckets dropped)"""
+    error_data = pd.DataFrame()
+    warning_data = pd.DataFrame()
+
+    # Errors
+    err_df = data_df[data_df['log_level'] == 'ERROR'].copy()
+    err_df = err_df.dropna(subset=['timestamp']) # Ensure valid time for chart
+    if not err_df.empty:
+        error_data = err_df.set_index('timestamp').resample(resample_rule).size().reset_index(name='count')
+        error_data = error_data[error_data['count'] > 0]
+
+    # Warnings
+    warn_df = data_df[data_df['log_level'] == 'WARN'].copy()
+    warn_df = warn_df.dropna(subset=['timestamp']) # Ensure valid time for chart
+    if not warn_df.empty:
+        warning_data = warn_df.set_index('timestamp').resample(resample_rule).size().reset_index(name='count')
+        # Filter out zero values
+        warning_data = warning_data[warning_data['count'] > 0]
+    return error_data, warning_data
+
 def format_trend(curr, prev, has_trend, is_rate=False):
     if not has_trend or prev == 0:
         return "", ""
@@ -83,7 +108,11 @@ def render_dashboard(filtered_df: pd.DataFrame, prev_df: pd.DataFrame = None, co
                 default_index = 1
                 if not filtered_df.empty and 'timestamp' in filtered_df.columns:
                      try:
-                         days_diff = (filtered_df['timestamp'].max() - filtered_df['timestamp'].min()).days
+                         if isinstance(filtered_df, query_engine.ParquetSource):
+                             oldest, newest = query_engine.time_bounds(filtered_df)
+                         else:
+                             oldest, newest = filtered_df['timestamp'].min(), filtered_df['timestamp'].max()
+                         days_diff = (newest - oldest).days
                          if days_diff > 30:
                              default_index = 2
                      except: pass
@@ -96,29 +125,18 @@ def render_dashboard(filtered_df: pd.DataFrame, prev_df: pd.DataFrame = None, co
                 )
             
             # Map friendly names to pandas offsets (Fixing 'M' deprecation usually requires 'ME' in pandas 2.2+, using 'M' for safety unless known)
-            offset_map = { "Minute": "T", "Hour": "h", "Day": "D", "Week": "W", "Month": "ME" }
+            offset_map = { "Minute": "min", "Hour": "h", "Day": "D", "Week": "W", "Month": "ME" }
             resample_rule = offset_map.get(granularity, "h")
 
             # Trend Chart
             if not filtered_df.empty and 'timestamp' in filtered_df.columns:
                 # Prepare Data
-                error_data = pd.DataFrame()
-                warning_data = pd.DataFrame()
-                
-                # Errors
-                err_df = filtered_df[filtered_df['log_level'] == 'ERROR'].copy()
-                err_df = err_df.dropna(subset=['timestamp']) # Ensure valid time for chart
-                if not err_df.empty:
-                    error_data = err_df.set_index('timestamp').resample(resample_rule).size().reset_index(name='count')
-                    error_data = error_data[error_data['count'] > 0]
-                
-                # Warnings
-                warn_df = filtered_df[filtered_df['log_level'] == 'WARN'].copy()
-                warn_df = warn_df.dropna(subset=['timestamp']) # Ensure valid time for chart
-                if not warn_df.empty:
-                    warning_data = warn_df.set_index('timestamp').resample(resample_rule).size().reset_index(name='count')
-                    # Filter out zero values
-                    warning_data = warning_data[warning_data['count'] > 0]
+                if query_engine.should_use(filtered_df):
+                    # Bucketed counts straight from the engine, no per-level copies
+                    error_data = query_engine.bucket_counts(filtered_df, 'ERROR', resample_rule)
+                    warning_data = query_engine.bucket_counts(filtered_df, 'WARN', resample_rule)
+                else:
+                    error_data, warning_data = _resample_levels(filtered_df, resample_rule)
 
                 if not error_data.empty or not warning_data.empty:
                     fig = go.Figure()
@@ -251,9 +269,13 @@ def render_dashboard(filtered_df: pd.DataFrame, prev_df: pd.DataFrame = None, co
         
         if not filtered_df.empty and 'message' in filtered_df.columns:
             # Calculate top errors dynamically
-            error_data = filtered_df[filtered_df['log_level'] == 'ERROR']
-            if not error_data.empty:
-                    error_counts = error_data['message'].value_counts().head(5)
+            if query_engine.should_use(filtered_df):
+                error_counts = query_engine.top_values(filtered_df, 'message', 5, level='ERROR')
+                error_data = None
+            else:
+                error_data = filtered_df[filtered_df['log_level'] == 'ERROR']
+                error_counts = error_data['message'].value_counts().head(5)
+            if not error_counts.empty:
                     max_val = error_counts.max()
                     
                     for idx, (message, count) in enumerate(error_counts.items()):
@@ -281,7 +303,10 @@ def render_dashboard(filtered_df: pd.DataFrame, prev_df: pd.DataFrame = None, co
                                 st.markdown(f'<div style="text-align:right; font-weight:700; font-size:1.1rem; color:var(--text-title);">{count}</div>', unsafe_allow_html=True)
                                 if st.button("View", key=f"btn_err_{idx}", type="secondary", use_container_width=True):
                                     # Get examples for this error
-                                    examples = error_data[error_data['message'] == message]
+                                    if error_data is None:
+                                        examples = query_engine.filter_logs(filtered_df, levels=['ERROR'], equals=('message', message))
+                                    else:
+                                        examples = error_data[error_data['message'] == message]
                                     view_error_details(message, count, examples)
                             
                             st.markdown('<div style="height: 12px;"></div>', unsafe_allow_html=True) # Spacer
@@ -292,3 +317,19 @@ def render_dashboard(filtered_df: pd.DataFrame, prev_df: pd.DataFrame = None, co
                 st.markdown('<div style="color:#94A3B8; padding: 20px 0;">No data to analyze.</div>', unsafe_allow_html=True)
             
         st.markdown('</div>', unsafe_allow_html=True)
+
+
+def render_pipeline_latency(container=st):
+    """
+    Latency percentiles per service from the pipeline's current published
+    Arrow report (reports/arrow/latency_by_service.arrow).
+    """
+    from controllers.data_loader import load_arrow_report
+
+    latency = load_arrow_report("latency_by_service")
+    if latency.empty:
+        return
+
+    with container:
+        with st.expander("Pipeline Latency (p50 / p95 / p99)", expanded=False):
+            st.dataframe(latency, hide_index=True, width="stretch")
@@ -3,7 +3,10 @@ import pandas as pd
 import os
 from datetime import datetime
 import history_manager
-from controllers.data_loader import load_data_from_stream
+import alerts
+from controllers.data_loader import load_uploads, write_spilled, load_upload_settings, open_processed_logs, get_processed_version, share_session_log_data
+from controllers import dataset_cache
+from controllers import query_engine
 
 def render_input_page():
      # History DB initialized in app.py
@@ -65,7 +68,27 @@ def render_input_page():
         analyze_clicked = st.button("Analyse ➔", type="primary", use_container_width=True)
 
     
-    st.markdown('<div class="helper-text">File size < 200MB (per file)</div>', unsafe_allow_html=True)
+    max_file_mb = int(load_upload_settings()["max_file_mb"])
+    st.markdown(f'<div class="helper-text">File size < {max_file_mb:,}MB (per file)</div>', unsafe_allow_html=True)
+
+    # Logs the pipeline already parsed into data/processed: no upload, no re-parsing
+    processed_version = get_processed_version()
+    if not processed_version.startswith("0:"):
+        _, col_processed, _ = st.columns([1, 3.3, 1])
+        with col_processed:
+            if st.button("Open processed logs from the pipeline", use_container_width=True):
+                # Queried in place by the engine (counts and rule checks come from scans, not a loaded copy)
+                entry = share_session_log_data(
+                    f"processed:{processed_version}",
+                    lambda: open_processed_logs(processed_version, rule_evaluator=alerts.dashboard_rule_evaluator()),
+                    "processed", keep=alerts.dashboard_rule_columns()
+                )
+                if not entry.frame.empty:
+                    st.session_state['data_ready'] = True
+                    st.session_state['log_source'] = None
+                    st.rerun()
+                else:
+                    st.error("No processed logs could be read from data/processed.")
     
     st.markdown('<div class="footer-powered">POWERED BY PYSPARK</div>', unsafe_allow_html=True)
 
@@ -76,25 +99,42 @@ def render_input_page():
             # Ensure list if single file (though accept_multiple_files=True returns list always if not empty)
             files = uploaded_files if isinstance(uploaded_files, list) else [uploaded_files]
             
-            oversized = [f.name for f in files if f.size > 200 * 1024 * 1024]
+            oversized = [f.name for f in files if f.size > max_file_mb * 1024 * 1024]
             if oversized:
-                st.error(f"File size exceeds 200MB limit: {', '.join(oversized)}")
+                st.error(f"File size exceeds {max_file_mb:,}MB limit: {', '.join(oversized)}")
             else:
                 with st.spinner(f"Processing {len(files)} file(s)..."):
-                    # Process
-                    df = load_data_from_stream(files)
+                    # Process in chunks; each chunk is spilled to a Parquet shard. Large uploads stay
+                    # in the shards. Files another session already opened come from the shared dataset cache.
+                    def parse_upload():
+                        return load_uploads(files, alerts.dashboard_rule_evaluator())
+
+                    try:
+                        entry = share_session_log_data(
+                            dataset_cache.content_key(files), parse_upload, "upload",
+                            keep=alerts.dashboard_rule_columns()
+                        )
+                        spilled, df = entry.meta, entry.frame
+                    except Exception as e:
+                        st.error(f"Error parsing file(s): {e}")
+                        spilled, df = None, pd.DataFrame()
                     
                     if not df.empty:
                         # Success
-                        st.session_state['log_data'] = df
                         st.session_state['data_ready'] = True
+                        # Filters run against the shards when DuckDB is available (shards of live sessions are kept)
+                        shards = spilled["shards"]
+                        on_disk = isinstance(df, query_engine.ParquetSource)
+                        st.session_state['log_source'] = (
+                            query_engine.ParquetSource(shards)
+                            if not on_disk and all(os.path.exists(s) for s in shards) else None
+                        )
                         
                         # --- History Recording ---
                         try:
-                            # 1. Metrics
-                            # Check column names lower case as per data_loader
-                            num_errors = len(df[df['log_level'] == 'ERROR']) if 'log_level' in df.columns else 0
-                            num_warnings = len(df[df['log_level'] == 'WARN']) if 'log_level' in df.columns else 0
+                            # 1. Metrics (aggregated while the chunks were parsed)
+                            num_errors = spilled["levels"].get('ERROR', 0)
+                            num_warnings = spilled["levels"].get('WARN', 0)
                             
                             # 2. File Name display
                             display_name = ", ".join([f.name for f in files]) if len(files) < 3 else f"{len(files)} files"
@@ -108,7 +148,10 @@ def render_input_page():
                             parquet_name = f"analysis_{timestamp_id}.parquet"
                             parquet_path = os.path.join(hist_dir, parquet_name)
                             
-                            df.to_parquet(parquet_path)
+                            if on_disk:
+                                write_spilled(shards, parquet_path)
+                            else:
+                                df.to_parquet(parquet_path)
                             
                             # 4. DB Record
                             username = st.session_state.get('username', 'Anonymous')
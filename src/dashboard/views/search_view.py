@@ -1,7 +1,18 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from controllers.search_engine import search_logs
+from controllers.search_engine import search_logs, count_matches
+from controllers import query_engine
+
+# Matches shown for data kept on disk (the rest are counted, not loaded)
+MAX_RESULT_ROWS = 10000
+
+
+def _time_bounds(df):
+    """(oldest, newest) timestamp of a DataFrame or ParquetSource"""
+    if isinstance(df, query_engine.ParquetSource):
+        return query_engine.time_bounds(df)
+    return df['timestamp'].min(), df['timestamp'].max()
 
 
 @st.dialog("Search Filters")
@@ -14,8 +25,9 @@ def filter_dialog(df, unique_levels):
     max_val = None
     if not df.empty and 'timestamp' in df.columns:
             try:
-                min_val = df['timestamp'].min().date()
-                max_val = df['timestamp'].max().date()
+                oldest, newest = _time_bounds(df)
+                min_val = oldest.date()
+                max_val = newest.date()
             except: pass
 
     # Date Range
@@ -80,21 +92,23 @@ def render_search_view(df: pd.DataFrame):
         st.session_state.filter_popover_id = 0
 
     if "search_date_range" not in st.session_state:
+        oldest = newest = None
         if not df.empty and 'timestamp' in df.columns:
-            min_ts = df['timestamp'].min().date()
-            max_ts = df['timestamp'].max().date()
-            st.session_state.search_date_range = (min_ts, max_ts)
+            oldest, newest = _time_bounds(df)
+        if oldest is not None and not pd.isna(oldest):
+            st.session_state.search_date_range = (oldest.date(), newest.date())
         else:
              st.session_state.search_date_range = []
 
+    on_disk = isinstance(df, query_engine.ParquetSource)
     unique_levels = ['INFO', 'WARN', 'ERROR', 'DEBUG']
     if not df.empty and 'log_level' in df.columns:
-         data_levels = df['log_level'].dropna().unique().tolist()
+         data_levels = query_engine.distinct_values(df, 'log_level') if on_disk else df['log_level'].dropna().unique().tolist()
          unique_levels = sorted(list(set(unique_levels + data_levels)))
          
     unique_services = []
     if not df.empty and 'service' in df.columns:
-        unique_services = sorted(df['service'].dropna().unique().tolist())
+        unique_services = query_engine.distinct_values(df, 'service') if on_disk else sorted(df['service'].dropna().unique().tolist())
 
     # --- Search Layout ---
     # Col 1: Filter Button (Popover)
@@ -166,13 +180,19 @@ def render_search_view(df: pd.DataFrame):
 
     # Execute Search
     with st.spinner("Searching logs..."):
-        results = search_logs(df, query, filters)
+        if on_disk:
+            # Newest matches only; the full match count comes from the engine
+            results = search_logs(df, query, filters, limit=MAX_RESULT_ROWS)
+            count = count_matches(df, query, filters)
+            total = query_engine.level_counts(df)[0]
+        else:
+            results = search_logs(df, query, filters)
+            count = len(results)
+            total = len(df)
         
     # Stats
-    count = len(results)
-    total = len(df)
-    
-    st.caption(f"Found {count} matches out of {total} logs")
+    st.caption(f"Found {count} matches out of {total} logs"
+               + (f" (showing the newest {len(results):,})" if count > len(results) else ""))
     
     if not results.empty:
         display_cols = ['timestamp', 'log_level', 'service', 'message']
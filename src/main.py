@@ -14,12 +14,12 @@ os.chdir(project_root)  # Change to project root for relative paths
 # Add src to path
 sys.path.insert(0, project_root)
 
-from src.spark.spark_session import create_spark_session, load_config
+from src.spark.spark_session import get_spark_session, load_config
 from src.spark.ingest_logs import ingest_logs
 from src.spark.parse_logs import parse_logs
-from src.spark.analytics import run_all_analytics, generate_summary_statistics
+from src.spark.analytics import run_all_analytics, generate_summary_statistics, compute_latency_digests
 from src.spark.alerts import check_alerts
-from src.spark.export_reports import export_all_reports
+from src.spark.export_reports import export_all_reports, wait_for_background_jobs
 
 
 # Force UTF-8 encoding for stdout/stderr to satisfy Windows console
@@ -37,6 +37,8 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Main processing pipeline"""
+    config = {}
+    alert_manager = None
     try:
         logger.info("=" * 60)
         logger.info("Starting Distributed Log Processing System")
@@ -47,7 +49,8 @@ def main():
         
         # Create Spark session
         logger.info("Phase 1: Setting up Spark environment...")
-        spark = create_spark_session(config)
+        # (Thin client session when the persistent Spark service is configured)
+        spark = get_spark_session(config)
         
         # Ingest logs
         logger.info("Phase 2: Ingesting logs...")
@@ -55,7 +58,7 @@ def main():
         
         # Parse logs
         logger.info("Phase 3: Parsing and normalizing logs...")
-        df_parsed = parse_logs(df_raw)
+        df_parsed = parse_logs(df_raw, config)
         
         # Run analytics
         logger.info("Phase 4: Running analytics...")
@@ -63,6 +66,7 @@ def main():
         
         # Generate summary statistics
         summary = generate_summary_statistics(df_parsed)
+        summary["latency_percentiles"] = compute_latency_digests(df_parsed, config)
         logger.info(f"Summary Statistics: {summary}")
         
         # Check alerts
@@ -71,11 +75,8 @@ def main():
         
         # Export reports
         logger.info("Phase 6: Exporting reports...")
-        export_all_reports(analytics_results, df_parsed, config_path="config/config.yaml")
-        
-        # Export summary stats for dashboard
-        from src.spark.export_reports import export_summary_stats
-        export_summary_stats(summary, config_path="config/config.yaml")
+        # (Summary stats are published in the same report version for the dashboard)
+        export_all_reports(analytics_results, df_parsed, config_path="config/config.yaml", summary=summary)
         
         logger.info("=" * 60)
         logger.info("Processing completed successfully!")
@@ -85,12 +86,19 @@ def main():
         logger.info(f"  - JSON: {config['paths']['reports_json_dir']}")
         logger.info("=" * 60)
         
-        # Stop Spark session
+        # Let background compaction finish, then stop Spark session
+        wait_for_background_jobs()
         spark.stop()
         
     except Exception as e:
         logger.error(f"Error in main pipeline: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        # Alerts raised before a later phase failed are still delivered
+        if alert_manager is not None:
+            alert_manager.flush_notifications(
+                timeout=config.get('alerts', {}).get('email', {}).get('flush_timeout_seconds', 30)
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,658 @@
+"""
+Alert Rules Module
+Declarative alert rules (alerts.rules in config.yaml) compiled to Spark column
+expressions for the pipeline and to vectorised pandas operations for the dashboard.
+
+Rule fields:
+    name       Alert type reported when the rule fires
+    metric     Aggregate expression, e.g. "count(log_level == 'ERROR') / count()"
+    where      Optional row filter applied to every aggregate of the metric
+    group_by   Optional list of columns; the rule is evaluated per group
+    window     Optional tumbling window on the time column ("1 hour", "15 minutes")
+    op         Comparison against threshold: > >= < <= == != (default ">")
+    threshold  Number the metric is compared with
+    severity   Alert severity (default CRITICAL)
+    top_n      Breaching groups listed in the alert message (default 10)
+
+Metric expressions combine aggregates with + - * /, parentheses and numbers:
+    count(), count(pred), rate(pred), sum(expr), avg(expr), min(expr), max(expr), distinct(expr)
+Row expressions (pred/expr/where) use column names, literals, arithmetic,
+comparisons, `in [...]` / `not in [...]` and and/or/not.
+
+All rules are evaluated in one Spark job: each row is expanded once per distinct
+(group_by, window) combination and every aggregate is computed in a single
+groupBy, so adding per-service rules adds columns, not passes over the data.
+
+This module only needs pyspark for evaluate_rules_spark (imported lazily), so
+the dashboard can use the parser and pandas evaluator without Spark installed.
+"""
+
+import ast
+import logging
+import math
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AGGREGATES = {"count", "rate", "sum", "avg", "min", "max", "distinct"}
+
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_AST_COMPARISONS = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+# Window units accepted in "window" ("15 minutes", "1 hour", "1h", "30s")
+_WINDOW_UNITS = {
+    "s": 1, "sec": 1, "second": 1, "seconds": 1, "secs": 1,
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hour": 3600, "hours": 3600,
+    "d": 86400, "day": 86400, "days": 86400,
+    "w": 604800, "week": 604800, "weeks": 604800,
+}
+_WINDOW_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-z]+)\s*$")
+
+_AST_ARITHMETIC = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+class RuleError(ValueError):
+    """Raised for rules that do not parse or use unsupported constructs"""
+
+
+class _ExpandRate(ast.NodeTransformer):
+    """Rewrite rate(p) as count(p) / count()"""
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id == "rate":
+            numerator = ast.Call(func=ast.Name(id="count", ctx=ast.Load()), args=node.args, keywords=[])
+            denominator = ast.Call(func=ast.Name(id="count", ctx=ast.Load()), args=[], keywords=[])
+            return ast.BinOp(left=numerator, op=ast.Div(), right=denominator)
+        return node
+
+
+def _parse(text: str, metric: bool) -> ast.AST:
+    try:
+        tree = ast.parse(str(text), mode="eval").body
+    except SyntaxError as e:
+        raise RuleError(f"Cannot parse {text!r}: {e.msg}")
+    if metric:
+        tree = ast.fix_missing_locations(_ExpandRate().visit(tree))
+        _validate_metric(tree, text)
+    else:
+        _validate_row(tree, text)
+    return tree
+
+
+def _validate_metric(node: ast.AST, text: str) -> None:
+    if isinstance(node, ast.BinOp) and type(node.op) in _AST_ARITHMETIC:
+        _validate_metric(node.left, text)
+        _validate_metric(node.right, text)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        _validate_metric(node.operand, text)
+    elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        pass
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in AGGREGATES:
+        if node.keywords:
+            raise RuleError(f"Keyword arguments are not supported in {text!r}")
+        max_args = 1
+        min_args = 0 if node.func.id == "count" else 1
+        if not min_args <= len(node.args) <= max_args:
+            raise RuleError(f"{node.func.id}() takes {min_args}..{max_args} arguments in {text!r}")
+        for arg in node.args:
+            _validate_row(arg, text)
+    else:
+        raise RuleError(
+            f"Unsupported metric element {ast.unparse(node)!r} in {text!r} "
+            f"(use {', '.join(sorted(AGGREGATES))} with + - * /)"
+        )
+
+
+def _validate_row(node: ast.AST, text: str) -> None:
+    if isinstance(node, ast.Name):
+        return
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        return
+    if isinstance(node, ast.BoolOp):
+        for value in node.values:
+            _validate_row(value, text)
+        return
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+        _validate_row(node.operand, text)
+        return
+    if isinstance(node, ast.BinOp) and type(node.op) in _AST_ARITHMETIC:
+        _validate_row(node.left, text)
+        _validate_row(node.right, text)
+        return
+    if isinstance(node, ast.Compare):
+        if len(node.ops) != 1:
+            raise RuleError(f"Chained comparisons are not supported in {text!r}")
+        _validate_row(node.left, text)
+        right = node.comparators[0]
+        if isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            if not isinstance(right, (ast.List, ast.Tuple)) or not all(
+                isinstance(item, ast.Constant) for item in right.elts
+            ):
+                raise RuleError(f"'in' needs a list of literals in {text!r}")
+            return
+        if type(node.ops[0]) not in _AST_COMPARISONS:
+            raise RuleError(f"Unsupported comparison in {text!r}")
+        _validate_row(right, text)
+        return
+    raise RuleError(f"Unsupported expression element {ast.unparse(node)!r} in {text!r}")
+
+
+def window_seconds(window: str) -> int:
+    """Length of a tumbling window in seconds ("15 minutes" -> 900)"""
+    match = _WINDOW_PATTERN.match(str(window).lower())
+    if not match or match.group(2) not in _WINDOW_UNITS:
+        raise RuleError(f"Unsupported window {window!r} (use e.g. '15 minutes', '1 hour')")
+    seconds = float(match.group(1)) * _WINDOW_UNITS[match.group(2)]
+    if seconds < 1 or not seconds.is_integer():
+        raise RuleError(f"Window {window!r} must be a whole number of seconds")
+    return int(seconds)
+
+
+def _names(node: ast.AST) -> set:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and n.id not in AGGREGATES}
+
+
+def aggregate_calls(node: ast.AST) -> List[ast.Call]:
+    return [n for n in ast.walk(node) if isinstance(n, ast.Call)]
+
+
+class AlertRule:
+    """One parsed alert rule"""
+
+    def __init__(self, spec: Dict):
+        """
+        Parse and validate a rule definition
+
+        Args:
+            spec: Rule dictionary from config (see module docstring)
+
+        Raises:
+            RuleError: If a field is missing or an expression is unsupported
+        """
+        missing = [key for key in ("name", "metric", "threshold") if key not in spec]
+        if missing:
+            raise RuleError(f"Rule {spec.get('name', '?')} is missing {missing}")
+
+        self.name = str(spec["name"])
+        self.metric_text = str(spec["metric"])
+        self.metric = _parse(self.metric_text, metric=True)
+        self.where_text = spec.get("where") or None
+        self.where = _parse(self.where_text, metric=False) if self.where_text else None
+        self.group_by = list(spec.get("group_by") or [])
+        self.window = spec.get("window") or None
+        if self.window:
+            window_seconds(self.window)  # validate
+        self.op = spec.get("op", ">")
+        if self.op not in COMPARISONS:
+            raise RuleError(f"Rule {self.name}: unsupported op {self.op!r}")
+        self.threshold = float(spec["threshold"])
+        self.severity = spec.get("severity", "CRITICAL")
+        self.top_n = int(spec.get("top_n", 10))
+
+    @property
+    def window_seconds(self) -> Optional[int]:
+        return window_seconds(self.window) if self.window else None
+
+    @property
+    def grouping(self) -> Tuple[Tuple[str, ...], Optional[str]]:
+        """(group_by columns, window) - rules sharing it share one set of groups"""
+        return tuple(self.group_by), self.window
+
+    def columns(self, time_column: str = "timestamp") -> set:
+        """Input columns the rule reads"""
+        cols = _names(self.metric) | set(self.group_by)
+        if self.where is not None:
+            cols |= _names(self.where)
+        if self.window:
+            cols.add(time_column)
+        return cols
+
+    def breached(self, value) -> bool:
+        """Compare a metric value with the threshold (missing/non-finite never fires)"""
+        if value is None:
+            return False
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        return math.isfinite(value) and COMPARISONS[self.op](value, self.threshold)
+
+    def __repr__(self) -> str:
+        return f"AlertRule({self.name}: {self.metric_text} {self.op} {self.threshold:g})"
+
+
+def load_rules(specs: List[Dict]) -> List[AlertRule]:
+    """Parse rule definitions, logging and skipping invalid ones"""
+    rules = []
+    for spec in specs or []:
+        try:
+            rules.append(AlertRule(spec))
+        except (RuleError, TypeError, ValueError) as e:
+            logger.error(f"Skipping invalid alert rule: {e}")
+    return rules
+
+
+def load_rules_from_config(config_path: str, section: str = "rules") -> Optional[List[AlertRule]]:
+    """
+    Read alerts.<section> from a YAML config file
+
+    Returns:
+        Parsed rules, or None if the file or section does not exist
+    """
+    import yaml
+
+    try:
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except OSError:
+        return None
+    specs = (config.get("alerts") or {}).get(section)
+    return load_rules(specs) if specs is not None else None
+
+
+def default_rules(alert_config: Dict) -> List[Dict]:
+    """Rule definitions equivalent to the legacy alerts.* thresholds"""
+    return [
+        {
+            "name": "HIGH_ERROR_RATE",
+            "metric": "rate(log_level == 'ERROR')",
+            "threshold": alert_config.get("error_rate_threshold", 0.1),
+        },
+        {
+            "name": "HIGH_ERROR_COUNT",
+            "metric": "count(log_level == 'ERROR')",
+            "threshold": alert_config.get("error_count_threshold", 100),
+        },
+        {
+            "name": "CRITICAL_ERRORS",
+            "metric": "count(log_level == 'ERROR' and severity >= 3)",
+            "op": ">=",
+            "threshold": alert_config.get("critical_error_count", 5),
+        },
+        {
+            "name": "FREQUENT_ERRORS",
+            "metric": "count()",
+            "where": "log_level == 'ERROR'",
+            "group_by": ["message"],
+            "threshold": alert_config.get("frequent_error_threshold", 5),
+        },
+    ]
+
+
+def compile_row(node: ast.AST, column: Callable, literal: Callable):
+    """Compile a row expression with backend-specific column/literal constructors"""
+    if isinstance(node, ast.Name):
+        return column(node.id)
+    if isinstance(node, ast.Constant):
+        return literal(node.value)
+    if isinstance(node, ast.BoolOp):
+        parts = [compile_row(v, column, literal) for v in node.values]
+        result = parts[0]
+        for part in parts[1:]:
+            result = (result & part) if isinstance(node.op, ast.And) else (result | part)
+        return result
+    if isinstance(node, ast.UnaryOp):
+        operand = compile_row(node.operand, column, literal)
+        return ~operand if isinstance(node.op, ast.Not) else -operand
+    if isinstance(node, ast.BinOp):
+        return _AST_ARITHMETIC[type(node.op)](
+            compile_row(node.left, column, literal), compile_row(node.right, column, literal)
+        )
+    # Compare
+    left = compile_row(node.left, column, literal)
+    op = node.ops[0]
+    right = node.comparators[0]
+    if isinstance(op, (ast.In, ast.NotIn)):
+        matched = left.isin([item.value for item in right.elts])
+        return ~matched if isinstance(op, ast.NotIn) else matched
+    return _AST_COMPARISONS[type(op)](left, compile_row(right, column, literal))
+
+
+def compile_metric(node: ast.AST, aggregate: Callable):
+    """Compile a metric expression, resolving aggregate calls through `aggregate`"""
+    if isinstance(node, ast.Call):
+        return aggregate(node)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp):
+        return -compile_metric(node.operand, aggregate)
+    return _AST_ARITHMETIC[type(node.op)](
+        compile_metric(node.left, aggregate), compile_metric(node.right, aggregate)
+    )
+
+
+def _usable_rules(rules: List[AlertRule], columns, time_column: str) -> List[AlertRule]:
+    usable = []
+    for rule in rules:
+        missing = rule.columns(time_column) - set(columns)
+        if missing:
+            logger.warning(f"Skipping alert rule {rule.name}: missing columns {sorted(missing)}")
+            continue
+        usable.append(rule)
+    return usable
+
+
+def _breach(rule: AlertRule, value, group: Dict, window_start) -> Dict:
+    return {
+        "rule": rule.name,
+        "severity": rule.severity,
+        "metric": rule.metric_text,
+        "op": rule.op,
+        "threshold": rule.threshold,
+        "value": float(value),
+        "group": group,
+        "window_start": window_start,
+    }
+
+
+def evaluate_rules_spark(
+    df,
+    rules: List[AlertRule],
+    time_column: str = "timestamp",
+    max_breaches: int = 1000
+) -> List[Dict]:
+    """
+    Evaluate every rule against a Spark DataFrame in a single job
+
+    Args:
+        df: Parsed log DataFrame
+        rules: Parsed rules
+        time_column: Timestamp column used by windowed rules
+        max_breaches: Cap on breaching groups returned to the driver per rule (worst first)
+
+    Returns:
+        Breach dicts: rule, severity, metric, op, threshold, value, group, window_start
+    """
+    from pyspark.sql import functions as F
+    from pyspark.sql.window import Window
+
+    rules = _usable_rules(rules, df.columns, time_column)
+    if not rules:
+        return []
+
+    groupings = list(dict.fromkeys(rule.grouping for rule in rules))
+    num_keys = max(len(group_by) for group_by, _ in groupings)
+    key_names = [f"_k{i}" for i in range(num_keys)]
+
+    # One output row per input row and grouping; keys are padded with nulls
+    expansions = []
+    for gid, (group_by, window) in enumerate(groupings):
+        keys = [
+            (F.col(group_by[i]).cast("string") if i < len(group_by) else F.lit(None).cast("string")).alias(name)
+            for i, name in enumerate(key_names)
+        ]
+        # Epoch-aligned floor, like F.window's tumbling windows; F.window itself allows only
+        # one window per query and filters out null timestamps for every grouping
+        seconds = window_seconds(window) if window else None
+        window_start = (
+            (F.floor(F.col(time_column).cast("long") / seconds) * seconds).cast("timestamp")
+            if window else F.lit(None).cast("timestamp")
+        )
+        expansions.append(F.struct(F.lit(gid).alias("_gid"), *keys, window_start.alias("_window")))
+
+    needed = sorted(set().union(*(rule.columns(time_column) for rule in rules)))
+    expanded = df.select(*needed, F.explode(F.array(*expansions)).alias("_g")).select("*", "_g.*").drop("_g")
+    # Rows without a timestamp belong to no window (global and per-group rules still count them)
+    windowed = [gid for gid, (_, window) in enumerate(groupings) if window]
+    if windowed:
+        expanded = expanded.where(~F.col("_gid").isin(windowed) | F.col("_window").isNotNull())
+
+    # Deduplicated aggregate columns shared by all rules
+    aggregates: Dict[Tuple[str, str], str] = {}
+    agg_columns = []
+
+    def register(rule: AlertRule, call: ast.Call) -> str:
+        key = (rule.where_text or "", ast.dump(call))
+        if key not in aggregates:
+            alias = f"_a{len(aggregates)}"
+            aggregates[key] = alias
+            where = (
+                compile_row(rule.where, F.col, F.lit) if rule.where is not None else F.lit(True)
+            )
+            name = call.func.id
+            if name == "count":
+                condition = where & compile_row(call.args[0], F.col, F.lit) if call.args else where
+                column = F.sum(F.when(condition, 1).otherwise(0))
+            else:
+                value = F.when(where, compile_row(call.args[0], F.col, F.lit))
+                column = {
+                    "sum": F.sum, "avg": F.avg, "min": F.min, "max": F.max, "distinct": F.countDistinct,
+                }[name](value)
+            agg_columns.append(column.alias(alias))
+        return aggregates[key]
+
+    for rule in rules:
+        for call in aggregate_calls(rule.metric):
+            register(rule, call)
+
+    grouped = expanded.groupBy("_gid", *key_names, "_window").agg(*agg_columns)
+
+    # Evaluate each rule on its own grouping and keep breaching (rule, value) pairs
+    hits = []
+    for index, rule in enumerate(rules):
+        gid = groupings.index(rule.grouping)
+        metric = compile_metric(
+            rule.metric, lambda call, rule=rule: F.col(register(rule, call)).cast("double")
+        )
+        metric = metric if hasattr(metric, "cast") else F.lit(float(metric))
+        fired = (F.col("_gid") == gid) & COMPARISONS[rule.op](metric, F.lit(rule.threshold))
+        # Worst breaches first: largest values for > / >= rules, smallest for < / <=
+        severity = -metric if rule.op in ("<", "<=") else metric
+        hits.append(F.when(fired, F.struct(
+            F.lit(index).alias("rule"), metric.alias("value"), severity.alias("rank_value")
+        )))
+
+    # Cap per rule, so rules with many breaching groups cannot crowd out the others
+    ranking = Window.partitionBy("rule").orderBy(
+        F.col("rank_value").desc_nulls_last(), *[F.col(k).asc_nulls_first() for k in key_names], F.col("_window")
+    )
+    rows = (
+        grouped
+        .select(*key_names, "_window", F.explode(F.filter(F.array(*hits), lambda h: h.isNotNull())).alias("_hit"))
+        .select(*key_names, "_window", "_hit.rule", "_hit.value", "_hit.rank_value")
+        .withColumn("_rank", F.row_number().over(ranking))
+        .where(F.col("_rank") <= max_breaches)
+        .collect()
+    )
+
+    breaches = []
+    for row in rows:
+        rule = rules[row["rule"]]
+        if not rule.breached(row["value"]):
+            continue
+        group = {column: row[key_names[i]] for i, column in enumerate(rule.group_by)}
+        breaches.append(_breach(rule, row["value"], group, row["_window"] if rule.window else None))
+
+    logger.info(f"Evaluated {len(rules)} alert rules in one pass: {len(breaches)} breach(es)")
+    return breaches
+
+
+def evaluate_rules_pandas(df, rules: List[AlertRule], time_column: str = "timestamp") -> List[Dict]:
+    """
+    Evaluate rules against a pandas DataFrame with vectorised group aggregations.
+    Semantics match evaluate_rules_spark (same parser, tumbling windows, null groups kept).
+
+    Returns:
+        Breach dicts in the same format as evaluate_rules_spark
+    """
+    evaluator = PandasRuleEvaluator(rules, time_column)
+    evaluator.add(df)
+    return evaluator.breaches()
+
+
+class PandasRuleEvaluator:
+    """
+    Rules evaluated over a frame that arrives in chunks (e.g. an upload parsed
+    batch by batch). Each chunk's per-group partial aggregates are folded into
+    running ones, so memory follows the number of groups rather than rows, and
+    breaches() equals evaluate_rules_pandas on the concatenated frame.
+
+    Partials: count/sum add up, min/max fold, avg keeps (sum, non-null count),
+    distinct keeps the distinct (group, value) pairs.
+    """
+
+    def __init__(self, rules: List[AlertRule], time_column: str = "timestamp"):
+        self.rules = list(rules)
+        self.time_column = time_column
+        self._usable: Optional[List[AlertRule]] = None
+        self._partials: Dict[int, object] = {}  # id(aggregate call) -> folded partial
+
+    def add(self, df) -> None:
+        """Fold one chunk into the running aggregates"""
+        import pandas as pd
+
+        if df is None or df.empty:
+            return
+        if self._usable is None:
+            self._usable = _usable_rules(self.rules, df.columns, self.time_column)
+
+        column = lambda name: df[name]
+        literal = lambda value: value
+        windows = {}
+
+        for rule in self._usable:
+            keys = [df[c] for c in rule.group_by]
+            if rule.window:
+                if rule.window not in windows:
+                    windows[rule.window] = pd.to_datetime(df[self.time_column], errors="coerce").dt.floor(
+                        pd.Timedelta(seconds=rule.window_seconds)
+                    ).rename("_window")
+                keys.append(windows[rule.window])
+            if not keys:
+                keys = [pd.Series(0, index=df.index, name="_all")]
+
+            where = compile_row(rule.where, column, literal) if rule.where is not None else True
+            where = pd.Series(where, index=df.index) if not isinstance(where, pd.Series) else where.fillna(False).astype(bool)
+
+            for call in aggregate_calls(rule.metric):
+                part = self._partial(call, keys, where, column, literal)
+                current = self._partials.get(id(call))
+                self._partials[id(call)] = part if current is None else _fold(call.func.id, current, part)
+
+    def breaches(self) -> List[Dict]:
+        """Breaches of every usable rule over all chunks added so far"""
+        import numpy as np
+        import pandas as pd
+
+        breaches = []
+        for rule in self._usable or []:
+            metric = compile_metric(rule.metric, self._final)
+            if not isinstance(metric, pd.Series):
+                continue
+            metric = metric.astype(float).replace([np.inf, -np.inf], np.nan)
+            if rule.window:
+                # Rows without a timestamp belong to no window
+                metric = metric[metric.index.get_level_values("_window").notna()]
+            fired = metric[COMPARISONS[rule.op](metric, rule.threshold) & metric.notna()]
+
+            for index, value in fired.items():
+                index = index if isinstance(index, tuple) else (index,)
+                group = {c: index[i] for i, c in enumerate(rule.group_by)}
+                window_start = index[len(rule.group_by)] if rule.window else None
+                breaches.append(_breach(rule, value, group, window_start))
+
+        return breaches
+
+    @staticmethod
+    def _partial(call: ast.Call, keys, where, column, literal):
+        import pandas as pd
+
+        name = call.func.id
+        index = where.index
+        if name == "count":
+            condition = where
+            if call.args:
+                condition = where & pd.Series(
+                    compile_row(call.args[0], column, literal), index=index
+                ).fillna(False).astype(bool)
+            return condition.astype(int).groupby(keys, dropna=False, observed=True).sum()
+        value = pd.Series(compile_row(call.args[0], column, literal), index=index).where(where)
+        if name == "distinct":
+            pairs = pd.concat(keys + [value.rename("_value")], axis=1)
+            return pairs.drop_duplicates()
+        grouped = value.groupby(keys, dropna=False, observed=True)
+        if name == "avg":
+            return pd.DataFrame({"sum": grouped.sum(), "count": grouped.count()})
+        return {"sum": grouped.sum, "min": grouped.min, "max": grouped.max}[name]()
+
+    def _final(self, call: ast.Call):
+        partial = self._partials[id(call)]
+        name = call.func.id
+        if name == "avg":
+            return partial["sum"] / partial["count"].where(partial["count"] > 0)
+        if name == "distinct":
+            keys = [c for c in partial.columns if c != "_value"]
+            return partial.groupby(keys, dropna=False, observed=True)["_value"].nunique()
+        return partial
+
+
+def _fold(name: str, current, part):
+    """Combine two partials of the same aggregate"""
+    import pandas as pd
+
+    merged = pd.concat([current, part])
+    if name == "distinct":
+        return merged.drop_duplicates()
+    levels = list(range(merged.index.nlevels))
+    how = name if name in ("min", "max") else "sum"
+    return merged.groupby(level=levels, dropna=False, observed=True).agg(how)
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.4g}"
+
+
+def describe_breaches(rule: AlertRule, breaches: List[Dict]) -> Tuple[str, str]:
+    """
+    Human-readable (message, details) for one rule's breaches
+
+    Groups are listed by value (largest first), up to rule.top_n.
+    """
+    condition = f"{rule.op} {_format_value(rule.threshold)}"
+    if not rule.group_by and not rule.window:
+        value = breaches[0]["value"]
+        return f"{rule.metric_text} = {_format_value(value)} ({condition})", ""
+
+    ordered = sorted(breaches, key=lambda b: b["value"], reverse=rule.op in (">", ">="))
+    lines = []
+    for breach in ordered[:rule.top_n]:
+        label = ", ".join(f"{k}={v}" for k, v in breach["group"].items())
+        if breach["window_start"] is not None:
+            label = f"{label} @ {breach['window_start']}" if label else f"@ {breach['window_start']}"
+        lines.append(f"- {label}: {_format_value(breach['value'])}")
+    if len(ordered) > rule.top_n:
+        lines.append(f"... and {len(ordered) - rule.top_n} more")
+
+    top = ordered[0]
+    top_label = ", ".join(f"{v}" for v in top["group"].values()) or str(top["window_start"])
+    if len(ordered) == 1:
+        message = f"{top_label}: {rule.metric_text} = {_format_value(top['value'])} ({condition})"
+    else:
+        message = f"{len(ordered)} groups breached {rule.metric_text} {condition} (top: {top_label})"
+    details = f"Groups where {rule.metric_text} {condition}:\n" + "\n".join(lines)
+    return message, details
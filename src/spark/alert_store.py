@@ -0,0 +1,334 @@
+"""
+Alert Store Module
+Single SQLite alert history shared by the Spark pipeline, the streaming
+evaluator and the dashboard (data/alerts.db).
+
+- WAL journal so dashboard reads never block pipeline writes
+- Indexes on (username, timestamp) and (alert_type, timestamp) keep history
+  queries and cooldown lookups to index range scans
+- Inserts are buffered and written in one transaction per batch
+- Cooldowns are answered from an in-memory cache keyed by (rule, user, key);
+  the database is consulted only when the cache has no recent entry, so alerts
+  fired by another process are still respected
+
+Pipeline alerts are stored under SYSTEM_USER and are visible to every
+dashboard user alongside their own alerts.
+
+Only the standard library is used, so the dashboard can import this module
+without Spark installed.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "data/alerts.db"
+
+# Owner of alerts raised by the pipeline / streaming evaluator
+SYSTEM_USER = "__pipeline__"
+
+COLUMNS = [
+    "timestamp", "username", "alert_type", "message", "severity",
+    "details", "email_sent", "source", "rule_key",
+]
+
+_stores: Dict[str, "AlertStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+def _as_iso(value) -> str:
+    # Plain isoformat omits zero microseconds, so bounds also compare correctly
+    # against rows written before timestamps were stored with microseconds
+    if isinstance(value, str):
+        return value
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class AlertStore:
+    """Indexed, WAL-mode alert history with batched inserts and a cooldown cache"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = 100):
+        """
+        Open (and migrate) the alert database
+
+        Args:
+            db_path: SQLite file
+            batch_size: Buffered inserts that trigger an automatic flush
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._pending: List[Tuple] = []
+        self._cooldowns: Dict[Tuple[str, str, str], datetime] = {}
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS alert_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT,
+                    username TEXT,
+                    alert_type TEXT,
+                    message TEXT,
+                    severity TEXT,
+                    details TEXT,
+                    email_sent INTEGER DEFAULT 0,
+                    source TEXT DEFAULT 'dashboard',
+                    rule_key TEXT DEFAULT ''
+                )
+            ''')
+            # Databases created before the store was shared lack these columns
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(alert_history)")}
+            if "source" not in existing:
+                self._conn.execute("ALTER TABLE alert_history ADD COLUMN source TEXT DEFAULT 'dashboard'")
+            if "rule_key" not in existing:
+                self._conn.execute("ALTER TABLE alert_history ADD COLUMN rule_key TEXT DEFAULT ''")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alert_history_user_ts ON alert_history (username, timestamp)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alert_history_type_ts ON alert_history (alert_type, timestamp)"
+            )
+
+    # --- Writes ---
+
+    def add(
+        self,
+        alert_type: str,
+        message: str,
+        severity: str,
+        details: str = "",
+        username: Optional[str] = None,
+        email_sent: bool = False,
+        source: str = "dashboard",
+        rule_key: str = "",
+        timestamp=None
+    ) -> None:
+        """Buffer one alert (flushed automatically every batch_size alerts)"""
+        self.add_many([{
+            "timestamp": timestamp,
+            "username": username,
+            "alert_type": alert_type,
+            "message": message,
+            "severity": severity,
+            "details": details,
+            "email_sent": email_sent,
+            "source": source,
+            "rule_key": rule_key,
+        }], flush=False)
+
+    def add_many(self, alerts: List[Dict], flush: bool = True) -> None:
+        """
+        Buffer several alerts and (by default) write them in one transaction
+
+        Each dict uses the COLUMNS keys; missing ones take defaults.
+        """
+        with self._lock:
+            for alert in alerts:
+                timestamp = alert.get("timestamp") or _now()
+                if not isinstance(timestamp, str):
+                    timestamp = timestamp.isoformat(timespec="microseconds")
+                username = alert.get("username")
+                rule_key = alert.get("rule_key") or ""
+                self._pending.append((
+                    timestamp,
+                    username,
+                    alert.get("alert_type"),
+                    alert.get("message"),
+                    alert.get("severity"),
+                    alert.get("details", ""),
+                    1 if alert.get("email_sent") else 0,
+                    alert.get("source", "dashboard"),
+                    rule_key,
+                ))
+                self._remember(alert.get("alert_type"), username, rule_key, timestamp)
+            if flush or len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> int:
+        """Write buffered alerts; returns the number written"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO alert_history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Failed to store {len(rows)} alert(s): {e}")
+                self._pending = rows + self._pending
+                return 0
+            return len(rows)
+
+    def mark_email_sent(self, alerts: List[Tuple[str, Optional[str], str, str]]) -> int:
+        """
+        Record that the email for these alerts went out
+
+        Args:
+            alerts: (alert_type, username, rule_key, timestamp) of each alert as it was added
+
+        Returns:
+            Number of buffered or stored rows updated
+        """
+        keys = {(a, u, k or "", t) for a, u, k, t in alerts}
+        if not keys:
+            return 0
+        with self._lock:
+            updated = 0
+            # Still buffered: update in place, the row is inserted as sent
+            for i, row in enumerate(self._pending):
+                if (row[2], row[1], row[8], row[0]) in keys:
+                    self._pending[i] = row[:6] + (1,) + row[7:]
+                    updated += 1
+            try:
+                with self._conn:
+                    for alert_type, username, rule_key, timestamp in keys:
+                        updated += self._conn.execute(
+                            "UPDATE alert_history SET email_sent = 1 WHERE alert_type = ? AND timestamp = ?"
+                            " AND username IS ? AND rule_key = ? AND email_sent = 0",
+                            (alert_type, timestamp, username, rule_key)
+                        ).rowcount
+            except sqlite3.Error as e:
+                logger.error(f"Failed to mark {len(keys)} alert email(s) as sent: {e}")
+            return updated
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    # --- Cooldowns ---
+
+    def _remember(self, alert_type: str, username: Optional[str], rule_key: str, timestamp: str) -> None:
+        key = (alert_type, username, rule_key)
+        fired = datetime.fromisoformat(timestamp)
+        if key not in self._cooldowns or self._cooldowns[key] < fired:
+            self._cooldowns[key] = fired
+
+    def last_fired(self, alert_type: str, username: Optional[str] = None, rule_key: str = "",
+                   within_seconds: Optional[float] = None) -> Optional[datetime]:
+        """
+        Most recent time an alert fired for (rule, user, key)
+
+        Args:
+            within_seconds: Only look this far back in the database (bounds the index scan)
+        """
+        key = (alert_type, username, rule_key or "")
+        cutoff = datetime.now() - timedelta(seconds=within_seconds) if within_seconds else None
+
+        with self._lock:
+            cached = self._cooldowns.get(key)
+            if cached is not None and (cutoff is None or cached >= cutoff):
+                return cached
+
+            # Another process may have fired since; (alert_type, timestamp) index range scan
+            query = (
+                "SELECT timestamp FROM alert_history WHERE alert_type = ? AND username IS ? AND rule_key = ?"
+            )
+            params = [alert_type, username, rule_key or ""]
+            if cutoff is not None:
+                query += " AND timestamp >= ?"
+                params.append(_as_iso(cutoff))
+            query += " ORDER BY timestamp DESC LIMIT 1"
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return cached
+            fired = datetime.fromisoformat(row[0])
+            self._remember(alert_type, username, rule_key or "", row[0])
+            return fired
+
+    def in_cooldown(self, alert_type: str, username: Optional[str] = None, rule_key: str = "",
+                    cooldown_seconds: float = 3600) -> bool:
+        """True if the rule fired for this user/key within cooldown_seconds"""
+        if cooldown_seconds <= 0:
+            return False
+        fired = self.last_fired(alert_type, username, rule_key, within_seconds=cooldown_seconds)
+        return fired is not None and (datetime.now() - fired).total_seconds() < cooldown_seconds
+
+    # --- Reads ---
+
+    def query(
+        self,
+        username: Optional[str] = None,
+        start=None,
+        end=None,
+        alert_type: Optional[str] = None,
+        limit: int = 100,
+        include_system: bool = True
+    ) -> List[Dict]:
+        """
+        Alerts newest first. With a username, returns that user's alerts plus
+        (by default) the pipeline's; with alert_type, filters on that index instead.
+        """
+        self.flush()
+        conditions, params = [], []
+        if username is not None:
+            users = [username, SYSTEM_USER] if include_system and username != SYSTEM_USER else [username]
+            conditions.append(f"username IN ({', '.join('?' * len(users))})")
+            params.extend(users)
+        if alert_type is not None:
+            conditions.append("alert_type = ?")
+            params.append(alert_type)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(_as_iso(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(_as_iso(end))
+
+        query = "SELECT * FROM alert_history"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def count_by_type(self, username: Optional[str] = None, start=None) -> Dict[str, int]:
+        """Alert counts per type (optionally for one owner and since a time)"""
+        self.flush()
+        conditions, params = [], []
+        if username is not None:
+            conditions.append("username = ?")
+            params.append(username)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(_as_iso(start))
+        query = "SELECT alert_type, COUNT(*) FROM alert_history"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY alert_type"
+        with self._lock:
+            return {row[0]: row[1] for row in self._conn.execute(query, params)}
+
+
+def get_alert_store(db_path: str = DEFAULT_DB_PATH) -> AlertStore:
+    """Shared AlertStore per database file (one connection and cooldown cache per process)"""
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = AlertStore(db_path)
+        return _stores[key]
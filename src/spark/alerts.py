@@ -1,6 +1,6 @@
 """
 Alert System Module
-Implements configurable alerting based on thresholds
+Implements configurable alerting based on declarative rules (see alert_rules.py)
 """
 
 import logging
@@ -13,11 +13,15 @@ import os
 # Handle imports for both direct execution and module import
 try:
     from src.spark.spark_session import load_config
-    from src.spark.analytics import compute_error_rate, compute_error_count
+    from src.spark.notifier import EmailNotifier
+    from src.spark.alert_store import SYSTEM_USER, get_alert_store
+    from src.spark.alert_rules import AlertRule, default_rules, describe_breaches, evaluate_rules_spark, load_rules
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
     from src.spark.spark_session import load_config
-    from src.spark.analytics import compute_error_rate, compute_error_count
+    from src.spark.notifier import EmailNotifier
+    from src.spark.alert_store import SYSTEM_USER, get_alert_store
+    from src.spark.alert_rules import AlertRule, default_rules, describe_breaches, evaluate_rules_spark, load_rules
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,31 +39,56 @@ class AlertManager:
         """
         self.config = load_config(config_path)
         self.alert_config = self.config.get('alerts', {})
-        self.alert_history: List[Dict] = []
+        self.notifier: Optional[EmailNotifier] = None
+        
+        # Declarative rules (alerts.rules); older configs fall back to the legacy thresholds
+        rule_specs = self.alert_config.get('rules')
+        if rule_specs is None:
+            rule_specs = default_rules(self.alert_config)
+        self.rules: List[AlertRule] = load_rules(rule_specs)
+        
+        # Shared alert history (also read by the dashboard)
+        self.store = get_alert_store(self.alert_config.get('store_path', 'data/alerts.db'))
+        self.cooldown_seconds = self.alert_config.get('cooldown_seconds', 0)
+        self.started_at = datetime.now()
         
         # Setup alert log file
         self.alert_log_file = "reports/alerts.log"
         import os
         os.makedirs("reports", exist_ok=True)
     
-    def log_alert(self, alert_type: str, message: str, severity: str = "WARNING"):
+    def log_alert(self, alert_type: str, message: str, severity: str = "WARNING",
+                  key: str = "", source: str = "pipeline") -> bool:
         """
-        Log alert to console and file
+        Log alert to console, file and the shared alert store
         
         Args:
             alert_type: Type of alert
             message: Alert message
             severity: Alert severity level
+            key: Group the alert is about (cooldowns are per rule and key)
+            source: Producer recorded in the store ("pipeline", "stream")
+            
+        Returns:
+            False if the alert was suppressed by its cooldown
         """
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        alert_entry = {
-            "timestamp": timestamp,
-            "type": alert_type,
-            "message": message,
-            "severity": severity
-        }
+        if self.store.in_cooldown(alert_type, SYSTEM_USER, key, self.cooldown_seconds):
+            logger.info(f"Alert {alert_type} [{key or '-'}] suppressed (cooldown)")
+            return False
         
-        self.alert_history.append(alert_entry)
+        now = datetime.now()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        recorded = now.isoformat(timespec="microseconds")
+        
+        # Buffered; written in one transaction per run (see flush_alerts).
+        # email_sent is set once the notifier has actually delivered the email.
+        self.store.add(
+            alert_type, message, severity,
+            username=SYSTEM_USER,
+            source=source,
+            rule_key=key,
+            timestamp=recorded
+        )
         
         # Print to console
         alert_str = f"[{timestamp}] [{severity}] {alert_type}: {message}"
@@ -73,11 +102,16 @@ class AlertManager:
         except Exception as e:
             logger.error(f"Error writing to alert log: {e}")
 
-        # Send Email for Critical Alerts
+        # Queue Email for Critical Alerts (sent in the background, batched per run)
         if severity == "CRITICAL":
-            self.send_email_alert(alert_type, message, severity)
+            self.send_email_alert(alert_type, message, severity, record=(alert_type, SYSTEM_USER, key, recorded))
+        return True
+
+    def flush_alerts(self) -> None:
+        """Write buffered alerts to the alert store"""
+        self.store.flush()
 
-    def create_html_body(self, title, message, severity):
+    def create_html_body(self, title, message, severity, details_html=""):
         """Create a professional HTML email body."""
         html = f"""
         <html>
@@ -99,6 +133,7 @@ class AlertManager:
                     <h2>{message}</h2>
                     <p><strong>Severity:</strong> {severity}</p>
                     <p><strong>Timestamp:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+                    {details_html}
                 </div>
                 <div class="footer">
                     <p>Automated Alert from Spark Log Pipeline</p>
@@ -109,168 +144,95 @@ class AlertManager:
         """
         return html
 
-    def send_email_alert(self, subject, body, severity):
-        """Send an email alert using the configured SMTP server."""
-        try:
-            # Import here to avoid circular dependencies or path issues if config is missing
+    def _get_notifier(self) -> Optional[EmailNotifier]:
+        """Lazily start the background email notifier (None if email is disabled)"""
+        email_cfg = self.alert_config.get('email', {})
+        if not email_cfg.get('enabled', True):
+            return None
+        if self.notifier is None:
             try:
                 from src.spark import email_config
             except ImportError:
-                 # Fallback for direct execution
-                 import email_config
+                # Fallback for direct execution
+                import email_config
 
-            sender_email = email_config.SENDER_EMAIL
-            sender_password = email_config.SENDER_PASSWORD
-            receiver_emails = email_config.RECEIVER_EMAILS
-            smtp_server = email_config.SMTP_SERVER
-            smtp_port = email_config.SMTP_PORT
+            self.notifier = EmailNotifier(
+                smtp_server=email_cfg.get('smtp_server') or email_config.SMTP_SERVER,
+                smtp_port=email_cfg.get('smtp_port') or email_config.SMTP_PORT,
+                sender=email_config.SENDER_EMAIL,
+                recipients=email_config.RECEIVER_EMAILS,
+                render=self.render_email,
+                password=email_config.SENDER_PASSWORD,
+                starttls=email_cfg.get('starttls', True),
+                timeout=email_cfg.get('timeout_seconds', 10),
+                batch_window=email_cfg.get('batch_window_seconds', 2),
+                max_retries=email_cfg.get('max_retries', 3),
+                backoff=email_cfg.get('retry_backoff_seconds', 1),
+                on_sent=self._record_sent
+            )
+        return self.notifier
 
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
+    def render_email(self, alerts: List[Dict]) -> tuple:
+        """Render queued alerts as (subject, plain text, html); several become a digest"""
+        if len(alerts) == 1:
+            alert = alerts[0]
+            plain = f"{alert['type']}\n\n{alert['message']}\n\nSeverity: {alert['severity']}"
+            html = self.create_html_body(alert['type'], alert['message'], alert['severity'])
+            return f"[PIPELINE ALERT] {alert['type']}", plain, html
 
-            msg = MIMEMultipart('alternative')
-            msg['From'] = sender_email
-            msg['To'] = ", ".join(receiver_emails)
-            msg['Subject'] = f"[PIPELINE ALERT] {subject}"
+        subject = f"[PIPELINE ALERT] {len(alerts)} alerts: " + ", ".join(a['type'] for a in alerts)
+        plain = "\n\n".join(
+            f"[{a['timestamp']}] [{a['severity']}] {a['type']}\n{a['message']}" for a in alerts
+        )
+        items = "".join(
+            f"<hr><h3>{a['type']}</h3><p>{a['message']}</p>"
+            f"<p><strong>Severity:</strong> {a['severity']} &middot; {a['timestamp']}</p>"
+            for a in alerts
+        )
+        html = self.create_html_body(
+            f"{len(alerts)} Pipeline Alerts", "Alerts raised in this run", alerts[0]['severity'], items
+        )
+        return subject, plain, html
 
-            # Plain text fallback
-            part1 = MIMEText(f"{subject}\n\n{body}\n\nSeverity: {severity}", 'plain')
-            msg.attach(part1)
-            
-            # HTML Body
-            html_content = self.create_html_body(subject, body, severity)
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part2)
+    def _record_sent(self, batch: List[Dict]) -> None:
+        """Notifier callback: mark the stored alerts of a delivered email as sent"""
+        self.store.mark_email_sent([a["record"] for a in batch if a.get("record")])
 
-            # Connect to SMTP Server
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            
-            # Send Email
-            server.sendmail(sender_email, receiver_emails, msg.as_string())
-            server.quit()
-            
-            print(f"📧 Email alert sent to {receiver_emails}")
-        except Exception as e:
-            logger.error(f"Failed to send email alert: {e}")
-            print(f"❌ Failed to send email alert: {e}")
-    
-    def check_error_rate_alert(self, df: DataFrame) -> bool:
-        """
-        Check if error rate exceeds threshold
-        
-        Args:
-            df: Parsed log DataFrame
-            
-        Returns:
-            True if alert was triggered
+    def send_email_alert(self, subject, body, severity, record=None):
         """
-        threshold = self.alert_config.get('error_rate_threshold', 0.1)
-        error_rate = compute_error_rate(df)
-        
-        if error_rate > threshold:
-            self.log_alert(
-                "HIGH_ERROR_RATE",
-                f"Error rate {error_rate:.2%} exceeds threshold {threshold:.2%}",
-                "CRITICAL"
-            )
-            return True
-        return False
-    
-    def check_error_count_alert(self, df: DataFrame) -> bool:
+        Queue an email alert; delivery happens on the notifier's background thread.
+        record is the stored alert's (alert_type, username, rule_key, timestamp), marked sent on delivery.
         """
-        Check if error count exceeds threshold
-        
-        Args:
-            df: Parsed log DataFrame
-            
-        Returns:
-            True if alert was triggered
-        """
-        threshold = self.alert_config.get('error_count_threshold', 100)
-        error_count = compute_error_count(df)
-        
-        if error_count > threshold:
-            self.log_alert(
-                "HIGH_ERROR_COUNT",
-                f"Total error count {error_count} exceeds threshold {threshold}",
-                "CRITICAL"
-            )
-            return True
-        return False
-    
-    def check_critical_errors_alert(self, df: DataFrame) -> bool:
+        notifier = self._get_notifier()
+        if notifier is None:
+            return
+        notifier.notify({
+            "type": subject,
+            "message": body,
+            "severity": severity,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "record": record
+        })
+
+    def flush_notifications(self, timeout: Optional[float] = None) -> bool:
         """
-        Check if critical errors appear
+        Store buffered alerts and wait for queued alert emails (call at the end of a run)
         
-        Args:
-            df: Parsed log DataFrame
-            
         Returns:
-            True if alert was triggered
+            True if every queued email was handled within the timeout
         """
-        threshold = self.alert_config.get('critical_error_count', 5)
-        
-        from pyspark.sql.functions import col, count
-        
-        critical_errors = df.filter(
-            (col("log_level") == "ERROR") & 
-            (col("severity") >= 3)
-        ).count()
-        
-        if critical_errors >= threshold:
-            self.log_alert(
-                "CRITICAL_ERRORS",
-                f"Found {critical_errors} critical errors (threshold: {threshold})",
-                "CRITICAL"
-            )
-            return True
-        return False
-
-    def check_frequent_errors_alert(self, df: DataFrame) -> bool:
-        """
-        Check for errors occurring > 5 times
-        """
-        from pyspark.sql.functions import col, count, desc
-        
-        # Filter for ERROR logs
-        errors_df = df.filter(col("log_level") == "ERROR")
-        
-        # Group by message and count
-        freq_errors = errors_df.groupBy("message").agg(count("*").alias("count")) \
-                        .filter(col("count") > 5) \
-                        .orderBy(desc("count"))
-        
-        # We need to collect to local list to check if empty and iterate
-        # Use limit to avoid pulling too much data if massive
-        top_freq = freq_errors.limit(10).collect()
-        
-        if top_freq:
-            # Trigger Alert
-            count_patterns = len(top_freq)
-            top_msg = top_freq[0]['message']
-            top_count = top_freq[0]['count']
-            
-            alert_msg = f"Frequent Error: {top_msg} ({top_count} times)"
-            if count_patterns > 1:
-                alert_msg = f"Multiple Frequent Errors Detected ({count_patterns} distinct types > 5 occ.)"
-                
-            # Construct details
-            details = "Errors occurring > 5 times:\n"
-            for row in top_freq:
-                details += f"- {row['message']}: {row['count']}\n"
-            
-            # Log Alert (this triggers email)
-            self.log_alert("FREQUENT_ERRORS", f"{alert_msg}\n\n{details}", "CRITICAL")
+        self.flush_alerts()
+        if self.notifier is None:
             return True
-            
-        return False
+        drained = self.notifier.flush(timeout)
+        if drained:
+            self.notifier.close(timeout=1)
+            self.notifier = None
+        return drained
     
     def check_all_alerts(self, df: DataFrame) -> List[Dict]:
         """
-        Run all alert checks
+        Evaluate all configured alert rules in one Spark job
         
         Args:
             df: Parsed log DataFrame
@@ -278,37 +240,32 @@ class AlertManager:
         Returns:
             List of triggered alerts
         """
-        logger.info("Running alert checks...")
+        logger.info(f"Running {len(self.rules)} alert rules...")
         
-        alerts_triggered = []
+        breaches = evaluate_rules_spark(
+            df,
+            self.rules,
+            time_column=self.alert_config.get('time_column', 'timestamp'),
+            max_breaches=self.alert_config.get('max_breaches', 1000)
+        )
         
-        # Check error rate
-        if self.check_error_rate_alert(df):
+        alerts_triggered = []
+        for rule in self.rules:
+            rule_breaches = [b for b in breaches if b['rule'] == rule.name]
+            if not rule_breaches:
+                continue
+            
+            message, details = describe_breaches(rule, rule_breaches)
+            if not self.log_alert(rule.name, f"{message}\n\n{details}" if details else message, rule.severity):
+                continue
             alerts_triggered.append({
-                "type": "HIGH_ERROR_RATE",
+                "type": rule.name,
+                "severity": rule.severity,
+                "breaches": len(rule_breaches),
                 "timestamp": datetime.now().isoformat()
             })
         
-        # Check error count
-        if self.check_error_count_alert(df):
-            alerts_triggered.append({
-                "type": "HIGH_ERROR_COUNT",
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        # Check critical errors
-        if self.check_critical_errors_alert(df):
-            alerts_triggered.append({
-                "type": "CRITICAL_ERRORS",
-                "timestamp": datetime.now().isoformat()
-            })
-
-        # Check frequent errors (> 5 times)
-        if self.check_frequent_errors_alert(df):
-            alerts_triggered.append({
-                "type": "FREQUENT_ERRORS",
-                "timestamp": datetime.now().isoformat()
-            })
+        self.flush_alerts()
         
         if not alerts_triggered:
             logger.info("No alerts triggered. System is healthy.")
@@ -317,32 +274,27 @@ class AlertManager:
     
     def get_recent_alerts(self, limit: int = 20) -> List[Dict]:
         """
-        Get recent alerts from history
+        Get recent pipeline alerts from the alert store
         
         Args:
             limit: Maximum number of alerts to return
             
         Returns:
-            List of recent alerts
+            List of recent alerts (newest first)
         """
-        return self.alert_history[-limit:]
+        return self.store.query(username=SYSTEM_USER, limit=limit)
     
     def get_alert_summary(self) -> Dict:
         """
-        Get summary of alert history
+        Get summary of the alerts raised since this manager was created
         
         Returns:
             Dictionary with alert statistics
         """
-        total_alerts = len(self.alert_history)
-        
-        alert_types = {}
-        for alert in self.alert_history:
-            alert_type = alert.get("type", "UNKNOWN")
-            alert_types[alert_type] = alert_types.get(alert_type, 0) + 1
+        alert_types = self.store.count_by_type(username=SYSTEM_USER, start=self.started_at)
         
         return {
-            "total_alerts": total_alerts,
+            "total_alerts": sum(alert_types.values()),
             "alert_types": alert_types,
             "recent_alerts": self.get_recent_alerts(10)
         }
@@ -380,4 +332,5 @@ if __name__ == "__main__":
     # Display alert summary
     summary = alert_manager.get_alert_summary()
     print(f"\nAlert Summary: {summary}")
+    alert_manager.flush_notifications(timeout=30)
 
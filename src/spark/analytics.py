@@ -8,16 +8,21 @@ from pyspark.sql import SparkSession, DataFrame
 from pyspark.sql import functions as F
 from pyspark.sql.types import StructType, StructField, StringType, LongType
 from pyspark.sql.window import Window
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence
+import json
 import sys
 import os
 
 # Handle imports for both direct execution and module import
 try:
-    from src.spark.spark_session import get_spark_session, load_config
+    from src.spark.spark_session import get_spark_session, load_config, is_remote_session
+    from src.spark.tdigest import TDigest, merge_digest_dicts
+    from src.spark.ingest_logs import SOURCE_COLUMN, source_path, source_signature
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
-    from src.spark.spark_session import get_spark_session, load_config
+    from src.spark.spark_session import get_spark_session, load_config, is_remote_session
+    from src.spark.tdigest import TDigest, merge_digest_dicts
+    from src.spark.ingest_logs import SOURCE_COLUMN, source_path, source_signature
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -159,13 +164,22 @@ def top_n_errors(df: DataFrame, n: int = 10) -> DataFrame:
     return result
 
 
+def _to_interval(window_size: str) -> str:
+    """Convert shorthand window sizes to SQL-compatible interval strings (e.g. '1h' -> '1 hour')"""
+    return window_size.replace("h", " hour").replace("d", " day").replace("m", " minute")
+
+
+def _percentile_label(p: float) -> str:
+    """Column label for a percentile (0.5 -> p50, 0.999 -> p99_9)"""
+    return "p" + f"{p * 100:g}".replace(".", "_")
+
+
 def error_trends_over_time(df: DataFrame, window_size: str = "1h") -> DataFrame:
     """Compute error trends over time using PySpark window functions"""
     logger.info(f"Computing error trends with {window_size} windows...")
     
     # Parse window size (e.g., "1h" -> 1 hour)
-    # Replace shorthand units with SQL-compatible interval strings (e.g. '1h' -> '1 hour')
-    interval = window_size.replace("h", " hour").replace("d", " day").replace("m", " minute")
+    interval = _to_interval(window_size)
     
     # Perform time-windowed aggregation
     result = (
@@ -186,22 +200,89 @@ def error_trends_over_time(df: DataFrame, window_size: str = "1h") -> DataFrame:
     return result
 
 
-def errors_per_ip(df: DataFrame) -> DataFrame:
-    """Group errors by IP address using native PySpark"""
+def detect_hot_keys(
+    df: DataFrame,
+    key_col: str,
+    sample_fraction: float = 0.1,
+    hot_key_share: float = 0.05,
+    max_hot_keys: int = 20
+) -> List[str]:
+    """
+    Sample key frequencies and return keys that carry at least hot_key_share of the rows.
+    Used to decide which keys need salting before a groupBy.
+    """
+    logger.info(f"Sampling key frequencies for {key_col} (fraction={sample_fraction})...")
+
+    sample = df.select(key_col).sample(withReplacement=False, fraction=sample_fraction, seed=42)
+    key_counts = sample.groupBy(key_col).agg(F.count("*").alias("count")).cache()
+
+    sampled_total = key_counts.agg(F.sum("count")).collect()[0][0] or 0
+    if sampled_total == 0:
+        key_counts.unpersist()
+        return []
+
+    hot_rows = (
+        key_counts
+        .filter(F.col("count") >= hot_key_share * sampled_total)
+        .orderBy(F.col("count").desc())
+        .limit(max_hot_keys)
+        .collect()
+    )
+    key_counts.unpersist()
+
+    hot_keys = [row[key_col] for row in hot_rows]
+    if hot_keys:
+        logger.info(f"Hot keys detected for {key_col}: {hot_keys}")
+    return hot_keys
+
+
+def _count_by_key(
+    df: DataFrame,
+    key_col: str,
+    count_alias: str,
+    hot_keys: Optional[List[str]] = None,
+    salt_buckets: int = 16
+) -> DataFrame:
+    """
+    Count rows per key. When hot keys are given, they are spread over salt_buckets
+    partial aggregates first and merged afterwards, so no single task owns a hot key.
+    """
+    if not hot_keys:
+        return df.groupBy(key_col).agg(F.count("*").alias(count_alias))
+
+    # Stage 1: partial aggregation on (key, salt); only hot keys get a non-zero salt
+    salt = (
+        F.when(F.col(key_col).isin(hot_keys), (F.rand(seed=42) * salt_buckets).cast("int"))
+        .otherwise(F.lit(0))
+    )
+    partial = (
+        df.withColumn("_salt", salt)
+        .groupBy(key_col, "_salt")
+        .agg(F.count("*").alias("_partial_count"))
+    )
+
+    # Stage 2: merge the partial counts per key
+    return partial.groupBy(key_col).agg(F.sum("_partial_count").cast("long").alias(count_alias))
+
+
+def errors_per_ip(
+    df: DataFrame,
+    hot_keys: Optional[List[str]] = None,
+    salt_buckets: int = 16
+) -> DataFrame:
+    """Group errors by IP address using native PySpark (salting hot keys if given)"""
     logger.info("Computing errors per IP...")
     
-    # Chain Spark transformations
+    # Multi-condition Filter: ERROR level AND IP is not null AND IP is not empty string
+    errors_df = df.filter(
+        (F.col("log_level") == "ERROR") & 
+        (F.col("ip_address").isNotNull()) & 
+        (F.col("ip_address") != "")
+    )
+    
     result = (
-        # Multi-condition Filter: ERROR level AND IP is not null AND IP is not empty string
-        df.filter(
-            (F.col("log_level") == "ERROR") & 
-            (F.col("ip_address").isNotNull()) & 
-            (F.col("ip_address") != "")
-        )
-        # Group By: group by IP address
-        .groupBy("ip_address")
-        # Aggregation: count errors per IP
-        .agg(F.count("*").alias("error_count"))
+        # Group By + Aggregation: count errors per IP
+        _count_by_key(errors_df, "ip_address", "error_count", hot_keys, salt_buckets)
         # Sort: descending (most problematic IPs first)
         .orderBy(F.col("error_count").desc())
     )
@@ -209,22 +290,24 @@ def errors_per_ip(df: DataFrame) -> DataFrame:
     return result
 
 
-def errors_per_service(df: DataFrame) -> DataFrame:
-    """Group errors by service using native PySpark"""
+def errors_per_service(
+    df: DataFrame,
+    hot_keys: Optional[List[str]] = None,
+    salt_buckets: int = 16
+) -> DataFrame:
+    """Group errors by service using native PySpark (salting hot keys if given)"""
     logger.info("Computing errors per service...")
     
-    # Chain Spark transformations
+    # Multi-condition Filter: ERROR level AND Service Name is valid
+    errors_df = df.filter(
+        (F.col("log_level") == "ERROR") & 
+        (F.col("service_name").isNotNull()) & 
+        (F.col("service_name") != "")
+    )
+    
     result = (
-        # Multi-condition Filter: ERROR level AND Service Name is valid
-        df.filter(
-            (F.col("log_level") == "ERROR") & 
-            (F.col("service_name").isNotNull()) & 
-            (F.col("service_name") != "")
-        )
-        # Group By: group by service name
-        .groupBy("service_name")
-        # Aggregation: count errors per service
-        .agg(F.count("*").alias("error_count"))
+        # Group By + Aggregation: count errors per service
+        _count_by_key(errors_df, "service_name", "error_count", hot_keys, salt_buckets)
         # Sort: descending order
         .orderBy(F.col("error_count").desc())
     )
@@ -232,6 +315,205 @@ def errors_per_service(df: DataFrame) -> DataFrame:
     return result
 
 
+def latency_percentiles(
+    df: DataFrame,
+    field: str = "latency_ms",
+    group_by: Optional[str] = "service_name",
+    window_size: Optional[str] = None,
+    percentiles: Sequence[float] = (0.5, 0.95, 0.99),
+    accuracy: int = 10000
+) -> DataFrame:
+    """
+    Compute approximate latency percentiles (p50/p95/p99) using percentile_approx.
+    Groups by a dimension column and/or a tumbling time window.
+    """
+    logger.info(f"Computing {field} percentiles by {group_by or 'all'} / {window_size or 'all time'}...")
+
+    samples = df.filter(F.col(field).isNotNull())
+    group_cols = []
+
+    if group_by:
+        group_cols.append(group_by)
+    if window_size:
+        samples = samples.withColumn(
+            "time_window", F.window("timestamp", _to_interval(window_size)).start
+        )
+        group_cols.append("time_window")
+
+    result = (
+        samples
+        .groupBy(*group_cols)
+        .agg(
+            F.count(field).alias("sample_count"),
+            F.percentile_approx(field, list(percentiles), accuracy).alias("_pcts")
+        )
+    )
+
+    # Unpack percentile array into one column per percentile
+    for i, p in enumerate(percentiles):
+        result = result.withColumn(_percentile_label(p), F.col("_pcts")[i])
+
+    return result.drop("_pcts").orderBy(*group_cols) if group_cols else result.drop("_pcts")
+
+
+def _percentile_summary(
+    df: DataFrame,
+    field: str,
+    group_by: str,
+    window_size: str,
+    percentiles: Sequence[float],
+    accuracy: int
+) -> Dict:
+    """compute_latency_digests' summary from percentile_approx (DataFrame API only, works over Spark Connect)"""
+    logger.info(f"Computing {field} percentiles with percentile_approx (Spark Connect)...")
+    labels = [_percentile_label(p) for p in percentiles]
+    summary = {"service": {}, "window": {}}
+    for dimension, rows in (
+        ("service", latency_percentiles(df, field, group_by, None, percentiles, accuracy).collect()),
+        ("window", latency_percentiles(df, field, None, window_size, percentiles, accuracy).collect()),
+    ):
+        for row in rows:
+            if dimension == "service":
+                key = str(row[group_by]) if row[group_by] is not None else "unknown"
+            else:
+                key = row["time_window"].strftime("%Y-%m-%d %H:%M:%S") if row["time_window"] else "unknown"
+            entry = {"count": int(row["sample_count"])}
+            entry.update((label, row[label]) for label in labels)
+            summary[dimension][key] = entry
+    logger.info(f"Latency percentiles computed for {len(summary['service'])} services and {len(summary['window'])} windows")
+    return summary
+
+
+def compute_latency_digests(df: DataFrame, config: Optional[Dict] = None) -> Dict:
+    """
+    Build per-service and per-window t-digests in one distributed pass and return
+    percentile summaries. Only compressed centroids are shipped to the driver.
+
+    Under Spark Connect (no RDD API) the summary comes from percentile_approx
+    instead, covering this run's input only.
+
+    In incremental mode the persisted state keeps digests per raw file: only raw
+    files that are new or changed since the last run are digested (replacing
+    their earlier digests), and the summary merges every file's digests, so rows
+    re-read on each run are counted once and files rotated away still count.
+    """
+    if config is None:
+        config = load_config()
+
+    metrics_cfg = config.get('metrics', {})
+    field = metrics_cfg.get('digest_field', 'latency_ms')
+    group_by = metrics_cfg.get('group_by', 'service_name')
+    window_size = metrics_cfg.get('window', '1h')
+    compression = metrics_cfg.get('tdigest_compression', 100)
+    percentiles = metrics_cfg.get('percentiles', [0.5, 0.95, 0.99])
+    state_path = metrics_cfg.get('state_path', 'data/state/latency_digests.json')
+    incremental = metrics_cfg.get('incremental', False)
+
+    if field not in df.columns:
+        logger.warning(f"Numeric field '{field}' not found; skipping latency digests")
+        return {}
+    if incremental and SOURCE_COLUMN not in df.columns:
+        logger.warning(f"Incremental digests need the {SOURCE_COLUMN} column; digesting this run only")
+        incremental = False
+
+    # Digests are built with RDD partition functions, which Spark Connect clients cannot run
+    if is_remote_session(df.sparkSession):
+        if incremental:
+            logger.warning("Spark Connect: digests cannot be kept incrementally; percentiles cover this run only")
+        return _percentile_summary(
+            df, field, group_by, window_size, percentiles, metrics_cfg.get('percentile_accuracy', 10000)
+        )
+
+    logger.info(f"Building {field} t-digests (compression={compression})...")
+
+    # Previous state for incremental runs: {"field", "sources": {raw file: {"signature", "service", "window"}}}
+    state = {"field": field, "sources": {}}
+    pending = []
+    if incremental:
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, 'r') as f:
+                    previous = json.load(f)
+                if previous.get("field") == field:
+                    state["sources"] = previous.get("sources", {})
+            except Exception as e:
+                logger.warning(f"Could not read digest state {state_path}: {e}")
+        uris = [row[0] for row in df.select(SOURCE_COLUMN).distinct().collect() if row[0]]
+        for uri in uris:
+            seen = state["sources"].get(source_path(uri))
+            signature = source_signature(source_path(uri))
+            if seen is None or seen.get("signature") != signature:
+                pending.append(uri)
+                state["sources"][source_path(uri)] = {"signature": signature, "service": {}, "window": {}}
+        logger.info(f"Digesting {len(pending)} new or changed raw file(s) of {len(uris)}")
+        df = df.where(F.col(SOURCE_COLUMN).isin(pending))
+
+    samples = (
+        df.filter(F.col(field).isNotNull())
+        .select(
+            (F.col(SOURCE_COLUMN) if incremental else F.lit("")).alias("source_key"),
+            F.coalesce(F.col(group_by).cast("string"), F.lit("unknown")).alias("group_key"),
+            F.date_format(
+                F.window("timestamp", _to_interval(window_size)).start, "yyyy-MM-dd HH:mm:ss"
+            ).alias("window_key"),
+            F.col(field).alias("value")
+        )
+    )
+
+    def build_partition_digests(rows):
+        digests = {}
+        for source_key, group_key, window_key, value in rows:
+            for key in ((source_key, "service", group_key), (source_key, "window", window_key or "unknown")):
+                if key not in digests:
+                    digests[key] = TDigest(compression)
+                digests[key].update(value)
+        for key, digest in digests.items():
+            yield key, digest.to_dict()
+
+    new_digests = (
+        samples.rdd
+        .mapPartitions(build_partition_digests)
+        .reduceByKey(merge_digest_dicts)
+        .collectAsMap()
+    ) if not incremental or pending else {}
+
+    merged = {"service": {}, "window": {}}
+    if incremental:
+        # Replace the digests of the files digested now, then merge all files
+        for (source_key, dimension, key), digest in new_digests.items():
+            state["sources"][source_path(source_key)][dimension][key] = digest
+        for source in state["sources"].values():
+            for dimension in ("service", "window"):
+                for key, digest in source[dimension].items():
+                    existing = merged[dimension].get(key)
+                    merged[dimension][key] = merge_digest_dicts(existing, digest) if existing else digest
+        try:
+            os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+            tmp_path = f"{state_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+        except Exception as e:
+            logger.warning(f"Could not persist digest state {state_path}: {e}")
+    else:
+        for (_, dimension, key), digest in new_digests.items():
+            merged[dimension][key] = digest
+
+    # Summarise digests into percentile values
+    summary = {}
+    for dimension in ("service", "window"):
+        summary[dimension] = {}
+        for key in sorted(merged[dimension]):
+            digest = TDigest.from_dict(merged[dimension][key])
+            entry = {"count": int(digest.count())}
+            for p in percentiles:
+                entry[_percentile_label(p)] = digest.quantile(p)
+            summary[dimension][key] = entry
+
+    logger.info(f"Latency digests computed for {len(summary['service'])} services and {len(summary['window'])} windows")
+    return summary
+
+
 def generate_summary_statistics(df: DataFrame) -> Dict:
     """Generate comprehensive summary statistics using native PySpark"""
     logger.info("Generating summary statistics...")
@@ -279,9 +561,25 @@ def run_all_analytics(df: DataFrame, config: Optional[Dict] = None) -> Dict[str,
         config = load_config()
     
     top_n = config.get('analytics', {}).get('top_n_errors', 10)
+    metrics_cfg = config.get('metrics', {})
+    skew_cfg = config.get('analytics', {}).get('skew', {})
     
     logger.info("Running all analytics...")
     
+    # Skew-aware mode: sample key frequencies and salt hot services/IPs
+    hot_keys = {"service_name": [], "ip_address": []}
+    salt_buckets = skew_cfg.get('salt_buckets', 16)
+    if skew_cfg.get('mode', 'off') == 'auto':
+        errors_df = df.filter(F.col("log_level") == "ERROR")
+        for key_col in hot_keys:
+            hot_keys[key_col] = detect_hot_keys(
+                errors_df.filter(F.col(key_col).isNotNull() & (F.col(key_col) != "")),
+                key_col,
+                skew_cfg.get('sample_fraction', 0.1),
+                skew_cfg.get('hot_key_share', 0.05),
+                skew_cfg.get('max_hot_keys', 20)
+            )
+    
     # All functions now use native PySpark operations
     results = {
         "errors_by_type": errors_by_type(df),
@@ -290,9 +588,29 @@ def run_all_analytics(df: DataFrame, config: Optional[Dict] = None) -> Dict[str,
         "errors_by_day": errors_by_time(df, "day"),
         "top_n_errors": top_n_errors(df, top_n),
         "error_trends": error_trends_over_time(df, "1h"),
-        "errors_per_ip": errors_per_ip(df),
-        "errors_per_service": errors_per_service(df)
+        "errors_per_ip": errors_per_ip(df, hot_keys["ip_address"], salt_buckets),
+        "errors_per_service": errors_per_service(df, hot_keys["service_name"], salt_buckets)
     }
+
+    # Report which keys were salted
+    salted = [(key_col, str(key)) for key_col, keys in hot_keys.items() for key in keys]
+    if salted:
+        logger.info(f"Salted hot keys: {salted}")
+        results["salted_keys"] = df.sparkSession.createDataFrame(salted, ["key_column", "key"])
+
+    # Latency percentiles (only when numeric fields were extracted)
+    latency_field = metrics_cfg.get('digest_field', 'latency_ms')
+    if latency_field in df.columns:
+        percentiles = metrics_cfg.get('percentiles', [0.5, 0.95, 0.99])
+        accuracy = metrics_cfg.get('percentile_accuracy', 10000)
+        results["latency_by_service"] = latency_percentiles(
+            df, latency_field, metrics_cfg.get('group_by', 'service_name'),
+            None, percentiles, accuracy
+        )
+        results["latency_by_window"] = latency_percentiles(
+            df, latency_field, None,
+            metrics_cfg.get('window', '1h'), percentiles, accuracy
+        )
     
     # Cache results for potential reuse
     for name, result_df in results.items():
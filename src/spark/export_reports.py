@@ -4,61 +4,169 @@ Exports analytics results to CSV and JSON using native PySpark write operations.
 """
 
 import logging
-from pyspark.sql import DataFrame
-from typing import Dict
+from pyspark.sql import DataFrame, SparkSession
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+import hashlib
+import json
 import os
 import sys
 import shutil
+import threading
+import time
 
 # Handle imports for both direct execution and module import
 try:
-    from src.spark.spark_session import load_config
+    from src.spark.spark_session import load_config, is_remote_session
+    from src.spark.parquet_table import append_to_table, start_background_compaction
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
-    from src.spark.spark_session import load_config
+    from src.spark.spark_session import load_config, is_remote_session
+    from src.spark.parquet_table import append_to_table, start_background_compaction
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def export_to_csv(df: DataFrame, output_path: str, mode: str = "overwrite") -> None:
+# Results with at most this many rows are collected and written as a single file
+DEFAULT_DIRECT_WRITE_ROWS = 100000
+
+# Background jobs (e.g. Parquet compaction) started during export
+_background_jobs = []
+
+
+def _remove_path(path: str) -> None:
+    """Remove a file or directory if present"""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _split_output_path(output_path: str, extension: str):
+    """Return (flat file path, multi-part directory path) for a report"""
+    if output_path.endswith(extension):
+        return output_path, output_path[:-len(extension)]
+    return f"{output_path}{extension}", output_path
+
+
+def _collect_if_small(df: DataFrame, row_limit: int):
+    """
+    Collect df to pandas (Arrow-backed) if it has at most row_limit rows.
+    Only row_limit + 1 rows are ever pulled, so large results cost one short job.
+    """
+    pdf = df.limit(row_limit + 1).toPandas()
+    return pdf if len(pdf) <= row_limit else None
+
+
+class _CollectedResults:
     """
-    Export DataFrame to CSV using Spark (with Pandas fallback)
+    Small results collected once per export run and shared by the CSV, JSON and
+    Arrow tasks of the same analytics result (which may run concurrently).
+    Writers must not modify the shared frames.
+    """
+
+    def __init__(self, row_limit: int):
+        self.row_limit = row_limit
+        self._frames = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, df: DataFrame):
+        """Same as _collect_if_small(df, row_limit), computed at most once per DataFrame"""
+        key = id(df)
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._frames:
+                self._frames[key] = _collect_if_small(df, self.row_limit)
+            return self._frames[key]
+
+
+def _collect(df: DataFrame, row_limit: int, collected: Optional[_CollectedResults]):
+    return collected.get(df) if collected is not None else _collect_if_small(df, row_limit)
+
+
+def _write_json_records(pdf, file_path: str) -> None:
+    """
+    Write a pandas frame as JSON lines (one object per row) with dates as ISO
+    strings, the same layout Spark's JSON writer emits for multi-part reports
+    (pandas defaults to epoch milliseconds)
+    """
+    import datetime as dt
+
+    pdf = pdf.copy()
+    for column in pdf.columns:
+        if pdf[column].dtype == object:
+            values = pdf[column].dropna()
+            if not values.empty and values.map(lambda v: isinstance(v, dt.date) and not isinstance(v, dt.datetime)).all():
+                pdf[column] = pdf[column].map(lambda v: v.isoformat() if v is not None and v == v else None)
+    pdf.to_json(file_path, orient='records', lines=True, date_format='iso', date_unit='ms')
+
+
+def _write_manifest(dir_path: str, fmt: str) -> None:
+    """Write a manifest listing the part files of a multi-part report"""
+    parts = sorted(
+        f for f in os.listdir(dir_path)
+        if f.startswith("part-") and not f.endswith(".crc")
+    )
+    manifest = {
+        "format": fmt,
+        "created_at": datetime.now().isoformat(),
+        "parts": [
+            {"file": f, "bytes": os.path.getsize(os.path.join(dir_path, f))}
+            for f in parts
+        ],
+    }
+    with open(os.path.join(dir_path, "_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def export_to_csv(
+    df: DataFrame,
+    output_path: str,
+    mode: str = "overwrite",
+    row_limit: int = DEFAULT_DIRECT_WRITE_ROWS,
+    collected: Optional[_CollectedResults] = None
+) -> None:
+    """
+    Export DataFrame to CSV.
+    Small results (<= row_limit rows) are written directly as one flat file
+    (e.g. reports/csv/errors_by_type.csv); larger ones use a parallel
+    multi-part Spark write with a _manifest.json (with Pandas fallback).
+    collected shares the driver-side collection with the run's other formats.
     """
     try:
         logger.info(f"Exporting to CSV: {output_path}")
+        file_path, dir_path = _split_output_path(output_path, ".csv")
         
+        # Direct driver-side write for small aggregates
         if mode == "overwrite":
-            if os.path.exists(output_path):
-                shutil.rmtree(output_path)
+            pdf = _collect(df, row_limit, collected)
+            if pdf is not None:
+                os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+                pdf.to_csv(file_path, index=False)
+                _remove_path(dir_path)  # Stale multi-part output from earlier runs
+                logger.info(f"Successfully exported {len(pdf)} rows to {file_path} (direct)")
+                return
+            _remove_path(file_path)
+            _remove_path(dir_path)
         
-        # Try native Spark
+        # Try native Spark (parallel multi-part write)
         try:
-            df.coalesce(1).write \
+            df.write \
                 .mode(mode) \
                 .option("header", "true") \
-                .csv(output_path)
-            logger.info(f"Successfully exported to {output_path} (Spark)")
+                .csv(dir_path)
+            _write_manifest(dir_path, "csv")
+            logger.info(f"Successfully exported to {dir_path} (Spark, multi-part)")
         except Exception:
             logger.warning("Spark CSV export failed, trying Pandas fallback...")
-            # Fallback
+            # Fallback: single flat file
             pdf = df.toPandas()
-            # If path was dir, pandas writes to file. ensure dir exists
-            p_dir = os.path.dirname(output_path)
-            if p_dir and not os.path.exists(p_dir):
-                os.makedirs(p_dir, exist_ok=True)
-                
-            # If output_path is intended as a directory by Spark, Pandas usually writes a file.
-            # But dashboards might expect a specific file. 
-            # Our config points to 'reports/csv/errors_by_type' (no extension in config usually? or with .csv?)
-            # The config usually has directory. 
-            # Let's append .csv if missing for pandas file
-            file_path = output_path
-            if not file_path.endswith('.csv'):
-                file_path = os.path.join(output_path, "report.csv")
-                # Pandas needs directory for that
-                os.makedirs(output_path, exist_ok=True)
-                
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
             pdf.to_csv(file_path, index=False)
             logger.info(f"Successfully exported to {file_path} (Pandas)")
 
@@ -67,35 +175,49 @@ def export_to_csv(df: DataFrame, output_path: str, mode: str = "overwrite") -> N
         raise
 
 
-def export_to_json(df: DataFrame, output_path: str, mode: str = "overwrite") -> None:
+def export_to_json(
+    df: DataFrame,
+    output_path: str,
+    mode: str = "overwrite",
+    row_limit: int = DEFAULT_DIRECT_WRITE_ROWS,
+    collected: Optional[_CollectedResults] = None
+) -> None:
     """
-    Export DataFrame to JSON using Spark (with Pandas fallback)
+    Export DataFrame to JSON.
+    Every path writes JSON lines (one object per row): small results
+    (<= row_limit rows) directly as one flat file, larger ones as a parallel
+    multi-part Spark write with a _manifest.json (with Pandas fallback).
+    collected shares the driver-side collection with the run's other formats.
     """
     try:
         logger.info(f"Exporting to JSON: {output_path}")
+        file_path, dir_path = _split_output_path(output_path, ".json")
         
+        # Direct driver-side write for small aggregates
         if mode == "overwrite":
-             if os.path.exists(output_path):
-                shutil.rmtree(output_path)
+            pdf = _collect(df, row_limit, collected)
+            if pdf is not None:
+                os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+                _write_json_records(pdf, file_path)
+                _remove_path(dir_path)  # Stale multi-part output from earlier runs
+                logger.info(f"Successfully exported {len(pdf)} rows to {file_path} (direct)")
+                return
+            _remove_path(file_path)
+            _remove_path(dir_path)
                 
-        # Try native Spark
+        # Try native Spark (parallel multi-part write)
         try:
-            df.coalesce(1).write \
+            df.write \
                 .mode(mode) \
-                .json(output_path)
-            logger.info(f"Successfully exported to {output_path} (Spark)")
+                .json(dir_path)
+            _write_manifest(dir_path, "json")
+            logger.info(f"Successfully exported to {dir_path} (Spark, multi-part)")
         except Exception:
             logger.warning("Spark JSON export failed, trying Pandas fallback...")
-            # Fallback
+            # Fallback: single flat file
             pdf = df.toPandas()
-            
-            # Similar directory vs file logic
-            file_path = output_path
-            if not file_path.endswith('.json'):
-                file_path = os.path.join(output_path, "report.json")
-                os.makedirs(output_path, exist_ok=True)
-                
-            pdf.to_json(file_path, orient='records', indent=2)
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            _write_json_records(pdf, file_path)
             logger.info(f"Successfully exported to {file_path} (Pandas)")
             
     except Exception as e:
@@ -103,28 +225,76 @@ def export_to_json(df: DataFrame, output_path: str, mode: str = "overwrite") ->
         raise
 
 
-def export_to_parquet(df: DataFrame, output_path: str, mode: str = "overwrite") -> None:
+def export_to_parquet(
+    df: DataFrame,
+    output_path: str,
+    mode: str = "overwrite",
+    parquet_config: Optional[Dict] = None
+) -> None:
     """
-    Export DataFrame to Parquet format
+    Export DataFrame to Parquet format with a pruning-friendly layout:
+    partitioned (by date, optionally log_level), sorted by timestamp within files,
+    zstd-compressed, with bounded file and row-group sizes so min/max statistics
+    let readers skip most of the data for time-range or level filters.
     """
+    parquet_config = parquet_config or {}
+    partition_by = [c for c in parquet_config.get('partition_by', ['date']) if c in df.columns]
+    sort_by = [c for c in parquet_config.get('sort_by', ['timestamp']) if c in df.columns]
+    compression = parquet_config.get('compression', 'zstd')
+    target_file_bytes = int(parquet_config.get('target_file_mb', 128)) * 1024 * 1024
+    row_group_bytes = int(parquet_config.get('row_group_mb', 64)) * 1024 * 1024
+    max_records_per_file = max(1, target_file_bytes // int(parquet_config.get('approx_row_bytes', 256)))
+
     try:
-        logger.info(f"Exporting to Parquet: {output_path}")
+        logger.info(f"Exporting to Parquet: {output_path} (partitioned by {partition_by}, sorted by {sort_by})")
+        
+        # Append mode: new files + transaction log commit (compaction runs separately)
+        if mode == "append":
+            append_to_table(df, output_path, parquet_config)
+            return
         
         # Try native Spark
         try:
-            df.write.mode(mode).parquet(output_path)
+            # Cluster each partition value into as few tasks as possible, then sort inside files
+            layout_df = df.repartition(*partition_by) if partition_by else df
+            if sort_by or partition_by:
+                layout_df = layout_df.sortWithinPartitions(*(partition_by + sort_by))
+            
+            writer = (
+                layout_df.write
+                .mode(mode)
+                .option("compression", compression)
+                .option("maxRecordsPerFile", max_records_per_file)
+                .option("parquet.block.size", row_group_bytes)
+            )
+            if partition_by:
+                writer = writer.partitionBy(*partition_by)
+            writer.parquet(output_path)
             logger.info(f"Successfully exported to {output_path} (Spark)")
         except Exception:
             logger.warning("Spark Parquet export failed, trying Pandas fallback...")
             pdf = df.toPandas()
             try:
+                if partition_by or sort_by:
+                    pdf = pdf.sort_values(partition_by + sort_by)
+                
                 # Handle directory path for Pandas (which expects a file path usually, unlike Spark)
                 target_path = output_path
-                if not target_path.lower().endswith('.parquet'):
-                    os.makedirs(target_path, exist_ok=True)
-                    target_path = os.path.join(target_path, "logs.parquet")
-                    
-                pdf.to_parquet(target_path, index=False)
+                if partition_by:
+                    if mode == "overwrite":
+                        _remove_path(target_path)
+                    pdf.to_parquet(
+                        target_path, index=False, partition_cols=partition_by,
+                        compression=compression, row_group_size=max_records_per_file
+                    )
+                else:
+                    if not target_path.lower().endswith('.parquet'):
+                        os.makedirs(target_path, exist_ok=True)
+                        target_path = os.path.join(target_path, "logs.parquet")
+                    pdf.to_parquet(
+                        target_path, index=False,
+                        compression=compression, row_group_size=max_records_per_file
+                    )
                 logger.info(f"Successfully exported to {target_path} (Pandas)")
             except Exception as pe:
                 logger.error(f"Pandas Parquet export also failed (missing pyarrow?): {pe}")
@@ -135,72 +305,173 @@ def export_to_parquet(df: DataFrame, output_path: str, mode: str = "overwrite")
         pass
 
 
-def generate_summary_report(analytics_results: Dict[str, DataFrame], config_path: str = "config/config.yaml") -> None:
-    """Generate summary report in CSV format"""
+# Analytics result name -> report name, per output format
+SUMMARY_CSV_REPORTS = [
+    ("errors_by_type", "errors_by_type"),
+    ("errors_by_hour", "errors_by_hour"),
+    ("top_n_errors", "top_errors"),
+    ("errors_per_ip", "errors_per_ip"),
+    ("errors_per_service", "errors_per_service"),
+    ("salted_keys", "salted_keys"),
+    ("latency_by_service", "latency_by_service"),
+]
+
+DETAILED_JSON_REPORTS = [
+    ("error_trends", "error_trends"),
+    ("errors_by_day", "errors_by_day"),
+    ("errors_by_severity", "errors_by_severity"),
+    ("latency_by_window", "latency_by_window"),
+]
+
+
+def _discard_on_failure(export: Callable, outputs: List[str]) -> None:
+    """Run one export; if it fails, delete whatever it wrote so no partial report is published"""
+    try:
+        export()
+    except Exception:
+        for path in outputs:
+            _remove_path(path)
+        raise
+
+
+def _report_tasks(
+    analytics_results: Dict[str, DataFrame],
+    reports: List[Tuple[str, str]],
+    export_fn: Callable,
+    output_dir: str,
+    row_limit: int,
+    extension: str = "",
+    collected: Optional[_CollectedResults] = None
+) -> List[Tuple[str, Callable]]:
+    """Build (report name, export callable) tasks for the results that exist"""
+    tasks = []
+    for result_name, report_name in reports:
+        result_df = analytics_results.get(result_name)
+        if result_df is None:
+            continue
+        output_path = f"{output_dir}/{report_name}"
+        # Flat file and multi-part directory variants of the report
+        outputs = list(_split_output_path(output_path, extension)) if extension else [output_path]
+        tasks.append((
+            report_name,
+            partial(_discard_on_failure, partial(
+                export_fn, result_df, output_path, row_limit=row_limit, collected=collected
+            ), outputs)
+        ))
+    return tasks
+
+
+def run_export_tasks(
+    tasks: List[Tuple[str, Callable]],
+    max_workers: int = 4,
+    spark: Optional[SparkSession] = None
+) -> Dict[str, str]:
+    """
+    Run export tasks concurrently against the shared SparkContext. Each report
+    gets its own FAIR scheduler pool so tiny jobs interleave instead of queueing;
+    failures are isolated per report, and a failed report's partial output is
+    deleted before the version is published.
+
+    Returns:
+        {report name: error message} for reports that failed
+    """
+    failures = {}
+
+    def run(name: str, fn: Callable) -> float:
+        if spark is not None and not is_remote_session(spark):
+            spark.sparkContext.setLocalProperty("spark.scheduler.pool", f"report_{name}")
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    phase_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="report-export") as pool:
+        futures = {pool.submit(run, name, fn): name for name, fn in tasks}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                logger.info(f"Report {name} exported in {future.result():.2f}s")
+            except Exception as e:
+                failures[name] = str(e)
+                logger.error(f"Report {name} failed: {e}")
+
+    logger.info(
+        f"Exported {len(tasks) - len(failures)}/{len(tasks)} reports in "
+        f"{time.perf_counter() - phase_start:.2f}s"
+    )
+    return failures
+
+
+def _export_workers(config: Dict) -> int:
+    return config.get('export', {}).get('max_concurrent_reports', 4)
+
+
+def summary_report_tasks(analytics_results: Dict[str, DataFrame], output_dir: str, row_limit: int,
+                         collected: Optional[_CollectedResults] = None):
+    """Export tasks for the CSV summary report"""
+    return _report_tasks(analytics_results, SUMMARY_CSV_REPORTS, export_to_csv, output_dir, row_limit, ".csv", collected)
+
+
+def detailed_report_tasks(analytics_results: Dict[str, DataFrame], output_dir: str, row_limit: int,
+                          collected: Optional[_CollectedResults] = None):
+    """Export tasks for the JSON detailed report"""
+    return _report_tasks(analytics_results, DETAILED_JSON_REPORTS, export_to_json, output_dir, row_limit, ".json", collected)
+
+
+def generate_summary_report(
+    analytics_results: Dict[str, DataFrame],
+    config_path: str = "config/config.yaml",
+    output_dir: Optional[str] = None
+) -> Dict[str, str]:
+    """Generate summary report in CSV format (into output_dir, default reports_csv_dir)"""
     config = load_config(config_path)
-    reports_csv_dir = config['paths']['reports_csv_dir']
+    reports_csv_dir = output_dir or config['paths']['reports_csv_dir']
+    row_limit = config.get('export', {}).get('direct_write_max_rows', DEFAULT_DIRECT_WRITE_ROWS)
     
     logger.info("Generating summary report...")
     
-    export_to_csv(
-        analytics_results.get("errors_by_type", None),
-        f"{reports_csv_dir}/errors_by_type"  # Spark output is dir
-    )
-    
-    export_to_csv(
-        analytics_results.get("errors_by_hour", None),
-        f"{reports_csv_dir}/errors_by_hour"
-    )
-    
-    export_to_csv(
-        analytics_results.get("top_n_errors", None),
-        f"{reports_csv_dir}/top_errors"
-    )
-    
-    export_to_csv(
-        analytics_results.get("errors_per_ip", None),
-        f"{reports_csv_dir}/errors_per_ip"
-    )
-    
-    export_to_csv(
-        analytics_results.get("errors_per_service", None),
-        f"{reports_csv_dir}/errors_per_service"
-    )
+    tasks = summary_report_tasks(analytics_results, reports_csv_dir, row_limit)
+    failures = run_export_tasks(tasks, _export_workers(config), _session_of(analytics_results))
     
     logger.info("Summary report generation completed")
+    return failures
 
 
-def generate_detailed_report(analytics_results: Dict[str, DataFrame], config_path: str = "config/config.yaml") -> None:
-    """Generate detailed report in JSON format"""
+def generate_detailed_report(
+    analytics_results: Dict[str, DataFrame],
+    config_path: str = "config/config.yaml",
+    output_dir: Optional[str] = None
+) -> Dict[str, str]:
+    """Generate detailed report in JSON format (into output_dir, default reports_json_dir)"""
     config = load_config(config_path)
-    reports_json_dir = config['paths']['reports_json_dir']
+    reports_json_dir = output_dir or config['paths']['reports_json_dir']
+    row_limit = config.get('export', {}).get('direct_write_max_rows', DEFAULT_DIRECT_WRITE_ROWS)
     
     logger.info("Generating detailed report...")
     
-    export_to_json(
-        analytics_results.get("error_trends", None),
-        f"{reports_json_dir}/error_trends"
-    )
-    
-    export_to_json(
-        analytics_results.get("errors_by_day", None),
-        f"{reports_json_dir}/errors_by_day"
-    )
-    
-    export_to_json(
-        analytics_results.get("errors_by_severity", None),
-        f"{reports_json_dir}/errors_by_severity"
-    )
+    tasks = detailed_report_tasks(analytics_results, reports_json_dir, row_limit)
+    failures = run_export_tasks(tasks, _export_workers(config), _session_of(analytics_results))
     
     logger.info("Detailed report generation completed")
+    return failures
 
 
-def export_summary_stats(summary: Dict, config_path: str = "config/config.yaml") -> None:
-    """Export summary statistics to JSON"""
-    import json
-    
+def _session_of(analytics_results: Dict[str, DataFrame]) -> Optional[SparkSession]:
+    """SparkSession behind the analytics results (None if there are none)"""
+    for result_df in analytics_results.values():
+        if result_df is not None:
+            return result_df.sparkSession
+    return None
+
+
+def export_summary_stats(
+    summary: Dict,
+    config_path: str = "config/config.yaml",
+    output_dir: Optional[str] = None
+) -> None:
+    """Export summary statistics to JSON (into output_dir, default reports_json_dir)"""
     config = load_config(config_path)
-    reports_json_dir = config['paths']['reports_json_dir']
+    reports_json_dir = output_dir or config['paths']['reports_json_dir']
     
     output_path = f"{reports_json_dir}/summary.json"
     
@@ -209,22 +480,447 @@ def export_summary_stats(summary: Dict, config_path: str = "config/config.yaml")
     
     logger.info(f"Exporting summary stats to: {output_path}")
     
-    with open(output_path, 'w') as f:
-        json.dump(summary, f, indent=2)
+    _atomic_write_json(output_path, summary)
     
     logger.info("Summary stats exported successfully")
 
 
-def export_all_reports(analytics_results: Dict[str, DataFrame], df_parsed: DataFrame = None, config_path: str = "config/config.yaml") -> None:
-    """Export all reports"""
+def export_to_arrow(
+    df: DataFrame,
+    output_path: str,
+    row_limit: int = DEFAULT_DIRECT_WRITE_ROWS,
+    collected: Optional[_CollectedResults] = None
+) -> bool:
+    """
+    Export DataFrame as an uncompressed Arrow IPC (Feather v2) file, which
+    readers can memory-map and open zero-copy. With collected, the pandas frame
+    the CSV/JSON export of the same result pulled is converted instead of
+    collecting the result again. Results above row_limit are streamed to the
+    file one record batch at a time, so the driver holds one partition at most.
+
+    Returns:
+        True once the file is written
+    """
+    import pyarrow as pa
+
+    logger.info(f"Exporting to Arrow IPC: {output_path}")
+    pdf = _collect(df, row_limit, collected)
+    if pdf is None:
+        rows = _write_arrow_batches(df, output_path)
+        logger.info(f"Successfully exported {rows} rows to {output_path} (Arrow IPC, streamed)")
+        return True
+
+    table = pa.Table.from_pandas(pdf, preserve_index=False)
+    _write_arrow_table(table, output_path)
+    logger.info(f"Successfully exported {table.num_rows} rows to {output_path} (Arrow IPC)")
+    return True
+
+
+def _write_arrow_batches(df: DataFrame, output_path: str) -> int:
+    """
+    Stream a large result into an Arrow IPC file: rows arrive partition by
+    partition (toLocalIterator) and are written as record batches of
+    spark.sql.execution.arrow.maxRecordsPerBatch rows.
+
+    Returns:
+        Number of rows written
+    """
+    import pyarrow as pa
+
+    batch_rows = int(df.sparkSession.conf.get("spark.sql.execution.arrow.maxRecordsPerBatch", "10000"))
+    try:
+        from pyspark.sql.pandas.types import to_arrow_schema
+        schema = to_arrow_schema(df.schema)
+    except Exception:
+        schema = None  # Inferred from the first batch
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    rows, chunk, writer = 0, [], None
+    with pa.OSFile(output_path, "wb") as sink:
+        try:
+            for row in _iter_rows(df):
+                chunk.append(row.asDict(recursive=True))
+                if len(chunk) < batch_rows:
+                    continue
+                batch = pa.RecordBatch.from_pylist(chunk, schema=schema)
+                if writer is None:
+                    schema = batch.schema
+                    writer = pa.ipc.new_file(sink, schema)
+                writer.write_batch(batch)
+                rows += len(chunk)
+                chunk = []
+            if chunk or writer is None:
+                batch = pa.RecordBatch.from_pylist(chunk, schema=schema)
+                if writer is None:
+                    writer = pa.ipc.new_file(sink, batch.schema)
+                writer.write_batch(batch)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+    return rows
+
+
+def _iter_rows(df: DataFrame):
+    # Prefetching overlaps fetching the next partition with writing this one
+    try:
+        return df.toLocalIterator(prefetchPartitions=True)
+    except TypeError:
+        return df.toLocalIterator()
+
+
+def _write_arrow_table(table, output_path: str) -> None:
+    import pyarrow as pa
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with pa.OSFile(output_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _export_arrow_summary(summary: Dict, output_path: str) -> None:
+    """Write the summary dict as a one-row Arrow IPC file"""
+    import pyarrow as pa
+
+    # Nested sections (level counts, percentiles) are kept as JSON strings
+    row = {
+        key: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+        for key, value in summary.items()
+    }
+    _write_arrow_table(pa.Table.from_pylist([row]), output_path)
+
+
+def arrow_report_tasks(
+    analytics_results: Dict[str, DataFrame],
+    summary: Optional[Dict],
+    output_dir: str,
+    row_limit: int,
+    collected: Optional[_CollectedResults] = None
+) -> List[Tuple[str, Callable]]:
+    """Export tasks writing every analytics result (and the summary) as <name>.arrow"""
+    reports = [(name, f"{name}.arrow") for name in analytics_results]
+    tasks = [
+        (f"arrow:{name}", fn)
+        for name, fn in _report_tasks(analytics_results, reports, export_to_arrow, output_dir, row_limit,
+                                      collected=collected)
+    ]
+    if summary is not None:
+        summary_path = f"{output_dir}/summary.arrow"
+        tasks.append(("arrow:summary", partial(
+            _discard_on_failure, partial(_export_arrow_summary, summary, summary_path), [summary_path]
+        )))
+    return tasks
+
+
+def generate_arrow_reports(
+    analytics_results: Dict[str, DataFrame],
+    summary: Optional[Dict] = None,
+    config_path: str = "config/config.yaml",
+    output_dir: Optional[str] = None
+) -> Dict[str, str]:
+    """Write every analytics result (and the summary) as <name>.arrow"""
+    config = load_config(config_path)
+    reports_arrow_dir = output_dir or config['paths'].get('reports_arrow_dir', 'reports/arrow')
+    row_limit = config.get('export', {}).get('direct_write_max_rows', DEFAULT_DIRECT_WRITE_ROWS)
+
+    logger.info("Generating Arrow IPC reports...")
+
+    tasks = arrow_report_tasks(analytics_results, summary, reports_arrow_dir, row_limit)
+    failures = run_export_tasks(tasks, _export_workers(config), _session_of(analytics_results))
+
+    logger.info("Arrow IPC report generation completed")
+    return failures
+
+
+# --- Versioned report publishing ---
+# Every run is written to <reports_dir>/versions/.staging-<id> in each report
+# directory (csv, json, arrow). Once all are complete they are renamed to
+# versions/<id>, and the run is published by atomically replacing one pointer,
+# published.json, in the directory containing all report directories (e.g.
+# reports/). It names the version and lists the files of every report
+# directory, so readers resolving through it see the CSV, JSON and Arrow
+# reports of the same run and never a half-written version. Staging dirs and
+# unpublished versions left by a crashed run are removed by the next run.
+
+VERSIONS_DIR = "versions"
+PUBLISHED_POINTER = "published.json"
+STAGING_PREFIX = ".staging-"
+# Per-directory manifest written before the single pointer existed
+LEGACY_MANIFEST = "current.json"
+
+
+def _atomic_write_json(path: str, payload: Dict) -> None:
+    """Write JSON via a temp file + os.replace so readers never see a partial file"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pointer_root(report_dirs: List[str]) -> str:
+    """Directory holding published.json: the closest common parent of the report dirs"""
+    return os.path.commonpath([os.path.abspath(d) for d in report_dirs])
+
+
+def _dir_key(root: str, reports_dir: str) -> str:
+    return os.path.relpath(os.path.abspath(reports_dir), root).replace("\\", "/")
+
+
+def read_published(reports_dir: str) -> Optional[Tuple[str, Dict]]:
+    """
+    Find the pointer that publishes reports_dir
+
+    Returns:
+        (pointer root, pointer) or None if nothing published yet
+    """
+    level = os.path.abspath(reports_dir)
+    while True:
+        pointer_path = os.path.join(level, PUBLISHED_POINTER)
+        if os.path.exists(pointer_path):
+            with open(pointer_path, 'r') as f:
+                pointer = json.load(f)
+            if _dir_key(level, reports_dir) in pointer.get("dirs", {}):
+                return level, pointer
+        parent = os.path.dirname(level)
+        if parent == level:
+            return None
+        level = parent
+
+
+def cleanup_stale_versions(reports_dir: str) -> None:
+    """
+    Remove staging dirs and never-published versions left by a crashed run.
+    Runs publishing to the same report directories must not overlap.
+    """
+    versions_root = os.path.join(reports_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_root):
+        return
+    manifest = read_current_manifest(reports_dir)
+    current = manifest["version"] if manifest else None
+    for name in os.listdir(versions_root):
+        # Renamed into place but the pointer was never switched (newer than the published version)
+        orphan = not name.startswith(".") and (current is None or name > current)
+        if name.startswith(STAGING_PREFIX) or orphan:
+            _remove_path(os.path.join(versions_root, name))
+            logger.info(f"Removed stale report version {name} in {reports_dir}")
+
+
+def begin_report_version(reports_dir: str, version_id: str) -> str:
+    """Remove leftovers of crashed runs, then create and return the staging directory for a new report version"""
+    cleanup_stale_versions(reports_dir)
+    staging_dir = os.path.join(reports_dir, VERSIONS_DIR, f"{STAGING_PREFIX}{version_id}")
+    _remove_path(staging_dir)
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+def read_current_manifest(reports_dir: str) -> Optional[Dict]:
+    """Return the published manifest for reports_dir (None if nothing published yet)"""
+    published = read_published(reports_dir)
+    if published is None:
+        # Published before the shared pointer existed
+        legacy_path = os.path.join(reports_dir, LEGACY_MANIFEST)
+        if not os.path.exists(legacy_path):
+            return None
+        with open(legacy_path, 'r') as f:
+            return json.load(f)
+    root, pointer = published
+    manifest = {k: v for k, v in pointer.items() if k != "dirs"}
+    manifest["files"] = pointer["dirs"][_dir_key(root, reports_dir)]
+    return manifest
+
+
+def resolve_report_path(reports_dir: str, report_file: str) -> Optional[str]:
+    """Path of report_file (e.g. 'errors_by_type.csv') in the current version"""
+    manifest = read_current_manifest(reports_dir)
+    if manifest is None or report_file not in manifest.get("files", {}):
+        return None
+    return os.path.join(reports_dir, VERSIONS_DIR, manifest["version"], report_file)
+
+
+def _list_version_files(version_dir: str) -> Dict[str, Dict]:
+    files = {}
+    for root, _, names in os.walk(version_dir):
+        for name in names:
+            if name.endswith(".crc"):
+                continue
+            full_path = os.path.join(root, name)
+            rel_path = os.path.relpath(full_path, version_dir).replace("\\", "/")
+            files[rel_path] = {
+                "bytes": os.path.getsize(full_path),
+                "sha256": _file_sha256(full_path),
+            }
+    return files
+
+
+def commit_report_versions(
+    staging: Dict[str, str],
+    version_id: str,
+    keep_versions: int = 5,
+    mirror_latest: bool = True,
+    extra: Optional[Dict] = None
+) -> Dict:
+    """
+    Finalize a staged version in every report directory: rename each staging dir
+    into place, switch the single published.json pointer last, then optionally
+    mirror flat files to each reports_dir for legacy readers and prune old versions.
+    Flat copies mirrored from the previous version that are not part of this one
+    (failed or dropped reports) are removed, so the flat files never mix versions.
+
+    Args:
+        staging: reports_dir -> its staging dir from begin_report_version
+
+    Returns:
+        The published pointer
+    """
+    root = _pointer_root(list(staging))
+    previous = {}
+    for reports_dir in staging:
+        try:
+            manifest = read_current_manifest(reports_dir)
+        except (OSError, ValueError):
+            manifest = None
+        previous[reports_dir] = set((manifest or {}).get("files", {}))
+
+    dirs = {}
+    for reports_dir, staging_dir in staging.items():
+        version_dir = os.path.join(reports_dir, VERSIONS_DIR, version_id)
+        os.replace(staging_dir, version_dir)
+        dirs[_dir_key(root, reports_dir)] = _list_version_files(version_dir)
+
+    pointer = {
+        "version": version_id,
+        "published_at": datetime.now().isoformat(),
+        "dirs": dirs,
+    }
+    if extra:
+        pointer.update(extra)
+    _atomic_write_json(os.path.join(root, PUBLISHED_POINTER), pointer)
+    logger.info(f"Published report version {version_id} in {root} "
+                f"({sum(len(files) for files in dirs.values())} files)")
+
+    for reports_dir in staging:
+        version_dir = os.path.join(reports_dir, VERSIONS_DIR, version_id)
+        _remove_path(os.path.join(reports_dir, LEGACY_MANIFEST))
+
+        # Legacy flat copies (each replaced atomically)
+        mirrored = set()
+        if mirror_latest:
+            for rel_path in dirs[_dir_key(root, reports_dir)]:
+                if "/" in rel_path:
+                    continue  # Multi-part reports are only served from the version dir
+                tmp_path = os.path.join(reports_dir, f".{rel_path}.tmp-{os.getpid()}")
+                shutil.copyfile(os.path.join(version_dir, rel_path), tmp_path)
+                os.replace(tmp_path, os.path.join(reports_dir, rel_path))
+                mirrored.add(rel_path)
+
+        # Flat copies of the previous version this one does not replace
+        for rel_path in previous[reports_dir] - mirrored:
+            if "/" not in rel_path:
+                _remove_path(os.path.join(reports_dir, rel_path))
+
+        prune_report_versions(reports_dir, keep_versions, current=version_id)
+    return pointer
+
+
+def prune_report_versions(reports_dir: str, keep_versions: int, current: Optional[str] = None) -> None:
+    """Delete all but the newest keep_versions versions (never the current one)"""
+    versions_root = os.path.join(reports_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_root):
+        return
+
+    versions = sorted(
+        (v for v in os.listdir(versions_root) if not v.startswith(".")),
+        reverse=True
+    )
+    for old_version in versions[max(keep_versions, 1):]:
+        if old_version == current:
+            continue
+        shutil.rmtree(os.path.join(versions_root, old_version), ignore_errors=True)
+        logger.info(f"Pruned report version {old_version}")
+
+
+def wait_for_background_jobs(timeout: Optional[float] = None) -> None:
+    """Block until background export jobs (compaction) finish; call before stopping Spark"""
+    while _background_jobs:
+        job = _background_jobs.pop()
+        job.join(timeout)
+
+
+def export_all_reports(
+    analytics_results: Dict[str, DataFrame],
+    df_parsed: DataFrame = None,
+    config_path: str = "config/config.yaml",
+    summary: Optional[Dict] = None
+) -> str:
+    """
+    Export all reports as one atomically published version
+
+    Returns:
+        The published version id
+    """
     logger.info("Exporting all reports...")
     
-    generate_summary_report(analytics_results, config_path)
-    generate_detailed_report(analytics_results, config_path)
+    config = load_config(config_path)
+    export_cfg = config.get('export', {})
+    reports_csv_dir = config['paths']['reports_csv_dir']
+    reports_json_dir = config['paths']['reports_json_dir']
+    reports_arrow_dir = config['paths'].get('reports_arrow_dir')
+    
+    version_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    report_dirs = [reports_csv_dir, reports_json_dir] + ([reports_arrow_dir] if reports_arrow_dir else [])
+    staging = {d: begin_report_version(d, version_id) for d in report_dirs}
+    
+    row_limit = export_cfg.get('direct_write_max_rows', DEFAULT_DIRECT_WRITE_ROWS)
+    
+    try:
+        # All report writes go into one concurrent phase (FAIR pools, per-report isolation);
+        # each small result is collected once and shared by its CSV/JSON/Arrow writers
+        collected = _CollectedResults(row_limit)
+        tasks = summary_report_tasks(analytics_results, staging[reports_csv_dir], row_limit, collected)
+        tasks += detailed_report_tasks(analytics_results, staging[reports_json_dir], row_limit, collected)
+        if reports_arrow_dir:
+            tasks += arrow_report_tasks(analytics_results, summary, staging[reports_arrow_dir], row_limit, collected)
+        failures = run_export_tasks(tasks, _export_workers(config), _session_of(analytics_results))
+        
+        if summary is not None:
+            export_summary_stats(summary, config_path, output_dir=staging[reports_json_dir])
+    except Exception:
+        # Previous version stays published; discard the partial one
+        logger.error("Report export failed; keeping previously published version")
+        for staging_dir in staging.values():
+            _remove_path(staging_dir)
+        raise
+    
+    keep_versions = export_cfg.get('keep_versions', 5)
+    mirror_latest = export_cfg.get('mirror_latest', True)
+    if failures:
+        # Their partial files were deleted; the manifest lists only complete reports
+        logger.warning(f"Publishing version {version_id} without failed reports: {sorted(failures)}")
+    commit_report_versions(
+        staging, version_id, keep_versions, mirror_latest,
+        extra={"failed_reports": failures} if failures else None
+    )
     
     if df_parsed is not None:
-        config = load_config(config_path)
         parquet_dir = config['paths'].get('parquet_dir', 'data/processed')
-        export_to_parquet(df_parsed, parquet_dir)
+        parquet_cfg = export_cfg.get('parquet', {})
+        write_mode = parquet_cfg.get('write_mode', 'overwrite')
+        export_to_parquet(df_parsed, parquet_dir, mode=write_mode, parquet_config=parquet_cfg)
+        
+        # Merge small files from appends without blocking the pipeline
+        if write_mode == "append" and parquet_cfg.get('compaction', {}).get('enabled', True):
+            _background_jobs.append(
+                start_background_compaction(parquet_dir, parquet_cfg, df_parsed.sparkSession)
+            )
     
-    logger.info("All reports exported successfully")
+    logger.info(f"All reports exported successfully (version {version_id})")
+    return version_id
@@ -7,7 +7,9 @@ import logging
 from pyspark.sql import SparkSession, DataFrame
 from pyspark.sql import functions as F
 from pyspark.sql.types import StructType, StringType
-from typing import List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlparse
 import os
 import sys
 
@@ -21,6 +23,24 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Raw file each row came from (lets append mode and incremental digests skip files already processed)
+SOURCE_COLUMN = "source_file"
+
+
+def source_path(uri: str) -> str:
+    """Local path of a raw file as reported by input_file_name() (file:// URI)"""
+    parsed = urlparse(uri)
+    return os.path.abspath(unquote(parsed.path) if parsed.scheme == "file" else uri)
+
+
+def source_signature(path: str) -> Optional[Dict]:
+    """Size and mtime of a raw file (None if it is gone); a new signature means the file changed"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {"bytes": stat.st_size, "mtime": stat.st_mtime}
+
 
 def load_logs_from_csv(
     spark: SparkSession,
@@ -55,7 +75,8 @@ def load_logs_from_csv(
                 .option("inferSchema", "true") \
                 .option("quote", "\"") \
                 .option("escape", "\"") \
-                .csv(input_path)
+                .csv(input_path) \
+                .withColumn(SOURCE_COLUMN, F.input_file_name())
                 
             # Trigger action to verify read works (Spark is lazy)
             count = df.count()
@@ -85,6 +106,8 @@ def load_logs_from_csv(
                     pdf.columns = pdf.columns.str.lower()
                     # Remove duplicate columns
                     pdf = pdf.loc[:, ~pdf.columns.duplicated()]
+                    # Same form as input_file_name() on the Spark path
+                    pdf[SOURCE_COLUMN] = Path(f).absolute().as_uri()
                     
                     # Manual timestamp construction for workaround (if needed)
                     # Note: Since we forced dtype=str, we must handle conversions carefully later or let Spark infer
@@ -0,0 +1,220 @@
+"""
+Alert Notification Module
+Queues outbound alert emails and sends them from a background worker so the
+pipeline never waits on the mail server.
+
+- One persistent SMTP connection, re-established when the server drops it
+- Alerts raised close together (e.g. one pipeline run) go out as a single digest
+- Failed sends are retried with exponential backoff
+
+For local testing point alerts.email.smtp_server/smtp_port at a stand-in
+(e.g. `python -m aiosmtpd -n -l localhost:8025`) with starttls: false.
+"""
+
+import logging
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Renders queued alerts into (subject, plain text, html)
+Renderer = Callable[[List[Dict]], Tuple[str, str, str]]
+
+_STOP = object()
+
+
+class EmailNotifier:
+    """Background SMTP sender with batching, reconnect and retry"""
+
+    def __init__(
+        self,
+        smtp_server: str,
+        smtp_port: int,
+        sender: str,
+        recipients: List[str],
+        render: Renderer,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        timeout: float = 10.0,
+        batch_window: float = 2.0,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        on_sent: Optional[Callable[[List[Dict]], None]] = None
+    ):
+        """
+        Initialize the notifier and start its worker thread
+
+        Args:
+            smtp_server: SMTP host
+            smtp_port: SMTP port
+            sender: From address (also the login user)
+            recipients: To addresses
+            render: Callable turning a batch of alerts into (subject, plain, html)
+            password: SMTP password (login is skipped when empty)
+            starttls: Upgrade the connection with STARTTLS
+            timeout: Socket timeout in seconds
+            batch_window: Seconds to wait for more alerts before sending a digest
+            max_retries: Send attempts after the first failure
+            backoff: Initial retry delay in seconds (doubles per attempt)
+            on_sent: Called on the worker thread with each batch once it was delivered
+        """
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.render = render
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_sent = on_sent
+
+        self.sent_batches = 0
+        self.failed_batches = 0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._connection: Optional[smtplib.SMTP] = None
+        self._worker = threading.Thread(target=self._run, name="alert-email", daemon=True)
+        self._worker.start()
+
+    def notify(self, alert: Dict) -> None:
+        """Queue an alert for delivery (never blocks on the network)"""
+        self._queue.put(alert)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued alert has been sent or given up on
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning(f"{self._queue.unfinished_tasks} alert email(s) still pending")
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush, stop the worker and close the SMTP connection"""
+        self.flush(timeout)
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+
+    # --- Worker ---
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                self._disconnect()
+                return
+
+            # Collect whatever else arrives within the batch window into one digest
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+
+            self._deliver(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                self._disconnect()
+                return
+
+    def _deliver(self, batch: List[Dict]) -> None:
+        try:
+            message = self._build_message(batch)
+        except Exception as e:
+            logger.error(f"Could not render alert email: {e}")
+            self.failed_batches += 1
+            return
+
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                connection = self._connect()
+                connection.sendmail(self.sender, self.recipients, message)
+                self.sent_batches += 1
+                logger.info(f"Alert email ({len(batch)} alert(s)) sent to {self.recipients}")
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                # Drop the connection so the next attempt starts clean
+                self._disconnect()
+                if attempt == self.max_retries:
+                    self.failed_batches += 1
+                    logger.error(f"Giving up on alert email after {attempt + 1} attempt(s): {e}")
+                    return
+                logger.warning(f"Alert email attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay *= 2
+
+        if self.on_sent is not None:
+            try:
+                self.on_sent(batch)
+            except Exception as e:
+                logger.error(f"Could not record sent alert email: {e}")
+
+    def _build_message(self, batch: List[Dict]) -> str:
+        subject, plain, html = self.render(batch)
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.sender
+        msg['To'] = ", ".join(self.recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(plain, 'plain'))
+        msg.attach(MIMEText(html, 'html'))
+        return msg.as_string()
+
+    def _connect(self) -> smtplib.SMTP:
+        """Reuse the open connection if the server still answers, else reconnect"""
+        if self._connection is not None:
+            try:
+                if self._connection.noop()[0] == 250:
+                    return self._connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._disconnect()
+
+        connection = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.password:
+                connection.login(self.sender, self.password)
+        except Exception:
+            connection.close()
+            raise
+        self._connection = connection
+        return connection
+
+    def _disconnect(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except (smtplib.SMTPException, OSError):
+            self._connection.close()
+        self._connection = None
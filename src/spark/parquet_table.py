@@ -0,0 +1,468 @@
+"""
+Parquet Table Module
+Append-with-compaction storage for data/processed: new data is written as new
+files, tracked in a transaction log (_txn_log) with commit/rollback, and small
+files are periodically merged into target-sized ones by a background job.
+
+- Rows carry the raw file they came from (source_file) and each commit
+  records the raw files it ingested with their size and mtime. An append
+  writes only rows of raw files not ingested yet as pure adds, so re-running
+  the pipeline over the same raw logs neither duplicates nor rewrites them,
+  and rows of raw files rotated away are kept
+- A raw file that changed since it was ingested replaces its earlier rows:
+  the live files holding them are rewritten without them (each data file
+  lists the raw files it holds rows of)
+- Files written before sources were tracked (including a legacy
+  unpartitioned logs.parquet) are replaced by the first append
+- Files a commit removes are deleted by vacuum_table only after
+  retention_hours, so readers that resolved an older log version keep
+  working; staging directories of crashed writers are removed the same way
+
+Log layout:
+    <table_dir>/_txn_log/00000000.json   {"version", "operation", "add", "remove", "sources", "timestamp"}
+    add:     [{"path", "bytes", "sources": [raw file, ...]}]
+    sources: {raw file: {"bytes", "mtime"}} ingested by the commit
+Readers should use the log (TransactionLog.active_files() / table_files()):
+until vacuum runs, the directory still holds replaced files.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+
+# Handle imports for both direct execution and module import
+try:
+    from src.spark.spark_session import get_spark_session
+    from src.spark.ingest_logs import SOURCE_COLUMN, source_path, source_signature
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+    from src.spark.spark_session import get_spark_session
+    from src.spark.ingest_logs import SOURCE_COLUMN, source_path, source_signature
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOG_DIR = "_txn_log"
+STAGING_DIR = "_staging"
+DEFAULT_RETENTION_HOURS = 24
+
+# Serializes commits from threads in this process (appends vs background compaction)
+_commit_lock = threading.Lock()
+
+
+class CommitConflict(Exception):
+    """Raised when a commit loses a race or removes files that are no longer active"""
+
+
+class TransactionLog:
+    """Ordered JSON commit log describing which data files are live"""
+
+    def __init__(self, table_dir: str):
+        self.table_dir = table_dir
+        self.log_dir = os.path.join(table_dir, LOG_DIR)
+
+    def versions(self) -> List[int]:
+        if not os.path.isdir(self.log_dir):
+            return []
+        return sorted(
+            int(name[:-5]) for name in os.listdir(self.log_dir)
+            if name.endswith(".json") and name[:-5].isdigit()
+        )
+
+    def entries(self) -> List[Dict]:
+        result = []
+        for version in self.versions():
+            with open(self._entry_path(version), "r") as f:
+                result.append(json.load(f))
+        return result
+
+    def active_files(self) -> List[str]:
+        """Replay the log and return live data files (relative to table_dir)"""
+        active = {}
+        for entry in self.entries():
+            for path in entry.get("remove", []):
+                active.pop(path, None)
+            for item in entry.get("add", []):
+                active[item["path"]] = item
+        return sorted(active)
+
+    def live_entries(self) -> Dict[str, Dict]:
+        """Live data files with their log 'add' entries"""
+        active = {}
+        for entry in self.entries():
+            for path in entry.get("remove", []):
+                active.pop(path, None)
+            for item in entry.get("add", []):
+                active[item["path"]] = item
+        return active
+
+    def file_sizes(self) -> Dict[str, int]:
+        """Live data files with their recorded sizes"""
+        return {path: item.get("bytes", 0) for path, item in self.live_entries().items()}
+
+    def ingested_sources(self) -> Dict[str, Dict]:
+        """Raw files ingested so far with the size/mtime they had when ingested"""
+        sources = {}
+        for entry in self.entries():
+            sources.update(entry.get("sources", {}))
+        return sources
+
+    def removed_files(self) -> Dict[str, str]:
+        """Files removed by a commit and not re-added since, with the removal time"""
+        removed = {}
+        for entry in self.entries():
+            for path in entry.get("remove", []):
+                removed[path] = entry["timestamp"]
+            for item in entry.get("add", []):
+                removed.pop(item["path"], None)
+        return removed
+
+    def commit(self, operation: str, add: List[Dict], remove: List[str],
+               replace_partitions: Optional[List[str]] = None,
+               sources: Optional[Dict[str, Dict]] = None) -> int:
+        """
+        Atomically append a commit. Fails with CommitConflict if another writer
+        took the version or a removed file is no longer active.
+
+        Args:
+            replace_partitions: Top-level partition directories ("" = unpartitioned
+                root) whose live files are also removed (resolved under the commit
+                lock, so concurrent compactions cannot slip files past it)
+            sources: Raw files ingested by this commit with their size/mtime
+        """
+        with _commit_lock:
+            os.makedirs(self.log_dir, exist_ok=True)
+            remove = list(remove)
+            if remove or replace_partitions:
+                active = set(self.active_files())
+                missing = [p for p in remove if p not in active]
+                if missing:
+                    raise CommitConflict(f"Files no longer active: {missing[:5]}")
+                if replace_partitions:
+                    partitions = set(replace_partitions)
+                    added = {item["path"] for item in add}
+                    remove += [
+                        p for p in sorted(active)
+                        if _top_partition(p) in partitions and p not in added and p not in remove
+                    ]
+
+            versions = self.versions()
+            version = versions[-1] + 1 if versions else 0
+            entry = {
+                "version": version,
+                "operation": operation,
+                "timestamp": datetime.now().isoformat(),
+                "add": add,
+                "remove": remove,
+            }
+            if sources:
+                entry["sources"] = sources
+
+            # O_EXCL makes the version slot a compare-and-swap
+            try:
+                fd = os.open(self._entry_path(version), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                raise CommitConflict(f"Version {version} already committed")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f, indent=2)
+
+        logger.info(f"Committed {operation} v{version}: +{len(add)} / -{len(remove)} files")
+        return version
+
+    def _entry_path(self, version: int) -> str:
+        return os.path.join(self.log_dir, f"{version:08d}.json")
+
+
+def _top_partition(path: str) -> str:
+    """First directory of a table-relative path ("" for files at the table root)"""
+    return path.split("/", 1)[0] if "/" in path else ""
+
+
+def _list_data_files(root: str) -> List[str]:
+    """Parquet files under root (relative paths), ignoring _/. prefixed dirs"""
+    files = []
+    for current, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(("_", "."))]
+        for name in names:
+            if name.endswith(".parquet"):
+                files.append(os.path.relpath(os.path.join(current, name), root).replace("\\", "/"))
+    return sorted(files)
+
+
+def _bootstrap_log(log: TransactionLog) -> None:
+    """Register files of a table written before the log existed"""
+    if log.versions():
+        return
+    existing = _list_data_files(log.table_dir)
+    add = [
+        {"path": p, "bytes": os.path.getsize(os.path.join(log.table_dir, p))}
+        for p in existing
+    ]
+    log.commit("bootstrap", add, [])
+
+
+def _write_staged(df: DataFrame, staging_dir: str, parquet_config: Dict, num_files: Optional[int] = None) -> None:
+    """Write df to a staging directory using the table's layout"""
+    partition_by = [c for c in parquet_config.get('partition_by', ['date']) if c in df.columns]
+    sort_by = [c for c in parquet_config.get('sort_by', ['timestamp']) if c in df.columns]
+    row_group_bytes = int(parquet_config.get('row_group_mb', 64)) * 1024 * 1024
+    target_file_bytes = int(parquet_config.get('target_file_mb', 128)) * 1024 * 1024
+    max_records_per_file = max(1, target_file_bytes // int(parquet_config.get('approx_row_bytes', 256)))
+
+    if num_files is not None:
+        layout_df = df.repartition(num_files, *partition_by) if partition_by else df.repartition(num_files)
+    else:
+        layout_df = df.repartition(*partition_by) if partition_by else df
+    if sort_by or partition_by:
+        layout_df = layout_df.sortWithinPartitions(*(partition_by + sort_by))
+
+    writer = (
+        layout_df.write
+        .mode("overwrite")
+        .option("compression", parquet_config.get('compression', 'zstd'))
+        .option("maxRecordsPerFile", max_records_per_file)
+        .option("parquet.block.size", row_group_bytes)
+    )
+    if partition_by:
+        writer = writer.partitionBy(*partition_by)
+    writer.parquet(staging_dir)
+
+
+def _publish_staged(table_dir: str, staging_dir: str, sources: Optional[List[str]] = None) -> List[Dict]:
+    """Move staged data files into the table; returns log 'add' entries (tagged with their raw files)"""
+    added = []
+    for rel_path in _list_data_files(staging_dir):
+        target = os.path.join(table_dir, rel_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(staging_dir, rel_path), target)
+        item = {"path": rel_path, "bytes": os.path.getsize(target)}
+        if sources is not None:
+            item["sources"] = sources
+        added.append(item)
+    return added
+
+
+def _rollback(table_dir: str, added: List[Dict], staging_dir: str) -> None:
+    """Remove files moved in by an uncommitted transaction"""
+    for item in added:
+        try:
+            os.remove(os.path.join(table_dir, item["path"]))
+        except OSError:
+            pass
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def table_files(table_dir: str) -> List[str]:
+    """Paths of the table's live data files (from the log when there is one)"""
+    log = TransactionLog(table_dir)
+    paths = log.active_files() if log.versions() else _list_data_files(table_dir)
+    return [os.path.join(table_dir, p) for p in paths]
+
+
+def vacuum_table(table_dir: str, retention_hours: float = DEFAULT_RETENTION_HOURS) -> int:
+    """
+    Delete files that commits removed more than retention_hours ago, and staging
+    directories left behind by writers that crashed at least that long ago.
+
+    Returns:
+        Number of data files deleted
+    """
+    log = TransactionLog(table_dir)
+    cutoff = datetime.now() - timedelta(hours=retention_hours)
+    deleted = 0
+
+    if log.versions():
+        active = set(log.active_files())
+        for path, removed_at in log.removed_files().items():
+            full_path = os.path.join(table_dir, path)
+            if path in active or datetime.fromisoformat(removed_at) > cutoff or not os.path.exists(full_path):
+                continue
+            try:
+                os.remove(full_path)
+                deleted += 1
+            except OSError:
+                pass
+
+    staging_root = os.path.join(table_dir, STAGING_DIR)
+    if os.path.isdir(staging_root):
+        for name in os.listdir(staging_root):
+            path = os.path.join(staging_root, name)
+            if os.path.getmtime(path) < cutoff.timestamp():
+                logger.info(f"Removing stale staging directory {path}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    if deleted:
+        logger.info(f"Vacuumed {deleted} file(s) from {table_dir}")
+    return deleted
+
+
+def append_to_table(df: DataFrame, table_dir: str, parquet_config: Optional[Dict] = None) -> Optional[int]:
+    """
+    Write the rows of df from raw files not ingested yet as new files and commit
+    them to the transaction log (the pipeline re-reads all raw logs each run).
+    Rows of raw files that changed since they were ingested replace their
+    earlier rows. On any failure the moved files are removed and nothing is committed.
+
+    Returns:
+        Committed log version (None if there was no new input)
+    """
+    parquet_config = parquet_config or {}
+    log = TransactionLog(table_dir)
+    os.makedirs(table_dir, exist_ok=True)
+    _bootstrap_log(log)
+
+    txn_id = uuid.uuid4().hex
+    staging_dir = os.path.join(table_dir, STAGING_DIR, txn_id)
+    added: List[Dict] = []
+
+    if SOURCE_COLUMN not in df.columns:
+        # No lineage: replace every partition the input has rows for
+        logger.warning(f"No {SOURCE_COLUMN} column; appending by replacing the input's partitions")
+        new_rows, remove, tagged, sources = df, [], None, None
+    else:
+        uris = [row[0] for row in df.select(SOURCE_COLUMN).distinct().collect() if row[0]]
+        signatures = {uri: source_signature(source_path(uri)) for uri in uris}
+        ingested = log.ingested_sources()
+        live = log.live_entries()
+
+        if any("sources" not in item for item in live.values()):
+            # Written before sources were tracked: re-ingest everything once, replacing them
+            logger.info(f"Replacing {len(live)} file(s) written without source tracking")
+            fresh, changed, rewritten, remove = uris, [], [], sorted(live)
+        else:
+            fresh = [u for u in uris if source_path(u) not in ingested]
+            changed = [u for u in uris if source_path(u) in ingested and ingested[source_path(u)] != signatures[u]]
+            changed_paths = {source_path(u) for u in changed}
+            rewritten = remove = sorted(path for path, item in live.items() if changed_paths & set(item["sources"]))
+
+        if not fresh and not changed:
+            logger.info(f"No new raw logs to append to {table_dir}")
+            return None
+
+        new_rows = df.where(F.col(SOURCE_COLUMN).isin(fresh + changed))
+        tagged = {source_path(u) for u in fresh + changed}
+        if rewritten:
+            # Keep the other raw files' rows of the files holding a changed file's old rows
+            kept = (
+                df.sparkSession.read
+                .option("basePath", table_dir)
+                .parquet(*[os.path.join(table_dir, p) for p in rewritten])
+                .where(~F.col(SOURCE_COLUMN).isin(changed))
+            )
+            kept = kept.select([F.col(f.name).cast(f.dataType) if f.name in kept.columns
+                                else F.lit(None).cast(f.dataType).alias(f.name) for f in df.schema])
+            new_rows = new_rows.unionByName(kept)
+            for path in rewritten:
+                tagged.update(live[path]["sources"])
+        tagged = sorted(tagged)
+        sources = {source_path(u): signatures[u] for u in fresh + changed if signatures[u]}
+        logger.info(f"{len(fresh)} new and {len(changed)} changed raw file(s) to append")
+
+    logger.info(f"Appending to {table_dir} (txn {txn_id})")
+    try:
+        _write_staged(new_rows, staging_dir, parquet_config)
+        added = _publish_staged(table_dir, staging_dir, tagged)
+        # Without lineage the partitions the input touched are replaced
+        partitions = None if sources is not None else sorted({_top_partition(item["path"]) for item in added})
+        version = log.commit("append", added, remove, replace_partitions=partitions, sources=sources)
+    except Exception:
+        logger.error(f"Append txn {txn_id} failed; rolling back")
+        _rollback(table_dir, added, staging_dir)
+        raise
+
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    vacuum_table(table_dir, parquet_config.get('retention_hours', DEFAULT_RETENTION_HOURS))
+    return version
+
+
+def compact_table(
+    table_dir: str,
+    parquet_config: Optional[Dict] = None,
+    spark: Optional[SparkSession] = None
+) -> Optional[int]:
+    """
+    Merge small files into target-sized ones, one partition directory at a time.
+    Readers keep seeing the old files until the compaction commit lands, and
+    those files are deleted only once they are older than retention_hours.
+
+    Returns:
+        Last committed log version, or None if nothing was compacted
+    """
+    parquet_config = parquet_config or {}
+    compaction_cfg = parquet_config.get('compaction', {})
+    small_file_bytes = int(compaction_cfg.get('small_file_mb', 32)) * 1024 * 1024
+    min_files = int(compaction_cfg.get('min_files', 4))
+    target_file_bytes = int(parquet_config.get('target_file_mb', 128)) * 1024 * 1024
+
+    log = TransactionLog(table_dir)
+    if not log.versions():
+        return None
+    spark = spark or get_spark_session()
+
+    # Group small live files by partition directory
+    by_partition: Dict[str, List[str]] = {}
+    live = log.live_entries()
+    sizes = {path: item.get("bytes", 0) for path, item in live.items()}
+    for path, size in sizes.items():
+        if size < small_file_bytes:
+            by_partition.setdefault(os.path.dirname(path), []).append(path)
+
+    last_version = None
+    for partition, files in sorted(by_partition.items()):
+        if len(files) < min_files:
+            continue
+
+        total_bytes = sum(sizes[p] for p in files)
+        num_files = max(1, -(-total_bytes // target_file_bytes))
+        txn_id = uuid.uuid4().hex
+        staging_dir = os.path.join(table_dir, STAGING_DIR, txn_id)
+        added: List[Dict] = []
+
+        logger.info(f"Compacting {len(files)} files in {partition or '/'} into {num_files}")
+        try:
+            small_df = (
+                spark.read
+                .option("basePath", table_dir)
+                .parquet(*[os.path.join(table_dir, p) for p in files])
+            )
+            _write_staged(small_df, staging_dir, parquet_config, num_files=num_files)
+            # Merged files hold the rows of every input's raw files
+            tracked = all("sources" in live[p] for p in files)
+            sources = sorted({s for p in files for s in live[p]["sources"]}) if tracked else None
+            added = _publish_staged(table_dir, staging_dir, sources)
+            last_version = log.commit("compact", added, files)
+        except Exception as e:
+            logger.warning(f"Compaction of {partition or '/'} aborted: {e}")
+            _rollback(table_dir, added, staging_dir)
+            continue
+
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # Replaced files stay on disk for readers of older versions until the retention period passes
+    vacuum_table(table_dir, parquet_config.get('retention_hours', DEFAULT_RETENTION_HOURS))
+    return last_version
+
+
+def start_background_compaction(
+    table_dir: str,
+    parquet_config: Optional[Dict] = None,
+    spark: Optional[SparkSession] = None
+) -> threading.Thread:
+    """Run compact_table on a daemon thread (join it before stopping Spark)"""
+    thread = threading.Thread(
+        target=compact_table,
+        args=(table_dir, parquet_config, spark),
+        name="parquet-compaction",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -11,7 +11,7 @@ from pyspark.sql.functions import (
     to_timestamp, hour, dayofmonth, month, year,
     split, size, regexp_replace, isnan, isnull, coalesce, lit
 )
-from typing import Optional
+from typing import Dict, List, Optional
 import sys
 import os
 
@@ -25,6 +25,28 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Default numeric field patterns ("took 523 ms", "latency=1.2s", "duration: 40ms", "took 5 minutes").
+# The unit group captures the word after the number; units missing from UNIT_TO_MS
+# ("took 3 attempts") leave the field null.
+DEFAULT_NUMERIC_FIELDS = [
+    {
+        "name": "latency_ms",
+        "pattern": r"(?i)(?:took|latency|duration|elapsed|response time)[=:\s]+(\d+(?:\.\d+)?)\s*([a-z]+)?\b",
+        "value_group": 1,
+        "unit_group": 2,
+        "unit": "ms",
+    }
+]
+
+# Multipliers to convert a captured unit (lower-cased) into milliseconds
+UNIT_TO_MS = {
+    **dict.fromkeys(["us", "usec", "usecs", "microsecond", "microseconds"], 0.001),
+    **dict.fromkeys(["ms", "msec", "msecs", "millisecond", "milliseconds"], 1.0),
+    **dict.fromkeys(["s", "sec", "secs", "second", "seconds"], 1000.0),
+    **dict.fromkeys(["m", "min", "mins", "minute", "minutes"], 60000.0),
+    **dict.fromkeys(["h", "hr", "hrs", "hour", "hours"], 3600000.0),
+}
+
 
 def clean_null_rows(df: DataFrame) -> DataFrame:
     """
@@ -237,7 +259,52 @@ def extract_service_endpoint(df: DataFrame, message_col: str = "message") -> Dat
     return df_with_service
 
 
-def parse_logs(df: DataFrame) -> DataFrame:
+def extract_numeric_fields(
+    df: DataFrame,
+    fields: Optional[List[Dict]] = None,
+    message_col: str = "message"
+) -> DataFrame:
+    """
+    Extract numeric fields (e.g. latencies) from the message using configurable patterns.
+    Each field becomes a double column normalised to its configured unit; rows without
+    a match, or whose captured unit is not in UNIT_TO_MS, get null.
+    """
+    logger.info("Extracting numeric fields...")
+
+    if fields is None:
+        fields = DEFAULT_NUMERIC_FIELDS
+
+    for field in fields:
+        name = field["name"]
+        pattern = field["pattern"]
+        value_group = field.get("value_group", 1)
+        unit_group = field.get("unit_group", 0)
+        target_unit = field.get("unit", "ms")
+        if target_unit not in UNIT_TO_MS:
+            raise ValueError(f"Unknown unit '{target_unit}' for numeric field {name}")
+        target_scale = UNIT_TO_MS[target_unit]
+
+        raw_value = regexp_extract(col(message_col), pattern, value_group)
+
+        # Convert captured unit to the target unit; missing unit means value is already in target unit,
+        # an unknown one (null scale) rejects the value
+        scale = lit(1.0)
+        if unit_group:
+            unit = lower(regexp_extract(col(message_col), pattern, unit_group))
+            scale = when(unit == "", lit(1.0))
+            for unit_name, to_ms in UNIT_TO_MS.items():
+                scale = scale.when(unit == unit_name, lit(to_ms / target_scale))
+            scale = scale.otherwise(lit(None).cast("double"))
+
+        df = df.withColumn(
+            name,
+            when(raw_value != "", raw_value.cast("double") * scale)
+        )
+
+    return df
+
+
+def parse_logs(df: DataFrame, config: Optional[Dict] = None) -> DataFrame:
     """Main parsing function"""
     logger.info("Starting log parsing and normalization...")
     
@@ -257,6 +324,7 @@ def parse_logs(df: DataFrame) -> DataFrame:
     df = extract_error_type(df)
     df = extract_ip_address(df)
     df = extract_service_endpoint(df)
+    df = extract_numeric_fields(df, (config or {}).get('metrics', {}).get('fields'))
     
     # 5. Clean message
     if "message" in df.columns:
@@ -0,0 +1,108 @@
+"""
+Persistent Spark Service Module
+Runs a long-lived SparkSession exposed over Spark Connect so pipeline runs and
+dashboard queries attach as thin clients instead of starting a JVM each time.
+
+Usage:
+    python src/spark/spark_service.py     # start the service (Ctrl+C to stop)
+
+Clients pick it up when spark.connect.url is set in config.yaml
+(or SPARK_REMOTE is exported): the pipeline via get_spark_session(), the
+dashboard via src/dashboard/controllers/spark_client.py.
+"""
+
+import logging
+import os
+import sys
+import time
+
+# Handle imports for both direct execution and module import
+try:
+    from src.spark.spark_session import create_spark_session, load_config
+    from src.spark.parquet_table import table_files
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+    from src.spark.spark_session import create_spark_session, load_config
+    from src.spark.parquet_table import table_files
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Views the service publishes for thin clients (read as global_temp.<name>)
+PROCESSED_VIEW = "processed_logs"
+PROCESSED_FILES_VIEW = "processed_logs_files"  # Live files behind processed_logs (one "path" row each)
+
+_warm: dict = {}
+
+
+def warm_datasets(spark, config: dict) -> list:
+    """
+    Cache frequently queried datasets and publish them as global temp views,
+    which every Spark Connect client session can read (global_temp.<name>).
+    Re-caches processed_logs when the table's live files changed since the
+    last call, so clients can compare processed_logs_files with their own view.
+
+    Returns:
+        Names of the views that were (re)published
+    """
+    published = []
+    parquet_dir = config['paths'].get('parquet_dir', 'data/processed')
+
+    if os.path.exists(parquet_dir):
+        try:
+            # Live files only: replaced ones stay on disk until vacuumed
+            files = sorted(os.path.abspath(f) for f in table_files(parquet_dir))
+            previous = _warm.get(PROCESSED_VIEW)
+            if previous is not None and previous[1] == files:
+                return published
+            if not files:
+                return published
+
+            df = spark.read.option("basePath", parquet_dir).parquet(*files).cache()
+            count = df.count()  # Materialize cache
+            df.createOrReplaceGlobalTempView(PROCESSED_VIEW)
+            spark.createDataFrame([(f,) for f in files], "path string").createOrReplaceGlobalTempView(PROCESSED_FILES_VIEW)
+            if previous is not None:
+                previous[0].unpersist()
+            _warm[PROCESSED_VIEW] = (df, files)
+            published.append(PROCESSED_VIEW)
+            logger.info(f"Cached {PROCESSED_VIEW} ({count} rows, {len(files)} files) from {parquet_dir}")
+        except Exception as e:
+            logger.warning(f"Could not cache {parquet_dir}: {e}")
+
+    return published
+
+
+def run_service(config_path: str = "config/config.yaml") -> None:
+    """Start the persistent Spark service and block until interrupted"""
+    config = load_config(config_path)
+    connect_cfg = config.get('spark', {}).get('connect', {})
+    port = connect_cfg.get('port', 15002)
+    refresh_seconds = connect_cfg.get('refresh_seconds', 30)
+
+    logger.info("Starting persistent Spark service...")
+    spark = create_spark_session(config, serve_connect=True)
+
+    cache_datasets = connect_cfg.get('cache_datasets', True)
+    if cache_datasets:
+        warm_datasets(spark, config)
+
+    logger.info(f"Spark service ready on sc://localhost:{port}")
+
+    try:
+        last_refresh = time.monotonic()
+        while True:
+            time.sleep(1)
+            # Pick up pipeline runs that changed data/processed
+            if cache_datasets and refresh_seconds and time.monotonic() - last_refresh >= refresh_seconds:
+                warm_datasets(spark, config)
+                last_refresh = time.monotonic()
+    except KeyboardInterrupt:
+        logger.info("Stopping Spark service...")
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    run_service()
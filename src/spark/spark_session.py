@@ -28,11 +28,22 @@ if "HADOOP_HOME" in os.environ:
 os.environ["SPARK_LOCAL_IP"] = "127.0.0.1"
 
 from pyspark.sql import SparkSession
+from pathlib import Path
+from datetime import datetime
+import atexit
+import math
+import re
+import shutil
+import sys
+import tempfile
 import yaml
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-run scratch directories created by prepare_scratch_dirs (removed at exit)
+_run_scratch_dirs = []
+
 
 def load_config(config_path: str = "config/config.yaml") -> dict:
     """
@@ -48,29 +59,185 @@ def load_config(config_path: str = "config/config.yaml") -> dict:
         raise
 
 
-def create_spark_session(config: dict = None) -> SparkSession:
+def resolve_core_count(master: str, spark_cfg: dict = None) -> int:
+    """
+    Work out how many cores a master string gives us
+    (local, local[N], local[*], local-cluster[N,C,M], spark://...)
+    """
+    spark_cfg = spark_cfg or {}
+    host_cores = os.cpu_count() or 1
+
+    if master == "local":
+        return 1
+
+    match = re.fullmatch(r"local\[(\d+|\*)(?:,\s*\d+)?\]", master)
+    if match:
+        return host_cores if match.group(1) == "*" else int(match.group(1))
+
+    match = re.fullmatch(r"local-cluster\[\s*(\d+)\s*,\s*(\d+)\s*,\s*\d+\s*\]", master)
+    if match:
+        return int(match.group(1)) * int(match.group(2))
+
+    # Standalone / other cluster managers: trust config, else assume host size
+    return int(spark_cfg.get("total_cores", host_cores))
+
+
+def get_input_size_bytes(path: str) -> int:
+    """Total size of files under the input path (0 if missing)"""
+    if not path or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def compute_partition_settings(input_bytes: int, cores: int, spark_cfg: dict = None) -> dict:
+    """
+    Size shuffle partitions and input split size from input volume and core count.
+    Small inputs are split so every core gets work; large inputs target
+    ~target_partition_mb per partition.
+    """
+    spark_cfg = spark_cfg or {}
+    target_bytes = int(spark_cfg.get("target_partition_mb", 128)) * 1024 * 1024
+    min_split_bytes = int(spark_cfg.get("min_partition_mb", 4)) * 1024 * 1024
+    tasks_per_core = int(spark_cfg.get("tasks_per_core", 2))
+
+    shuffle_partitions = spark_cfg.get("shuffle_partitions", "auto")
+    if shuffle_partitions == "auto":
+        shuffle_partitions = max(cores * tasks_per_core, math.ceil(input_bytes / target_bytes))
+
+    max_partition_bytes = spark_cfg.get("max_partition_bytes", "auto")
+    if max_partition_bytes == "auto":
+        per_task = math.ceil(input_bytes / max(cores * tasks_per_core, 1))
+        max_partition_bytes = min(target_bytes, max(min_split_bytes, per_task))
+
+    return {
+        "shuffle_partitions": int(shuffle_partitions),
+        "max_partition_bytes": int(max_partition_bytes),
+        "default_parallelism": cores * tasks_per_core,
+    }
+
+
+def default_scratch_root() -> str:
+    """Platform-appropriate root for Spark scratch space"""
+    if sys.platform.startswith("win"):
+        return "C:/temp"
+    return os.path.join(tempfile.gettempdir(), "spark")
+
+
+def prepare_scratch_dirs(spark_cfg: dict = None) -> dict:
+    """
+    Create per-run scratch directories under each configured local dir.
+    Listing several mounts (e.g. one per NVMe disk) stripes shuffle and spill
+    files across them; Spark round-robins over spark.local.dir entries.
+
+    Returns:
+        Dict with local_dirs (list), tmp_dir and warehouse_dir
+    """
+    spark_cfg = spark_cfg or {}
+    root = default_scratch_root()
+
+    roots = spark_cfg.get("local_dirs") or [os.path.join(root, "spark-temp")]
+    if isinstance(roots, str):
+        roots = [d.strip() for d in roots.split(",") if d.strip()]
+
+    run_id = f"run-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+    local_dirs = []
+    for scratch_root in roots:
+        run_dir = os.path.join(os.path.expanduser(scratch_root), run_id)
+        try:
+            os.makedirs(run_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Skipping unusable scratch dir {scratch_root}: {e}")
+            continue
+        local_dirs.append(Path(run_dir).as_posix())
+        _run_scratch_dirs.append(run_dir)
+
+    if not local_dirs:
+        raise RuntimeError(f"No usable Spark scratch directories in {roots}")
+
+    warehouse_dir = spark_cfg.get("warehouse_dir") or os.path.join(root, "spark-warehouse")
+    os.makedirs(warehouse_dir, exist_ok=True)
+
+    return {
+        "local_dirs": local_dirs,
+        "tmp_dir": local_dirs[0],
+        "warehouse_dir": Path(os.path.abspath(warehouse_dir)).as_uri(),
+    }
+
+
+def cleanup_scratch_dirs() -> None:
+    """Remove the per-run scratch directories created for this process"""
+    while _run_scratch_dirs:
+        run_dir = _run_scratch_dirs.pop()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+atexit.register(cleanup_scratch_dirs)
+
+
+def create_spark_session(config: dict = None, serve_connect: bool = False) -> SparkSession:
     """
     Create and configure SparkSession (Spark 3.5.1 safe)
+
+    Args:
+        config: Loaded configuration (loaded from disk if None)
+        serve_connect: Also expose the session as a Spark Connect endpoint
     """
     if config is None:
         config = load_config()
 
     spark_cfg = config.get("spark", {})
 
+    # Action: Resolve master (local[N], local[*], spark://host:port, local-cluster[N,C,M])
+    master = spark_cfg.get("master", "local[*]")
+    cores = resolve_core_count(master, spark_cfg)
+
+    # Action: Size partitions from input volume and available cores
+    input_bytes = get_input_size_bytes(config.get("paths", {}).get("raw_logs_dir", "data/raw_logs"))
+    partitioning = compute_partition_settings(input_bytes, cores, spark_cfg)
+    logger.info(
+        f"Using {cores} core(s) for {input_bytes / (1024 * 1024):.1f} MB input: "
+        f"{partitioning['shuffle_partitions']} shuffle partitions, "
+        f"{partitioning['max_partition_bytes'] // (1024 * 1024)} MB max split"
+    )
+
+    # Action: Prepare per-run scratch dirs striped across configured mounts
+    scratch = prepare_scratch_dirs(spark_cfg)
+    logger.info(f"Spark scratch dirs: {scratch['local_dirs']}")
+
+    java_options = [f"-Djava.io.tmpdir={scratch['tmp_dir']}"]
+    # Fix: Explicitly set java.library.path for hadoop.dll
+    if "HADOOP_HOME" in os.environ:
+        hadoop_bin = os.path.join(os.environ["HADOOP_HOME"], "bin")
+        java_options.append(f"-Djava.library.path={hadoop_bin}")
+
     # Action: Initialize Spark Builder to construct the session
     builder = (
         SparkSession.builder
         .appName(spark_cfg.get("app_name", "DistributedLogProcessor"))
-        # Action: Set master to local mode with 1 core for stability
-        .master("local[1]") 
+        # Action: Set master from config
+        .master(master)
         # Action: Bind driver to localhost to avoid VPN/Network connection issues
         .config("spark.driver.bindAddress", "127.0.0.1")
         .config("spark.driver.host", "localhost")
         # Action: Configure warehouse dir for Spark SQL metadata
-        .config("spark.sql.warehouse.dir", "file:///C:/temp/spark-warehouse")
-        .config("spark.local.dir", "C:/temp/spark-temp")
-        .config("spark.driver.extraJavaOptions", "-Djava.io.tmpdir=C:/temp/spark-temp")
+        .config("spark.sql.warehouse.dir", scratch["warehouse_dir"])
+        .config("spark.local.dir", ",".join(scratch["local_dirs"]))
+        .config("spark.driver.extraJavaOptions", " ".join(java_options))
     )
+    # Executors only share the driver's filesystem on local masters (local[N], local-cluster);
+    # on spark:// or YARN they keep their own node-local temp dir
+    if master.startswith("local"):
+        builder = builder.config("spark.executor.extraJavaOptions", f"-Djava.io.tmpdir={scratch['tmp_dir']}")
 
     # Memory configuration
     # Action: function sets the maximum memory for executors
@@ -82,12 +249,7 @@ def create_spark_session(config: dict = None) -> SparkSession:
         "spark.driver.memory",
         spark_cfg.get("driver_memory", "1g")
     )
-    
-    # Fix: Explicitly set java.library.path for hadoop.dll
-    if "HADOOP_HOME" in os.environ:
-        hadoop_bin = os.path.join(os.environ["HADOOP_HOME"], "bin")
-        builder = builder.config("spark.driver.extraJavaOptions", f"-Djava.library.path={hadoop_bin}")
-        
+
     builder = builder.config(
         "spark.driver.maxResultSize",
         spark_cfg.get("max_result_size", "1g")
@@ -100,6 +262,47 @@ def create_spark_session(config: dict = None) -> SparkSession:
         "spark.sql.adaptive.coalescePartitions.enabled", "true"
     )
 
+    # Arrow record batches for Spark <-> pandas transfer (toPandas / createDataFrame)
+    arrow_cfg = spark_cfg.get("arrow", {})
+    builder = builder.config(
+        "spark.sql.execution.arrow.pyspark.enabled",
+        str(arrow_cfg.get("enabled", True)).lower()
+    )
+    builder = builder.config(
+        "spark.sql.execution.arrow.pyspark.fallback.enabled",
+        str(arrow_cfg.get("fallback", True)).lower()
+    )
+    builder = builder.config(
+        "spark.sql.execution.arrow.maxRecordsPerBatch",
+        str(arrow_cfg.get("batch_size", 10000))
+    )
+
+    # FAIR lets concurrent jobs (e.g. parallel report exports) share executors
+    builder = builder.config("spark.scheduler.mode", spark_cfg.get("scheduler_mode", "FAIR"))
+
+    # Kryo serialization for JVM-side shuffle/cache data
+    if spark_cfg.get("serializer", "kryo") == "kryo":
+        builder = builder.config("spark.serializer", "org.apache.spark.serializer.KryoSerializer")
+        builder = builder.config(
+            "spark.kryoserializer.buffer.max",
+            spark_cfg.get("kryo_buffer_max", "256m")
+        )
+
+    # Parallelism sized from cores and input volume
+    builder = builder.config("spark.sql.shuffle.partitions", str(partitioning["shuffle_partitions"]))
+    builder = builder.config("spark.sql.files.maxPartitionBytes", str(partitioning["max_partition_bytes"]))
+    builder = builder.config("spark.default.parallelism", str(partitioning["default_parallelism"]))
+
+    # Action: Host a Spark Connect endpoint so thin clients can reuse this JVM
+    if serve_connect:
+        connect_cfg = spark_cfg.get("connect", {})
+        builder = builder.config("spark.plugins", "org.apache.spark.sql.connect.SparkConnectPlugin")
+        builder = builder.config("spark.connect.grpc.binding.port", str(connect_cfg.get("port", 15002)))
+        builder = builder.config(
+            "spark.jars.packages",
+            connect_cfg.get("package", "org.apache.spark:spark-connect_2.12:3.5.1")
+        )
+
     # Action: Instantiates the SparkSession object with defined configs
     spark = builder.getOrCreate()
 
@@ -114,11 +317,33 @@ def create_spark_session(config: dict = None) -> SparkSession:
     return spark
 
 
-def get_spark_session() -> SparkSession:
+def get_connect_url(config: dict = None) -> str:
+    """Spark Connect URL of the persistent service ('' when not configured)"""
+    if os.environ.get("SPARK_REMOTE"):
+        return os.environ["SPARK_REMOTE"]
+    if config is None:
+        config = load_config()
+    return config.get("spark", {}).get("connect", {}).get("url", "") or ""
+
+
+def is_remote_session(spark) -> bool:
+    """True if spark is a Spark Connect client session"""
+    return type(spark).__module__.startswith("pyspark.sql.connect")
+
+
+def get_spark_session(config: dict = None) -> SparkSession:
     """
-    Get active SparkSession or create one
+    Get active SparkSession or create one.
+    Returns a Spark Connect client session when the persistent service is configured.
     """
     spark = SparkSession.getActiveSession()
     if spark is None:
-        spark = create_spark_session()
+        if config is None:
+            config = load_config()
+        connect_url = get_connect_url(config)
+        if connect_url:
+            logger.info(f"Connecting to Spark service at {connect_url}")
+            spark = SparkSession.builder.remote(connect_url).getOrCreate()
+        else:
+            spark = create_spark_session(config)
     return spark
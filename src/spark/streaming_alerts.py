@@ -0,0 +1,456 @@
+"""
+Streaming Alerts Module
+Evaluates alert rules continuously on log files dropped into a directory,
+firing within one trigger interval of a threshold being crossed.
+
+- Rules use the alert rule syntax (src/spark/alert_rules.py) from streaming.rules;
+  every rule is windowed (default streaming.window) and may use count/sum/min/max/rate
+- Per-key state (rule grouping, group keys, window) is kept with
+  applyInPandasWithState; each (rule, key, window) fires at most once
+- Late data is bounded by a watermark: rows older than it are dropped and
+  window state is evicted once the watermark passes the window end
+- Fired alerts are written as JSON lines to streaming.alerts_dir and raised through
+  AlertManager (console, alerts.log, shared alert store, queued email)
+
+Usage:
+    python src/spark/streaming_alerts.py              # run the evaluator
+    python src/spark/streaming_alerts.py --harness    # run it against synthetic file drops
+"""
+
+import argparse
+import ast
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.streaming.state import GroupStateTimeout
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType, TimestampType
+
+# Handle imports for both direct execution and module import
+try:
+    from src.spark.spark_session import get_spark_session, load_config
+    from src.spark.parse_logs import normalize_timestamps, standardize_log_level, extract_service_endpoint
+    from src.spark.alert_rules import AlertRule, aggregate_calls, compile_metric, compile_row, load_rules, window_seconds
+    from src.spark.alerts import AlertManager
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+    from src.spark.spark_session import get_spark_session, load_config
+    from src.spark.parse_logs import normalize_timestamps, standardize_log_level, extract_service_endpoint
+    from src.spark.alert_rules import AlertRule, aggregate_calls, compile_metric, compile_row, load_rules, window_seconds
+    from src.spark.alerts import AlertManager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Raw log layout of files in data/raw_logs (and of the harness drops)
+DEFAULT_SCHEMA = (
+    "LineId STRING, Date STRING, Time STRING, Level STRING, Node STRING, Component STRING, "
+    "Id STRING, Content STRING, EventId STRING, EventTemplate STRING"
+)
+
+# Aggregates whose partial results combine across micro-batches
+STREAMABLE_AGGREGATES = {"count", "sum", "min", "max"}
+
+ALERT_SCHEMA = StructType([
+    StructField("rule", StringType()),
+    StructField("severity", StringType()),
+    StructField("metric", StringType()),
+    StructField("value", DoubleType()),
+    StructField("threshold", DoubleType()),
+    StructField("group", StringType()),
+    StructField("window_start", TimestampType()),
+    StructField("last_event_time", TimestampType()),
+    StructField("detected_at", TimestampType()),
+])
+
+STATE_SCHEMA = StructType([StructField("state", StringType())])
+
+
+def streamable_rules(specs: List[Dict], default_window: str) -> List[AlertRule]:
+    """Parse streaming rules, defaulting the window and dropping non-combinable aggregates"""
+    rules = []
+    for rule in load_rules(specs):
+        unsupported = {c.func.id for c in aggregate_calls(rule.metric)} - STREAMABLE_AGGREGATES
+        if unsupported:
+            logger.error(f"Skipping streaming rule {rule.name}: {sorted(unsupported)} cannot be combined incrementally")
+            continue
+        rule.window = rule.window or default_window
+        rules.append(rule)
+    return rules
+
+
+def prepare_events(df: DataFrame) -> DataFrame:
+    """Normalize raw streamed rows like the batch ingest + parse steps (no actions)"""
+    for name in df.columns:
+        df = df.withColumnRenamed(name, name.lower())
+    if "level" in df.columns:
+        df = df.withColumnRenamed("level", "log_level")
+    if "content" in df.columns:
+        df = df.withColumnRenamed("content", "message")
+    if "timestamp" not in df.columns and {"date", "time"} <= set(df.columns):
+        df = df.withColumn(
+            "timestamp", F.concat_ws(" ", F.col("date"), F.regexp_replace(F.col("time"), ",", "."))
+        )
+
+    df = normalize_timestamps(df)
+    df = standardize_log_level(df)
+    df = extract_service_endpoint(df)
+    return df.filter(F.col("timestamp").isNotNull()).withColumn("message", F.trim(F.col("message")))
+
+
+class _StreamPlan:
+    """Shared layout of the expanded stream: groupings, key columns and aggregate inputs"""
+
+    def __init__(self, rules: List[AlertRule]):
+        self.rules = rules
+        self.groupings = list(dict.fromkeys(rule.grouping for rule in rules))
+        self.key_names = [f"_k{i}" for i in range(max(len(g) for g, _ in self.groupings))]
+        self.aggregates: Dict[tuple, Dict] = {}
+        for rule in rules:
+            for call in aggregate_calls(rule.metric):
+                key = (rule.where_text or "", ast.dump(call))
+                if key not in self.aggregates:
+                    self.aggregates[key] = {
+                        "alias": f"_a{len(self.aggregates)}",
+                        "kind": call.func.id,
+                        "rule": rule,
+                        "call": call,
+                    }
+
+    def alias(self, rule: AlertRule, call) -> str:
+        return self.aggregates[(rule.where_text or "", ast.dump(call))]["alias"]
+
+    def input_columns(self) -> List:
+        """Per-row contribution of every aggregate"""
+        columns = []
+        for spec in self.aggregates.values():
+            rule, call = spec["rule"], spec["call"]
+            where = compile_row(rule.where, F.col, F.lit) if rule.where is not None else F.lit(True)
+            if spec["kind"] == "count":
+                condition = where & compile_row(call.args[0], F.col, F.lit) if call.args else where
+                column = F.when(condition, 1.0).otherwise(0.0)
+            else:
+                column = F.when(where, compile_row(call.args[0], F.col, F.lit)).cast("double")
+            columns.append(column.alias(spec["alias"]))
+        return columns
+
+    def expansions(self, time_column: str) -> List:
+        structs = []
+        for gid, (group_by, window) in enumerate(self.groupings):
+            keys = [
+                (F.col(group_by[i]).cast("string") if i < len(group_by) else F.lit(None).cast("string")).alias(name)
+                for i, name in enumerate(self.key_names)
+            ]
+            # Epoch-aligned floor instead of F.window, which allows one window per query;
+            # the end is kept as epoch millis so the state timeout needs no timezone conversion
+            seconds = window_seconds(window)
+            start = F.floor(F.col(time_column).cast("long") / seconds) * seconds
+            structs.append(F.struct(
+                F.lit(gid).alias("_gid"), *keys,
+                start.cast("timestamp").alias("_window_start"),
+                ((start + seconds) * 1000).cast("long").alias("_window_end_ms")
+            ))
+        return structs
+
+
+def _make_state_function(plan: _StreamPlan):
+    """Build the applyInPandasWithState callback (closes over the plan only)"""
+    import pandas as pd
+
+    specs = list(plan.aggregates.values())
+    rules_by_gid: Dict[int, List[int]] = {}
+    for index, rule in enumerate(plan.rules):
+        rules_by_gid.setdefault(plan.groupings.index(rule.grouping), []).append(index)
+
+    def combine(kind, current, series):
+        series = series.dropna()
+        if series.empty:
+            return current
+        if kind in ("count", "sum"):
+            return (current or 0.0) + float(series.sum())
+        value = float(series.min() if kind == "min" else series.max())
+        if current is None:
+            return value
+        return min(current, value) if kind == "min" else max(current, value)
+
+    def update(key, pdfs, state):
+        if state.hasTimedOut:
+            # Watermark passed the window end; nothing more can arrive for this key
+            state.remove()
+            return
+
+        saved = json.loads(state.get[0]) if state.exists else {"values": [None] * len(specs), "fired": []}
+        values, fired = saved["values"], set(saved["fired"])
+
+        last_event = None
+        window_end = None
+        for pdf in pdfs:
+            for i, spec in enumerate(specs):
+                values[i] = combine(spec["kind"], values[i], pdf[spec["alias"]])
+            batch_last = pdf["timestamp"].max()
+            last_event = batch_last if last_event is None else max(last_event, batch_last)
+            window_end = int(pdf["_window_end_ms"].iloc[0])
+
+        by_alias = {spec["alias"]: values[i] for i, spec in enumerate(specs)}
+        gid, keys, window_start = key[0], key[1:-1], key[-1]
+
+        alerts = []
+        for index in rules_by_gid.get(gid, []):
+            rule = plan.rules[index]
+            if rule.name in fired:
+                continue
+            try:
+                value = compile_metric(rule.metric, lambda call, rule=rule: by_alias[plan.alias(rule, call)])
+            except (TypeError, ZeroDivisionError):
+                continue
+            if rule.breached(value):
+                fired.add(rule.name)
+                alerts.append({
+                    "rule": rule.name,
+                    "severity": rule.severity,
+                    "metric": rule.metric_text,
+                    "value": float(value),
+                    "threshold": rule.threshold,
+                    "group": json.dumps({c: keys[i] for i, c in enumerate(rule.group_by)}),
+                    "window_start": window_start,
+                    "last_event_time": last_event,
+                    "detected_at": datetime.now(),
+                })
+
+        state.update((json.dumps({"values": values, "fired": sorted(fired)}),))
+        if window_end is not None:
+            # Spark rejects timeouts below the current watermark (late windows still pending eviction)
+            try:
+                window_end = max(window_end, state.getCurrentWatermarkMs())
+            except Exception:
+                pass
+            state.setTimeoutTimestamp(window_end)
+
+        if alerts:
+            yield pd.DataFrame(alerts, columns=ALERT_SCHEMA.fieldNames())
+
+    return update
+
+
+def build_alert_stream(spark: SparkSession, config: Dict, rules: List[AlertRule]) -> DataFrame:
+    """
+    Streaming DataFrame of fired alerts (ALERT_SCHEMA) for files dropped into streaming.input_dir
+    """
+    stream_cfg = config.get('streaming', {})
+    input_dir = stream_cfg.get('input_dir', 'data/stream/incoming')
+    os.makedirs(input_dir, exist_ok=True)
+
+    raw = (
+        spark.readStream
+        .schema(stream_cfg.get('schema', DEFAULT_SCHEMA))
+        .option("header", "true")
+        .option("maxFilesPerTrigger", stream_cfg.get('max_files_per_trigger', 100))
+        .csv(input_dir)
+    )
+    events = prepare_events(raw).withWatermark("timestamp", stream_cfg.get('watermark', '2 minutes'))
+
+    plan = _StreamPlan(rules)
+    expanded = (
+        events
+        .select("timestamp", *plan.input_columns(), F.explode(F.array(*plan.expansions("timestamp"))).alias("_g"))
+        .select("*", "_g.*")
+        .drop("_g")
+    )
+
+    return (
+        expanded
+        .groupBy("_gid", *plan.key_names, "_window_start")
+        .applyInPandasWithState(
+            _make_state_function(plan),
+            outputStructType=ALERT_SCHEMA,
+            stateStructType=STATE_SCHEMA,
+            outputMode="append",
+            timeoutConf=GroupStateTimeout.EventTimeTimeout,
+        )
+    )
+
+
+def _publish_batch(alert_manager: AlertManager, alerts_dir: str):
+    """foreachBatch sink: write alerts as JSON lines and raise them through AlertManager"""
+
+    def publish(batch_df: DataFrame, batch_id: int) -> None:
+        # Alerts are few; collect once so the stateful operator is not recomputed
+        fired = [row.asDict() for row in batch_df.collect()]
+        if not fired:
+            return
+
+        # One file per batch id keeps replays after a restart idempotent
+        os.makedirs(alerts_dir, exist_ok=True)
+        target = os.path.join(alerts_dir, f"batch-{batch_id:08d}.json")
+        with open(target + ".tmp", "w") as f:
+            for alert in fired:
+                f.write(json.dumps(alert, default=str) + "\n")
+        os.replace(target + ".tmp", target)
+
+        for alert in fired:
+            group = json.loads(alert["group"])
+            label = ", ".join(f"{k}={v}" for k, v in group.items())
+            latency = (alert["detected_at"] - alert["last_event_time"]).total_seconds()
+            alert_manager.log_alert(
+                alert["rule"],
+                f"{label + ': ' if label else ''}{alert['metric']} = {alert['value']:g} "
+                f"(threshold {alert['threshold']:g}) in window {alert['window_start']} "
+                f"[detected {latency:.1f}s after last event]",
+                alert["severity"],
+                key=label,
+                source="stream"
+            )
+        alert_manager.flush_alerts()
+        logger.info(f"Batch {batch_id}: {len(fired)} streaming alert(s) fired")
+
+    return publish
+
+
+def start_streaming_alerts(config_path: str = "config/config.yaml", spark: Optional[SparkSession] = None):
+    """
+    Start the streaming alert query
+
+    Returns:
+        (StreamingQuery, AlertManager)
+    """
+    config = load_config(config_path)
+    stream_cfg = config.get('streaming', {})
+    spark = spark or get_spark_session(config)
+
+    rules = streamable_rules(stream_cfg.get('rules', []), stream_cfg.get('window', '1 minute'))
+    if not rules:
+        raise ValueError("No usable streaming.rules configured")
+
+    alerts_dir = stream_cfg.get('alerts_dir', 'data/stream/alerts')
+    alert_manager = AlertManager(config_path)
+
+    query = (
+        build_alert_stream(spark, config, rules)
+        .writeStream
+        .queryName("streaming_alerts")
+        .foreachBatch(_publish_batch(alert_manager, alerts_dir))
+        .option("checkpointLocation", stream_cfg.get('checkpoint_dir', 'data/stream/checkpoints'))
+        .trigger(processingTime=f"{stream_cfg.get('trigger_seconds', 2)} seconds")
+        .start()
+    )
+    logger.info(f"Streaming alerts running on {stream_cfg.get('input_dir', 'data/stream/incoming')} ({len(rules)} rules)")
+    return query, alert_manager
+
+
+# --- Synthetic file-drop harness ---
+
+def drop_synthetic_logs(
+    input_dir: str,
+    files: int = 10,
+    rows_per_file: int = 200,
+    interval_seconds: float = 1.0,
+    error_share: float = 0.05,
+    burst_file: Optional[int] = 3,
+    burst_message: str = "Database connection timeout"
+) -> List[Dict]:
+    """
+    Write CSV log files into input_dir one at a time (atomic rename), with event
+    timestamps of the drop time. File `burst_file` is mostly errors with the same
+    message so burst rules cross their thresholds.
+
+    Returns:
+        [{"file", "dropped_at", "errors"}] per dropped file
+    """
+    os.makedirs(input_dir, exist_ok=True)
+    staging_dir = os.path.join(input_dir, ".staging")
+    os.makedirs(staging_dir, exist_ok=True)
+
+    services = ["AuthService", "PaymentService", "OrderService", "SearchService"]
+    messages = ["Request completed", "Cache miss", "User login successful", "Slow query detected"]
+    drops = []
+    line_id = 0
+
+    for index in range(files):
+        now = datetime.now()
+        name = f"drop_{now.strftime('%Y%m%d_%H%M%S_%f')}_{index:04d}.csv"
+        staged = os.path.join(staging_dir, name)
+        errors = 0
+        with open(staged, "w") as f:
+            f.write("LineId,Date,Time,Level,Node,Component,Id,Content,EventId,EventTemplate\n")
+            for _ in range(rows_per_file):
+                line_id += 1
+                burst = index == burst_file and random.random() < 0.8
+                is_error = burst or random.random() < error_share
+                service = random.choice(services)
+                message = burst_message if burst else (f"service: {service} error" if is_error else random.choice(messages))
+                errors += is_error
+                f.write(
+                    f"{line_id},{now:%Y-%m-%d},{now:%H:%M:%S},{'ERROR' if is_error else 'INFO'},"
+                    f"Node-{random.randint(1, 4)},{service},{line_id},{message},EVT{line_id % 10:03d},{message}\n"
+                )
+        os.replace(staged, os.path.join(input_dir, name))
+        drops.append({"file": name, "dropped_at": now, "errors": errors})
+        logger.info(f"Dropped {name} ({rows_per_file} rows, {errors} errors)")
+        time.sleep(interval_seconds)
+
+    return drops
+
+
+def read_fired_alerts(alerts_dir: str):
+    """Load the JSON alert sink as a pandas DataFrame"""
+    import pandas as pd
+
+    files = glob.glob(os.path.join(alerts_dir, "*.json"))
+    if not files:
+        return pd.DataFrame(columns=ALERT_SCHEMA.fieldNames())
+    frames = [pd.read_json(path, lines=True) for path in files if os.path.getsize(path) > 0]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ALERT_SCHEMA.fieldNames())
+
+
+def run_harness(config_path: str = "config/config.yaml", files: int = 10, settle_seconds: float = 10.0) -> None:
+    """Run the evaluator against synthetic drops and report detection latency"""
+    import pandas as pd
+
+    config = load_config(config_path)
+    stream_cfg = config.get('streaming', {})
+
+    query, alert_manager = start_streaming_alerts(config_path)
+    try:
+        dropper = threading.Thread(
+            target=drop_synthetic_logs,
+            args=(stream_cfg.get('input_dir', 'data/stream/incoming'), files),
+            name="log-drops",
+        )
+        dropper.start()
+        dropper.join()
+        time.sleep(settle_seconds)
+    finally:
+        query.stop()
+        alert_manager.flush_notifications(timeout=10)
+
+    alerts = read_fired_alerts(stream_cfg.get('alerts_dir', 'data/stream/alerts'))
+    if alerts.empty:
+        print("No streaming alerts fired")
+        return
+    latency = (
+        pd.to_datetime(alerts["detected_at"]) - pd.to_datetime(alerts["last_event_time"])
+    ).dt.total_seconds()
+    print(f"{len(alerts)} alert(s) fired")
+    print(f"Detection latency (s): min {latency.min():.1f}, median {latency.median():.1f}, max {latency.max():.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming alert evaluator")
+    parser.add_argument("--harness", action="store_true", help="Drop synthetic log files and report detection latency")
+    parser.add_argument("--files", type=int, default=10, help="Files dropped by the harness")
+    args = parser.parse_args()
+
+    if args.harness:
+        run_harness(files=args.files)
+    else:
+        streaming_query, _ = start_streaming_alerts()
+        streaming_query.awaitTermination()
@@ -0,0 +1,157 @@
+"""
+T-Digest Module
+Mergeable quantile sketch used to carry latency percentiles across incremental runs.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class TDigest:
+    """Merging t-digest (k1 scale function) with JSON-friendly state"""
+
+    def __init__(self, compression: float = 100.0):
+        """
+        Initialize an empty digest
+
+        Args:
+            compression: Accuracy/size trade-off (roughly the number of centroids kept)
+        """
+        self.compression = float(compression)
+        self.centroids: List[Tuple[float, float]] = []
+        self.total_weight = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._buffer: List[Tuple[float, float]] = []
+
+    def update(self, value: float, weight: float = 1.0) -> "TDigest":
+        """Add a single observation"""
+        value = float(value)
+        self._buffer.append((value, float(weight)))
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        # Compress once the buffer outgrows the centroid budget
+        if len(self._buffer) > 5 * self.compression:
+            self._compress()
+        return self
+
+    def update_many(self, values: Iterable[float]) -> "TDigest":
+        """Add many observations"""
+        for value in values:
+            self.update(value)
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Merge another digest into this one (in place)"""
+        other._compress()
+        if not other.centroids:
+            return self
+        self._buffer.extend(other.centroids)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q_limit(self, q_left: float) -> float:
+        # Invert the scale function one unit to the right of q_left
+        k = self._k(q_left) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+
+        items = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+
+        merged: List[Tuple[float, float]] = []
+        weight_so_far = 0.0
+        q_limit = self._q_limit(0.0)
+        cur_mean, cur_weight = items[0]
+
+        for mean, weight in items[1:]:
+            q = (weight_so_far + cur_weight + weight) / total
+            if q <= q_limit:
+                # Absorb into current centroid (weighted mean)
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                merged.append((cur_mean, cur_weight))
+                weight_so_far += cur_weight
+                q_limit = self._q_limit(weight_so_far / total)
+                cur_mean, cur_weight = mean, weight
+
+        merged.append((cur_mean, cur_weight))
+        self.centroids = merged
+        self.total_weight = total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the value at quantile q (0..1)
+
+        Returns:
+            Estimated value, or None for an empty digest
+        """
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+
+        q = min(max(q, 0.0), 1.0)
+        target = q * self.total_weight
+
+        # Centroid midpoints in cumulative-weight space
+        cumulative = 0.0
+        prev_mid, prev_mean = 0.0, self.min
+        for mean, weight in self.centroids:
+            mid = cumulative + weight / 2
+            if target < mid:
+                span = mid - prev_mid
+                frac = (target - prev_mid) / span if span > 0 else 0.0
+                return prev_mean + (mean - prev_mean) * frac
+            prev_mid, prev_mean = mid, mean
+            cumulative += weight
+
+        span = self.total_weight - prev_mid
+        frac = (target - prev_mid) / span if span > 0 else 1.0
+        return prev_mean + (self.max - prev_mean) * frac
+
+    def count(self) -> float:
+        """Total weight observed"""
+        self._compress()
+        return self.total_weight
+
+    def to_dict(self) -> Dict:
+        """Serialize digest state (compressed centroids only)"""
+        self._compress()
+        return {
+            "compression": self.compression,
+            "min": self.min,
+            "max": self.max,
+            "centroids": [[m, w] for m, w in self.centroids],
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "TDigest":
+        """Restore a digest from to_dict() output"""
+        digest = cls(state.get("compression", 100.0))
+        digest.centroids = [(float(m), float(w)) for m, w in state.get("centroids", [])]
+        digest.total_weight = sum(w for _, w in digest.centroids)
+        digest.min = state.get("min")
+        digest.max = state.get("max")
+        return digest
+
+
+def merge_digest_dicts(left: Dict, right: Dict) -> Dict:
+    """Merge two serialized digests (usable as a Spark reduce function)"""
+    return TDigest.from_dict(left).merge(TDigest.from_dict(right)).to_dict()